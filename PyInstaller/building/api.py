@@ -56,7 +56,7 @@ def __init__(self, *tocs, **kwargs):
 
                 If this TOC has an attribute `_code_cache`, this is
                 expected to be a dict of module code objects from
-                ModuleGraph.
+                ModuleGraph, with the filenames of the frozen application.
 
         kwargs
             Possible keywork arguments:
@@ -120,19 +120,17 @@ def assemble(self):
                 # For some reason the code-object, modulegraph created
                 # is not available. Recreate it
                 try:
-                    self.code_dict[entry[0]] = get_code_object(entry[0], entry[1])
+                    # Remove leading parts of paths in code objects. Those
+                    # created by modulegraph are already frozen, see
+                    # PyiModuleGraph.get_frozen_code().
+                    self.code_dict[entry[0]] = strip_paths_in_code(
+                        get_code_object(entry[0], entry[1]))
                 except SyntaxError:
                     # Exclude the module in case this is code meant for a newer Python version.
                     toc.remove(entry)
         # sort content alphabetically to support reproducible builds
         toc.sort()
 
-        # Remove leading parts of paths in code objects
-        self.code_dict = {
-            key: strip_paths_in_code(code)
-            for key, code in self.code_dict.items()
-        }
-
         pyz = ZlibArchiveWriter(self.name, toc, code_dict=self.code_dict, cipher=self.cipher)
         logger.info("Building PYZ (ZlibArchive) %s completed successfully.",
                     self.name)
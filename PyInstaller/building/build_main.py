@@ -30,10 +30,17 @@
 from .. import HOMEPATH, DEFAULT_DISTPATH, DEFAULT_WORKPATH
 from .. import compat
 from .. import log as logging
-from ..utils.misc import absnormpath, compile_py_files
+from ..utils.misc import absnormpath, compile_py_files, get_pyc_data
 from ..compat import is_win, PYDYLIB_NAMES, open_file
-from ..depend import bindepend
+from ..depend import bindepend, imphook
+from ..depend import utils as depend_utils
+from ..depend.bindepend import BinaryDependencyCache
 from ..depend.analysis import initialize_modgraph
+from ..depend.graphcache import ImportScanCache, ModuleGraphCache
+from ..depend.imphook import HookDirectoryCache
+from ..utils import dirsnapshot
+from ..utils import hooks as hookutils
+from ..utils.hooks.cache import DistributionIndex, HookQueryCache
 from .api import PYZ, EXE, COLLECT, MERGE
 from .datastruct import TOC, Target, Tree, _check_guts_eq
 from .osx import BUNDLE
@@ -333,12 +340,47 @@ def assemble(self):
         """
         This method is the MAIN method for finding all necessary files to be bundled.
         """
+        try:
+            self._assemble()
+        finally:
+            # The caches shared through these globals are only used by this
+            # Analysis, so a later Analysis in the same process does not
+            # reuse these half-populated if this one failed.
+            hookutils.query_cache = None
+            hookutils.distribution_index = None
+            bindepend.dependency_cache = None
+            imphook.hook_dir_cache = None
+
+    def _assemble(self):
         from ..config import CONF
 
         for m in self.excludes:
             logger.debug("Excluding module '%s'" % m)
+        # Modules unchanged since the previous build are loaded from the
+        # module graph cache instead of being parsed and compiled again.
+        module_cache = ModuleGraphCache(os.path.join(
+            CONF['workpath'], 'modgraph-%02d.dat' % self.invcnum))
+        # Imports parsed from module sources by any previous build with this
+        # Python version are reused, even if the module moved or options of
+        # the build changed.
+        scan_cache = ImportScanCache(os.path.join(
+            CONF['cachedir'], 'modulescan_py%d%d.dat' % sys.version_info[:2]))
+        # Results of statements and scripts run by hooks of previous builds
+        # are reused as long as the modules they depend on are unchanged.
+        hookutils.query_cache = HookQueryCache(os.path.join(
+            CONF['cachedir'], 'hookqueries_py%d%d.dat' % sys.version_info[:2]))
+        # Distributions are only scanned again in search path entries that
+        # changed since the previous build.
+        hookutils.distribution_index = DistributionIndex(os.path.join(
+            CONF['cachedir'], 'distributions_py%d%d.dat' % sys.version_info[:2]))
+        # Hook directories are only scanned again if changed since the
+        # previous build.
+        imphook.hook_dir_cache = HookDirectoryCache(os.path.join(
+            CONF['cachedir'], 'hookdirs_py%d%d.dat' % sys.version_info[:2]))
         self.graph = initialize_modgraph(
-            excludes=self.excludes, user_hook_dirs=self.hookspath)
+            excludes=self.excludes, user_hook_dirs=self.hookspath,
+            module_cache=module_cache, scan_cache=scan_cache,
+            snapshot_dir=CONF['cachedir'])
 
         # TODO Find a better place where to put 'base_library.zip' and when to created it.
         # For Python 3 it is necessary to create file 'base_library.zip'
@@ -379,9 +421,10 @@ def assemble(self):
         # the python executable and any binaries added by hooks later.
         # "binaries" are not the same as "extensions" which are .so or .dylib
         # that are found and recorded as extension nodes in the graph.
-        # Reset seen variable before running bindepend. We use bindepend only for
-        # the python executable.
-        bindepend.seen.clear()
+        # Dependencies of binaries unchanged since a previous build with this
+        # Python interpreter are not searched again.
+        bindepend.dependency_cache = BinaryDependencyCache(os.path.join(
+            CONF['cachedir'], 'bindepend_py%d%d.dat' % sys.version_info[:2]))
 
         # Add binary and assembly dependencies of Python.exe.
         # This also ensures that its assembly depencies under Windows get added to the
@@ -406,17 +449,25 @@ def assemble(self):
         # List to hold graph nodes of scripts and runtime hooks in use order.
         priority_scripts = []
 
-        # Assume that if the script does not exist, Modulegraph will raise error.
-        # Save the graph nodes of each in sequence.
-        for script in self.inputs:
-            logger.info("Analyzing %s", script)
-            priority_scripts.append(self.graph.run_script(script))
-
-        # Analyze the script's hidden imports (named on the command line)
-        self.graph.add_hiddenimports(self.hiddenimports)
-
-        ### Post-graph hooks.
-        self.graph.process_post_graph_hooks()
+        # If requested, parse and compile modules in worker processes ahead
+        # of the graph walk.
+        jobs = CONF.get('jobs', 1)
+        if jobs != 1:
+            self.graph.start_parse_workers(jobs or None)
+        try:
+            # Assume that if the script does not exist, Modulegraph will raise error.
+            # Save the graph nodes of each in sequence.
+            for script in self.inputs:
+                logger.info("Analyzing %s", script)
+                priority_scripts.append(self.graph.run_script(script))
+
+            # Analyze the script's hidden imports (named on the command line)
+            self.graph.add_hiddenimports(self.hiddenimports)
+
+            ### Post-graph hooks.
+            self.graph.process_post_graph_hooks()
+        finally:
+            self.graph.stop_parse_workers()
 
         # Update 'binaries' TOC and 'datas' TOC.
         deps_proc = DependencyProcessor(self.graph,
@@ -483,22 +534,40 @@ def assemble(self):
         if self.noarchive:
             # Create a new TOC of ``(dest path for .pyc, source for .py, type)``.
             new_toc = TOC()
-            for name, path, typecode in self.pure:
+            pycdir = os.path.join(CONF['workpath'], 'localpycos')
+            for modname, path, typecode in self.pure:
                 assert typecode == 'PYMODULE'
                 # Transform a python module name into a file name.
-                name = name.replace('.', os.sep)
+                name = modname.replace('.', os.sep)
                 # Special case: modules have an implied filename to add.
                 if os.path.splitext(os.path.basename(path))[0] == '__init__':
                     name += os.sep + '__init__'
                 # Append the extension for the compiled result.
                 name += '.py' + ('o' if sys.flags.optimize else 'c')
-                new_toc.append((name, path, typecode))
+                code = self.pure._code_cache.get(modname)
+                if code is None:
+                    new_toc.append((name, path, typecode))
+                    continue
+                # Write the code object compiled by the module graph instead
+                # of compiling the module again.
+                pyc_filename = os.path.join(pycdir, name)
+                os.makedirs(os.path.dirname(pyc_filename), exist_ok=True)
+                with open(pyc_filename, 'wb') as fh:
+                    fh.write(get_pyc_data(code, path))
+                self.datas.append((name, pyc_filename, 'DATA'))
             # Put the result of byte-compiling this TOC in datas. Mark all entries as data.
             for name, path, typecode in compile_py_files(new_toc, CONF['workpath']):
                 self.datas.append((name, path, 'DATA'))
             # Store no source in the archive.
             self.pure = TOC()
 
+        # Keep the modules loaded into the graph for the next build.
+        self.graph.save_module_cache()
+        hookutils.query_cache.save()
+        hookutils.distribution_index.save()
+        bindepend.dependency_cache.save()
+        imphook.hook_dir_cache.save()
+
         # Write warnings about missing modules.
         self._write_warnings()
         # Write debug information about hte graph
@@ -664,7 +733,17 @@ def build(spec, distpath, workpath, clean_build):
             code = compile(f.read(), spec, 'exec')
     except FileNotFoundError as e:
         raise SystemExit('spec "{}" not found'.format(spec))
-    exec(code, spec_namespace)
+    # Directories collected from are only listed again by later steps of the
+    # build once modified, and always for these the build writes to.
+    dirsnapshot.snapshot = dirsnapshot.DirectorySnapshot(
+        volatile_dirs=(CONF['workpath'], CONF['distpath']))
+    # Directories searched for libraries are only checked once per build.
+    depend_utils.checked_library_dirs = set()
+    try:
+        exec(code, spec_namespace)
+    finally:
+        dirsnapshot.snapshot = None
+        depend_utils.checked_library_dirs = None
 
 def __add_options(parser):
     parser.add_argument("--distpath", metavar="DIR",
@@ -688,12 +767,18 @@ def __add_options(parser):
                         default=False,
                         help='Clean PyInstaller cache and remove temporary '
                         'files before building.')
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help='Number of worker processes parsing and '
+                        'compiling modules during the analysis. 0 starts one '
+                        'worker per processor (default: 1, i.e. no worker '
+                        'processes)')
 
 
 def main(pyi_config, specfile, noconfirm, ascii=False, **kw):
 
     from ..config import CONF
     CONF['noconfirm'] = noconfirm
+    CONF['jobs'] = kw.get('jobs', 1)
 
     # Some modules are included if they are detected at build-time or
     # if a command-line argument is specified. (e.g. --ascii)
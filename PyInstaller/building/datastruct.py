@@ -12,7 +12,7 @@
 
 import os
 
-from PyInstaller.utils import misc
+from PyInstaller.utils import dirsnapshot, misc
 from PyInstaller.utils.misc import load_py_data_struct, save_py_data_struct
 from .. import log as logging
 from .utils import _check_guts_eq
@@ -236,16 +236,21 @@ def _check_guts(self, data, last_build):
         # There is no need to check for the files, since `Tree` is
         # only about the directory contents (which is the list of
         # files).
+        snapshot = dirsnapshot.get_snapshot()
         stack = [data['root']]
         while stack:
             d = stack.pop()
-            if misc.mtime(d) > last_build:
+            try:
+                mtime = snapshot.stat(d)[8]
+            except OSError:
+                mtime = 0
+            if mtime > last_build:
                 logger.info("Building %s because directory %s changed",
                             self.tocbasename, d)
                 return True
-            for nm in os.listdir(d):
+            for nm in snapshot.listdir(d):
                 path = os.path.join(d, nm)
-                if os.path.isdir(path):
+                if snapshot.isdir(path):
                     stack.append(path)
         self[:] = data['data']  # collected files
         return False
@@ -267,9 +272,10 @@ def assemble(self):
             else:
                 excludes.add(name)
         result = []
+        snapshot = dirsnapshot.get_snapshot()
         while stack:
             dir, prefix = stack.pop()
-            for filename in os.listdir(dir):
+            for filename in snapshot.listdir(dir):
                 if filename in excludes:
                     continue
                 ext = os.path.splitext(filename)[1]
@@ -280,7 +286,7 @@ def assemble(self):
                     resfilename = os.path.join(prefix, filename)
                 else:
                     resfilename = filename
-                if os.path.isdir(fullfilename):
+                if snapshot.isdir(fullfilename):
                     stack.append((fullfilename, resfilename))
                 else:
                     result.append((resfilename, fullfilename, self.typecode))
@@ -39,9 +39,8 @@ def __init__(self, graph, additional_files):
         self._distributions = set()
         self.__seen_distribution_paths = set()
         # Include files that were found by hooks.
-        # graph.flatten() should include only those modules that are reachable
-        # from top-level script.
-        for node in graph.flatten(start=graph._top_script_node):
+        # Include only those modules that are reachable from top-level script.
+        for node in graph.iter_reachable_nodes():
             # Update 'binaries', 'datas'
             name = node.identifier
             if name in additional_files:
@@ -14,7 +14,6 @@
 #--- functions for checking guts ---
 # NOTE: By GUTS it is meant intermediate files and data structures that
 # PyInstaller creates for bundling files and creating final executable.
-import glob
 import hashlib
 import os
 import os.path
@@ -31,7 +30,7 @@
     open_file, is_py37, is_cygwin
 from ..depend import dylib
 from ..depend.bindepend import match_binding_redirect
-from ..utils import misc
+from ..utils import dirsnapshot, misc
 from ..utils.misc import load_py_data_struct, save_py_data_struct
 from .. import log as logging
 
@@ -480,6 +479,7 @@ def format_binaries_and_datas(binaries_or_datas, workingdir=None):
           source file to be copied to this target file.
     """
     toc_datas = set()
+    snapshot = dirsnapshot.get_snapshot()
 
     for src_root_path_or_glob, trg_root_dir in binaries_or_datas:
         if not trg_root_dir:
@@ -499,7 +499,7 @@ def format_binaries_and_datas(binaries_or_datas, workingdir=None):
         else:
             # List of the absolute paths of all source paths matching the
             # current glob.
-            src_root_paths = glob.glob(src_root_path_or_glob)
+            src_root_paths = snapshot.glob(src_root_path_or_glob)
 
         if not src_root_paths:
             msg = 'Unable to find "%s" when adding binary and data files.' % (
@@ -519,16 +519,16 @@ def format_binaries_and_datas(binaries_or_datas, workingdir=None):
             raise SystemExit(msg)
 
         for src_root_path in src_root_paths:
-            if os.path.isfile(src_root_path):
+            if snapshot.isfile(src_root_path):
                 # Normalizing the result to remove redundant relative
                 # paths (e.g., removing "./" from "trg/./file").
                 toc_datas.add((
                     os.path.normpath(os.path.join(
                         trg_root_dir, os.path.basename(src_root_path))),
                     os.path.normpath(src_root_path)))
-            elif os.path.isdir(src_root_path):
+            elif snapshot.isdir(src_root_path):
                 for src_dir, src_subdir_basenames, src_file_basenames in \
-                    os.walk(src_root_path):
+                    snapshot.walk(src_root_path):
                     # Ensure the current source directory is a subdirectory
                     # of the passed top-level source directory. Since
                     # os.walk() does *NOT* follow symlinks by default, this
@@ -549,7 +549,7 @@ def format_binaries_and_datas(binaries_or_datas, workingdir=None):
 
                     for src_file_basename in src_file_basenames:
                         src_file = os.path.join(src_dir, src_file_basename)
-                        if os.path.isfile(src_file):
+                        if snapshot.isfile(src_file):
                             # Normalize the result to remove redundant relative
                             # paths (e.g., removing "./" from "trg/./file").
                             toc_datas.add((
@@ -626,22 +626,31 @@ def get_code_object(modname, filename):
         raise
 
 
-def strip_paths_in_code(co, new_filename=None):
+def strip_paths_in_filename(filename):
+    """
+    Return the passed absolute path relative to the longest entry of
+    `sys.path` or `pathex` containing it, or `None` if there is no such entry.
 
+    This is the filename embedded into code objects of the frozen application.
+    """
     # Paths to remove from filenames embedded in code objects
     replace_paths = sys.path + CONF['pathex']
     # Make sure paths end with os.sep and the longest paths are first
     replace_paths = sorted((os.path.join(f, '') for f in replace_paths),
                            key=len, reverse=True)
 
-    if new_filename is None:
-        original_filename = os.path.normpath(co.co_filename)
-        for f in replace_paths:
-            if original_filename.startswith(f):
-                new_filename = original_filename[len(f):]
-                break
+    original_filename = os.path.normpath(filename)
+    for f in replace_paths:
+        if original_filename.startswith(f):
+            return original_filename[len(f):]
+    return None
 
-        else:
+
+def strip_paths_in_code(co, new_filename=None):
+
+    if new_filename is None:
+        new_filename = strip_paths_in_filename(co.co_filename)
+        if new_filename is None:
             return co
 
     code_func = type(co)
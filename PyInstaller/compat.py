@@ -526,6 +526,18 @@ def exec_python(*args, **kwargs):
     return exec_command(*cmdargs, **kwargs)
 
 
+def start_python(*args, **kwargs):
+    """
+    Wrap starting python script in a subprocess.
+
+    Return the `subprocess.Popen` instance of the started process, whose
+    standard streams (if redirected) are binary.
+    """
+    cmdargs, kwargs = __wrap_python(args, kwargs)
+    kwargs.pop('encoding')
+    return subprocess.Popen(cmdargs, **kwargs)
+
+
 def exec_python_rc(*args, **kwargs):
     """
     Wrap running python script in a subprocess.
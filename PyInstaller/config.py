@@ -41,6 +41,7 @@
 cachedir
 hasUPX
 hiddenimports
+jobs
 noconfirm
 pathex
 ui_admin
@@ -41,15 +41,17 @@
 import sys
 import traceback
 import ast
+import heapq
 
-from copy import deepcopy
-from collections import defaultdict
+from collections import defaultdict, deque
 
 from .. import compat
 from .. import HOMEPATH, PACKAGEPATH
 from .. import log as logging
 from ..log import INFO, DEBUG, TRACE
 from ..building.datastruct import TOC
+from ..building.utils import strip_paths_in_code
+from . import graphcache
 from .imphook import AdditionalFilesCache, ModuleHookCache
 from .imphookapi import PreSafeImportModuleAPI, PreFindModulePathAPI
 from ..compat import importlib_load_source, PY3_BASE_MODULES,\
@@ -101,13 +103,30 @@ class PyiModuleGraph(ModuleGraph):
     _base_modules: list
         Dependencies for `base_library.zip` (which remain the same for every
         executable).
+    _module_cache : ModuleGraphCache
+        Cache of modules loaded by previous builds, reused for modules whose
+        files did not change, or `None` if no such cache is used.
+    _scan_cache : ImportScanCache
+        Cache of the imports parsed from module sources by previous builds,
+        reused for sources whose contents did not change, or `None` if no such
+        cache is used.
     """
 
     # Note: these levels are completely arbitrary and may be adjusted if needed.
     LOG_LEVEL_MAPPING = {0: INFO, 1: DEBUG, 2: TRACE, 3: TRACE, 4: TRACE}
 
-    def __init__(self, pyi_homepath, user_hook_dirs=(), excludes=(), **kwargs):
+    def __init__(self, pyi_homepath, user_hook_dirs=(), excludes=(),
+                 module_cache=None, scan_cache=None, **kwargs):
+        # Names of the modules whose post-graph hooks are to be run next if
+        # post-graph hooks are being processed or `None` otherwise. See
+        # process_post_graph_hooks() for details.
+        self._post_graph_hook_queue = None
+        # Indexes of the nodes reachable from a start node, keyed by the
+        # identifier of that start node. See _get_node_index() for details.
+        self._node_indexes = {}
         super(PyiModuleGraph, self).__init__(excludes=excludes, **kwargs)
+        self._module_cache = module_cache
+        self._scan_cache = scan_cache
         # Homepath to the place where is PyInstaller located.
         self._homepath = pyi_homepath
         # modulegraph Node for the main python script that is analyzed
@@ -119,13 +138,45 @@ def __init__(self, pyi_homepath, user_hook_dirs=(), excludes=(), **kwargs):
         self._reset(user_hook_dirs)
         self._analyze_base_modules()
 
+    def __getstate__(self):
+        """
+        Return the state of this graph to be copied or pickled, additionally
+        omitting all hooks, which are cached again by `_reset()`.
+        """
+        state = super(PyiModuleGraph, self).__getstate__()
+        state.update(
+            _hooks=None,
+            _hooks_pre_safe_import_module=None,
+            _hooks_pre_find_module_path=None,
+            _node_indexes={},
+            _frozen_code={},
+        )
+        return state
+
+    def save_module_cache(self):
+        """
+        Persist the modules loaded into this graph for reuse by the next build,
+        if this graph uses a module cache and/or an import scan cache.
+        """
+        if self._module_cache is not None:
+            self._module_cache.save()
+        if self._scan_cache is not None:
+            self._scan_cache.save()
+
     def _reset(self, user_hook_dirs):
         """
         Reset for another set of scripts.
         This is primary required for running the test-suite.
         """
         self._top_script_node = None
+        self._node_indexes = {}
+        # Code objects of the modules of this graph with the filenames of the
+        # frozen application, see get_frozen_code().
+        self._frozen_code = {}
         self._additional_files_cache = AdditionalFilesCache()
+        # Directories searched for modules may have changed since the
+        # previous analysis.
+        self._reset_path_index()
         # Command line, Entry Point, and then builtin hook dirs.
         self._user_hook_dirs = (
             list(user_hook_dirs) + [os.path.join(PACKAGEPATH, 'hooks')]
@@ -325,64 +376,136 @@ def process_post_graph_hooks(self):
         """
         For each imported module, run this module's post-graph hooks if any.
         """
-        # For each iteration of the infinite "while" loop below:
-        #
-        # 1. All hook() functions defined in cached hooks for imported modules
-        #    are called. This may result in new modules being imported (e.g., as
-        #    hidden imports) that were ignored earlier in the current iteration:
-        #    if this is the case, all hook() functions defined in cached hooks
-        #    for these modules will be called by the next iteration.
-        # 2. All cached hooks whose hook() functions were called are removed
-        #    from this cache. If this cache is empty, no hook() functions will
-        #    be called by the next iteration and this loop will be terminated.
-        # 3. If no hook() functions were called, this loop is terminated.
+        # Post-graph hooks are first run for all modules imported so far. This
+        # may result in new modules being imported (e.g., as hidden imports):
+        # while post-graph hooks are processed, addNode() queues the names of
+        # all newly added modules having hooks, whose hooks are run next.
+        # Thus the hook cache is swept only once rather than once for every
+        # "generation" of hidden imports.
         logger.info('Processing module hooks...')
-        while True:
-            # Set of the names of all imported modules whose post-graph hooks
-            # are run by this iteration, preventing the next iteration from re-
-            # running these hooks. If still empty at the end of this iteration,
-            # no post-graph hooks were run; thus, this loop will be terminated.
-            hooked_module_names = set()
-
-            # For each remaining hookable module and corresponding hooks...
-            for module_name, module_hooks in self._hooks.items():
-                # Graph node for this module if imported or "None" otherwise.
-                module_node = self.findNode(
-                    module_name, create_nspkg=False)
-
-                # If this module has not been imported, temporarily ignore it.
-                # This module is retained in the cache, as a subsequently run
-                # post-graph hook could import this module as a hidden import.
-                if module_node is None:
-                    continue
-
-                # If this module is unimportable, permanently ignore it.
-                if type(module_node).__name__ not in VALID_MODULE_TYPES:
-                    hooked_module_names.add(module_name)
-                    continue
-
-                # For each hook script for this module...
-                for module_hook in module_hooks:
-                    # Run this script's post-graph hook.
-                    module_hook.post_graph()
+        self._post_graph_hook_queue = deque()
+        try:
+            for module_name in list(self._hooks):
+                self._run_post_graph_hooks(module_name)
+            while self._post_graph_hook_queue:
+                self._run_post_graph_hooks(
+                    self._post_graph_hook_queue.popleft())
+        finally:
+            self._post_graph_hook_queue = None
+
+    def _run_post_graph_hooks(self, module_name):
+        """
+        Run the post-graph hooks of the module with the passed name, unless
+        this module has not been imported or its hooks have already been run.
+        """
+        # If the hooks for this module have already been run, ignore it.
+        module_hooks = self._hooks.get(module_name)
+        if module_hooks is None:
+            return
 
-                    # Cache all external dependencies listed by this script
-                    # after running this hook, which could add dependencies.
-                    self._additional_files_cache.add(
-                        module_name,
-                        module_hook.binaries,
-                        module_hook.datas)
+        # Graph node for this module if imported or "None" otherwise.
+        module_node = self.findNode(module_name, create_nspkg=False)
 
-                # Prevent this module's hooks from being run again.
-                hooked_module_names.add(module_name)
+        # If this module has not been imported, temporarily ignore it. This
+        # module is retained in the cache, as a subsequently run post-graph
+        # hook could import this module as a hidden import, which queues this
+        # module again.
+        if module_node is None:
+            return
 
-            # Prevent all post-graph hooks run above from being run again by the
-            # next iteration.
-            self._hooks.remove_modules(*hooked_module_names)
+        # Unless this module is unimportable, run its hooks. Either way, this
+        # module is permanently ignored afterwards.
+        if type(module_node).__name__ in VALID_MODULE_TYPES:
+            # For each hook script for this module...
+            for module_hook in module_hooks:
+                # Run this script's post-graph hook.
+                module_hook.post_graph()
+
+                # Cache all external dependencies listed by this script
+                # after running this hook, which could add dependencies.
+                self._additional_files_cache.add(
+                    module_name,
+                    module_hook.binaries,
+                    module_hook.datas)
+
+        # Prevent this module's hooks from being run again.
+        self._hooks.remove_modules(module_name)
+
+    def addNode(self, node):
+        """
+        Add the passed node to this graph, queueing its post-graph hooks if
+        added while post-graph hooks are processed.
+        """
+        super(PyiModuleGraph, self).addNode(node)
+        if self._node_indexes:
+            self._node_indexes = {}
+        if (self._post_graph_hook_queue is not None and
+                node.graphident in self._hooks):
+            self._post_graph_hook_queue.append(node.graphident)
+
+    # Any other change of the nodes or edges of this graph invalidates the
+    # indexes of reachable nodes as well.
+    def createReference(self, fromnode, tonode, edge_data='direct'):
+        if self._node_indexes:
+            self._node_indexes = {}
+        return super(PyiModuleGraph, self).createReference(
+            fromnode, tonode, edge_data)
+
+    def removeNode(self, node):
+        if self._node_indexes:
+            self._node_indexes = {}
+        super(PyiModuleGraph, self).removeNode(node)
+
+    def removeReference(self, fromnode, tonode):
+        if self._node_indexes:
+            self._node_indexes = {}
+        super(PyiModuleGraph, self).removeReference(fromnode, tonode)
+
+    def _get_node_index(self, start):
+        """
+        Get the index of all nodes reachable from the passed start node.
+
+        The index is a 2-tuple `(nodes, nodes_by_type)`, where `nodes` is the
+        list of these nodes in the order yielded by `flatten()` and
+        `nodes_by_type` a dictionary mapping the name of each node type to
+        the list of `(position, node)`-tuples of the nodes of that type, where
+        `position` is the position of the node in `nodes`. Indexes are
+        computed once and reused until this graph is modified.
+        """
+        start_ident = None if start is None else start.graphident
+        index = self._node_indexes.get(start_ident)
+        if index is None:
+            nodes = list(self.flatten(start=start))
+            nodes_by_type = defaultdict(list)
+            for position, node in enumerate(nodes):
+                nodes_by_type[type(node).__name__].append((position, node))
+            index = self._node_indexes[start_ident] = (nodes, nodes_by_type)
+        return index
+
+    def iter_reachable_nodes(self, type_names=None, from_top_script=True):
+        """
+        Iterate over the nodes reachable from the top-level script, in the
+        order yielded by `flatten()`.
 
-            # If no post-graph hooks were run, terminate iteration.
-            if not hooked_module_names:
-                break
+        Parameters
+        ----------
+        type_names : collection
+            Names of the node types to be selected (e.g.,
+            `PURE_PYTHON_MODULE_TYPES`) or `None` to select nodes of all types.
+        from_top_script : bool
+            If `False`, all nodes reachable from the root of this graph are
+            yielded, including those not imported by the top-level script.
+        """
+        nodes, nodes_by_type = self._get_node_index(
+            self._top_script_node if from_top_script else None)
+        if type_names is None:
+            return iter(nodes)
+        selected = [nodes_by_type[name] for name in type_names
+                    if name in nodes_by_type]
+        if len(selected) == 1:
+            return (node for _, node in selected[0])
+        return (node for _, node in heapq.merge(*selected,
+                                                key=lambda item: item[0]))
 
     def _safe_import_module(self, module_basename, module_name, parent_package):
         """
@@ -490,26 +613,44 @@ def _find_module_path(self, fullname, module_name, search_dirs):
         return super(PyiModuleGraph, self)._find_module_path(
             fullname, module_name, search_dirs)
 
+    def get_frozen_code(self, node):
+        """
+        Return the code object of the passed module with the filenames
+        embedded made relative, as in the frozen application (see
+        `strip_paths_in_code()`).
+
+        Modules are compiled with the absolute paths of their sources, which
+        modulegraph and the module caches rely on. The filenames of the code
+        object of each module are rewritten once per analysis, and the
+        rewritten code object is shared by all archives bundling the module.
+        """
+        code = self._frozen_code.get(node.identifier)
+        if code is None and node.code is not None:
+            code = strip_paths_in_code(node.code)
+            self._frozen_code[node.identifier] = code
+        return code
+
     def get_code_objects(self):
         """
         Get code objects from ModuleGraph for pure Pyhton modules. This allows
-        to avoid writing .pyc/pyo files to hdd at later stage.
+        to avoid writing .pyc/pyo files to hdd at later stage. The filenames
+        embedded into these are those of the frozen application, see
+        `get_frozen_code()`.
+
+        The code objects are handed over to the caller: the graph releases its
+        references to them, so that they are freed as soon as the caller is
+        done with them. Hence, this method should only be called once, after
+        all other consumers of the code objects (e.g., hooks and the ctypes
+        analysis) are done.
 
         :return: Dict with module name and code object.
         """
         code_dict = {}
-        mod_types = PURE_PYTHON_MODULE_TYPES
-        for node in self.flatten(start=self._top_script_node):
-            # TODO This is terrible. To allow subclassing, types should never be
-            # directly compared. Use isinstance() instead, which is safer,
-            # simpler, and accepts sets. Most other calls to type() in the
-            # codebase should also be refactored to call isinstance() instead.
-
-            # get node type e.g. Script
-            mg_type = type(node).__name__
-            if mg_type in mod_types:
-                if node.code:
-                    code_dict[node.identifier] = node.code
+        for node in self.iter_reachable_nodes(PURE_PYTHON_MODULE_TYPES):
+            if node.code:
+                code_dict[node.identifier] = self.get_frozen_code(node)
+                node.code = None
+        self._frozen_code = {}
         return code_dict
 
     def _make_toc(self, typecode=None, existing_TOC=None):
@@ -521,8 +662,9 @@ def _make_toc(self, typecode=None, existing_TOC=None):
         debugging only. Normally we return ModuleGraph nodes whose types map
         to the requested PyInstaller typecode(s) as indicated in the MODULE_TYPES_TO_TOC_DICT.
 
-        We use the ModuleGraph (really, ObjectGraph) flatten() method to
-        scan all the nodes. This is patterned after ModuleGraph.report().
+        We use the nodes reachable from the top-level script as yielded by
+        iter_reachable_nodes(), which only scans the nodes of the selected
+        types. This is patterned after ModuleGraph.report().
         """
         # Construct regular expression for matching modules that should be
         # excluded because they are bundled in base_library.zip.
@@ -534,7 +676,7 @@ def _make_toc(self, typecode=None, existing_TOC=None):
         module_filter = re.compile(regex_str)
 
         result = existing_TOC or TOC()
-        for node in self.flatten(start=self._top_script_node):
+        for node in self.iter_reachable_nodes(typecode or None):
             # Skip modules that are in base_library.zip.
             if module_filter.match(node.identifier):
                 continue
@@ -751,9 +893,12 @@ def get_co_using_ctypes(self):
         return co_dict
 
 
+# 2-tuple `(excludes, snapshot)` of the excludes and `ModuleGraphSnapshot` of
+# the first module graph initialized by this process, or `None`.
 _cached_module_graph_ = None
 
-def initialize_modgraph(excludes=(), user_hook_dirs=()):
+def initialize_modgraph(excludes=(), user_hook_dirs=(), module_cache=None,
+                        scan_cache=None, snapshot_dir=None):
     """
     Create the cached module graph.
 
@@ -770,6 +915,16 @@ def initialize_modgraph(excludes=(), user_hook_dirs=()):
         List of the absolute paths of all directories containing user-defined
         hooks for the current application or `None` if no such directories were
         specified.
+    module_cache : ModuleGraphCache
+        Cache of modules loaded by previous builds to be used by the graph, or
+        `None` if no such cache is to be used.
+    scan_cache : ImportScanCache
+        Cache of the imports parsed from module sources to be used by the
+        graph, or `None` if no such cache is to be used.
+    snapshot_dir : str
+        Absolute path of the directory to persist a snapshot of the graph
+        created for 'base_library.zip' to and to restore this graph from in
+        subsequent processes, or `None` if no snapshot is to be persisted.
 
     Returns
     ----------
@@ -786,10 +941,25 @@ def initialize_modgraph(excludes=(), user_hook_dirs=()):
     # `pyi_modgraph` calls this function with empty excludes, creating
     # a graph suitable for the huge majority of tests.
     global _cached_module_graph_
-    if (_cached_module_graph_ and
-        _cached_module_graph_._excludes == excludes):
+    snapshot = None
+    if _cached_module_graph_ and _cached_module_graph_[0] == excludes:
         logger.info('Reusing cached module dependency graph...')
-        graph = deepcopy(_cached_module_graph_)
+        snapshot = _cached_module_graph_[1]
+    elif snapshot_dir:
+        # Else, reuse the graph created by a previous build if any.
+        snapshot_filename = graphcache.get_base_graph_snapshot_filename(
+            snapshot_dir, excludes, user_hook_dirs)
+        snapshot = graphcache.ModuleGraphSnapshot.load(snapshot_filename)
+        if snapshot is not None:
+            logger.info('Restoring module dependency graph from %s...',
+                        snapshot_filename)
+            if not _cached_module_graph_:
+                _cached_module_graph_ = (excludes, snapshot)
+
+    if snapshot is not None:
+        graph = snapshot.restore()
+        graph._module_cache = module_cache
+        graph._scan_cache = scan_cache
         graph._reset(user_hook_dirs)
         return graph
 
@@ -802,18 +972,20 @@ def initialize_modgraph(excludes=(), user_hook_dirs=()):
         # get_implies() are hidden imports known by modulgraph.
         implies=get_implies(),
         user_hook_dirs=user_hook_dirs,
+        module_cache=module_cache,
+        scan_cache=scan_cache,
         )
 
-    if not _cached_module_graph_:
-        # Only cache the first graph, see above for explanation.
-        logger.info('Caching module dependency graph...')
-        # cache a deep copy of the graph
-        _cached_module_graph_ = deepcopy(graph)
-        # Clear data which does not need to be copied from teh cached graph
-        # since it will be reset by ``PyiModulegraph._reset()`` anyway.
-        _cached_module_graph_._hooks = None
-        _cached_module_graph_._hooks_pre_safe_import_module = None
-        _cached_module_graph_._hooks_pre_find_module_path = None
+    if not _cached_module_graph_ or snapshot_dir:
+        # Snapshots omit all caches and hooks, which are specific to the
+        # current build and reset by ``PyiModulegraph._reset()`` anyway.
+        snapshot = graphcache.ModuleGraphSnapshot.create(graph)
+        if not _cached_module_graph_:
+            # Only cache the first graph, see above for explanation.
+            logger.info('Caching module dependency graph...')
+            _cached_module_graph_ = (excludes, snapshot)
+        if snapshot_dir:
+            snapshot.save(snapshot_filename)
 
     return graph
 
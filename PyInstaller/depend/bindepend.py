@@ -14,27 +14,139 @@
 """
 
 import ctypes.util
+import functools
 import os
 import re
 import sys
-from glob import glob
+import sysconfig
 # Required for extracting eggs.
 import zipfile
 import collections
+from concurrent.futures import ThreadPoolExecutor
 
 from .. import compat
 from ..compat import (is_win, is_win_10, is_unix,
                       is_aix, is_solar, is_cygwin, is_hpux,
                       is_darwin, is_freebsd, is_openbsd, is_venv, is_conda,
                       base_prefix, PYDYLIB_NAMES)
-from . import dylib, utils
+from . import dylib, elf, utils
 
 from .. import log as logging
+from ..utils.persistentcache import PersistentCache, file_stamp
 from ..utils.win32 import winutils
 
 logger = logging.getLogger(__name__)
 
-seen = set()
+
+class BinaryDependencyCache(PersistentCache):
+    """
+    Cache of the dependencies of the binaries analyzed by `getImports()`,
+    shared by all builds.
+
+    Records are keyed by the real path of each binary and the inputs of the
+    resolution of its dependencies: the search path of the build and the
+    environment variables the dynamic linker searches. A record is only
+    reused if the identity of the binary (its inode, size and modification
+    time) is unchanged, as well as all dependencies resolved and the ld.so
+    cache. Libraries added to the directories searched before those of the
+    resolved dependencies (e.g., to an `RPATH`) are not noticed.
+
+    Parameters
+    ----------
+    filename : str
+        Absolute path of the file this cache is persisted to.
+    """
+
+    description = 'binary dependency cache'
+
+    # Files whose changes may affect the dependencies of all binaries.
+    _GLOBAL_DEPENDENCIES = ('/etc/ld.so.cache',)
+    # Environment variables searched by the dynamic linker.
+    _ENV_VARS = ('LD_LIBRARY_PATH', 'DYLD_LIBRARY_PATH',
+                 'DYLD_FALLBACK_LIBRARY_PATH', 'DYLD_FRAMEWORK_PATH',
+                 'PYINSTALLER_USE_LDD')
+
+    def __init__(self, filename):
+        super(BinaryDependencyCache, self).__init__(filename)
+        self._global_stamps = None
+
+    def _key(self, filename):
+        """
+        Return the key of the records of the passed binary and its current
+        identity, or `(None, None)` if this binary cannot be accessed.
+        """
+        from ..config import CONF
+        try:
+            realpath = os.path.realpath(filename)
+            st = os.stat(realpath)
+        except (OSError, ValueError):
+            return None, None
+        key = (realpath, tuple(CONF.get('pathex') or ()),
+               tuple(compat.getenv(name) for name in self._ENV_VARS))
+        return key, (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _get_global_stamps(self):
+        # These files are assumed to not change during a build.
+        if self._global_stamps is None:
+            self._global_stamps = [file_stamp(path)
+                                   for path in self._GLOBAL_DEPENDENCIES]
+        return self._global_stamps
+
+    def get(self, filename):
+        """
+        Return the dependencies of the passed binary as returned by
+        `getImports()`, or `None` if there is no valid record for it.
+        """
+        key, identity = self._key(filename)
+        if key is None:
+            return None
+        record = self._new_records.get(key) or self._records.get(key)
+        if record is None:
+            return None
+        record_identity, global_stamps, imports, stamps = record
+        if record_identity != identity or \
+                global_stamps != self._get_global_stamps():
+            return None
+        for path, stamp in stamps.items():
+            if file_stamp(path) != stamp:
+                logger.debug('Dependencies of %s outdated, as %s changed',
+                             filename, path)
+                return None
+        return imports.copy()
+
+    def put(self, filename, imports):
+        """
+        Record the passed dependencies of the passed binary as returned by
+        `getImports()`, either names or paths of libraries.
+        """
+        key, identity = self._key(filename)
+        if key is None:
+            return
+        # Dependencies are names of libraries on Windows.
+        stamps = {path: file_stamp(path) for path in imports
+                  if os.path.isabs(path)}
+        self._new_records[key] = (identity, self._get_global_stamps(),
+                                  imports.copy(), stamps)
+
+
+# Cache of the dependencies of binaries analyzed by previous builds, set by
+# the build (see `BinaryDependencyCache`). If `None`, the dependencies of all
+# binaries are found again.
+dependency_cache = None
+
+
+def _is_glibc():
+    try:
+        return (os.confstr('CS_GNU_LIBC_VERSION') or '').startswith('glibc')
+    except (AttributeError, ValueError, OSError):
+        return False
+
+
+# Whether the dependencies of ELF binaries are found by running `ldd` rather
+# than by reading these binaries, see `_getImports_elf()`. Setting the
+# environment variable PYINSTALLER_USE_LDD to `1` forces using `ldd`.
+USE_LDD = not (compat.is_linux and _is_glibc()) or \
+    compat.getenv('PYINSTALLER_USE_LDD') == '1'
 
 # Import windows specific stuff.
 if is_win:
@@ -196,7 +308,8 @@ def matchDLLArch(filename):
     return match_arch
 
 
-def Dependencies(lTOC, xtrapath=None, manifest=None, redirects=None):
+def Dependencies(lTOC, xtrapath=None, manifest=None, redirects=None,
+                 max_workers=None):
     """
     Expand LTOC to include all the closure of binary dependencies.
 
@@ -210,24 +323,47 @@ def Dependencies(lTOC, xtrapath=None, manifest=None, redirects=None):
     `redirects` may be a list. Any assembly redirects found via policy files will
     be added to the list as BindingRedirect objects so they can later be used
     to modify any manifests that reference the redirected assembly.
+
+    The closure is walked breadth-first, the dependencies of all entries of
+    each level being searched concurrently by up to `max_workers` threads
+    (see `concurrent.futures.ThreadPoolExecutor`). The entries found are
+    appended in the same order as by walking the closure serially.
     """
     # Extract all necessary binary modules from Python eggs to be included
     # directly with PyInstaller.
     lTOC = _extract_from_egg(lTOC)
 
-    for nm, pth, typ in lTOC:
-        if nm.upper() in seen:
-            continue
-        logger.debug("Analyzing %s", pth)
-        seen.add(nm.upper())
-        if is_win:
-            for ftocnm, fn in getAssemblyFiles(pth, manifest, redirects):
-                lTOC.append((ftocnm, fn, 'BINARY'))
-        for lib, npth in selectImports(pth, xtrapath):
-            if lib.upper() in seen or npth.upper() in seen:
-                continue
-            seen.add(npth.upper())
-            lTOC.append((lib, npth, 'BINARY'))
+    # Upper-cased names of the entries analyzed and paths of the dependencies
+    # added. Only updated by this thread, while merging the results of each
+    # level in order. The threads searching dependencies filter these with a
+    # snapshot of this set taken before each level.
+    seen = set()
+    start = 0
+    with ThreadPoolExecutor(max_workers) as executor:
+        while start < len(lTOC):
+            level = []
+            for nm, pth, typ in lTOC[start:]:
+                if nm.upper() in seen:
+                    continue
+                logger.debug("Analyzing %s", pth)
+                seen.add(nm.upper())
+                level.append(pth)
+            start = len(lTOC)
+            level_seen = frozenset(seen)
+            imports = executor.map(
+                lambda pth: selectImports(pth, xtrapath, level_seen), level)
+            for pth, pth_imports in zip(level, imports):
+                if is_win:
+                    # Assemblies are added to the manifest and the redirects
+                    # in order.
+                    for ftocnm, fn in getAssemblyFiles(pth, manifest,
+                                                       redirects, seen):
+                        lTOC.append((ftocnm, fn, 'BINARY'))
+                for lib, npth in pth_imports:
+                    if lib.upper() in seen or npth.upper() in seen:
+                        continue
+                    seen.add(npth.upper())
+                    lTOC.append((lib, npth, 'BINARY'))
 
     return lTOC
 
@@ -382,7 +518,7 @@ def getAssemblies(pth):
     return rv
 
 
-def getAssemblyFiles(pth, manifest=None, redirects=None):
+def getAssemblyFiles(pth, manifest=None, redirects=None, seen=None):
     """
     Find all assemblies that are dependencies of the given binary and return the files
     that make up the assemblies as (name, fullpath) tuples.
@@ -395,8 +531,14 @@ def getAssemblyFiles(pth, manifest=None, redirects=None):
     applied when searching for assemblies, BindingRedirect objects are appended to this
     list.
 
+    `seen` may be a set of the upper-cased ids of assemblies and names and paths
+    of files already collected, which are skipped. It is updated with those
+    returned.
+
     Return a list of pairs (name, fullpath)
     """
+    if seen is None:
+        seen = set()
     rv = []
     if manifest:
         _depNames = set(dep.name for dep in manifest.dependentAssemblies)
@@ -485,10 +627,12 @@ def getAssemblyFiles(pth, manifest=None, redirects=None):
     return rv
 
 
-def selectImports(pth, xtrapath=None):
+def selectImports(pth, xtrapath=None, seen=()):
     """
     Return the dependencies of a binary that should be included.
 
+    Dependencies whose upper-cased names or paths are in `seen` are skipped.
+
     Return a list of pairs (name, fullpath)
     """
     rv = []
@@ -498,6 +642,9 @@ def selectImports(pth, xtrapath=None):
         assert isinstance(xtrapath, list)
         xtrapath = [os.path.dirname(pth)] + xtrapath  # make a copy
     dlls = getImports(pth)
+    if isinstance(dlls, set):
+        # Keep the order of the dependencies reproducible.
+        dlls = sorted(dlls)
     for lib in dlls:
         if lib.upper() in seen:
             continue
@@ -607,6 +754,197 @@ def _getImports_ldd(pth):
     return rslt
 
 
+# Mapping the paths of ELF binaries read to 2-tuples `(stamp, elf_info)`.
+_elf_info_cache = {}
+
+
+def _get_elf_info(pth):
+    """
+    Return the `elf.ELFInfo` of the passed ELF binary, reading it only once
+    as long as it is unchanged.
+    """
+    st = os.stat(pth)
+    stamp = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    cached = _elf_info_cache.get(pth)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    info = elf.get_elf_info(pth)
+    _elf_info_cache[pth] = (stamp, info)
+    return info
+
+
+def _get_elf_search_dirs(paths, origin):
+    """
+    Return the passed directories of a `DT_RPATH` or `DT_RUNPATH` entry or
+    `LD_LIBRARY_PATH` with `$ORIGIN` expanded to the passed directory.
+    """
+    dirs = []
+    for path in paths:
+        path = path.replace('${ORIGIN}', '$ORIGIN')
+        if origin is not None:
+            path = path.replace('$ORIGIN', origin)
+        # Skip other dynamic string tokens (`$LIB`, `$PLATFORM`), whose value
+        # depends on the build of glibc.
+        if '$' in path:
+            continue
+        # Empty entries denote the current directory.
+        dirs.append(path or '.')
+    return dirs
+
+
+def _get_elf_default_dirs(elf_class):
+    """
+    Return the directories searched by the dynamic linker for libraries of
+    the passed ELF class after the ones listed by the ld.so cache.
+    """
+    dirs = []
+    multiarch = sysconfig.get_config_var('MULTIARCH')
+    native_class = elf.ELFCLASS64 if sys.maxsize > 2**32 else elf.ELFCLASS32
+    if multiarch and elf_class == native_class:
+        dirs += [os.path.join('/lib', multiarch),
+                 os.path.join('/usr/lib', multiarch)]
+    if elf_class == elf.ELFCLASS64:
+        dirs += ['/lib64', '/usr/lib64']
+    return dirs + ['/lib', '/usr/lib']
+
+
+def _getImports_elf(pth):
+    """
+    Find the binary dependencies of PTH.
+
+    This implementation is for Linux with glibc. It reads the dynamic section
+    of ELF binaries and searches for the libraries these require like the
+    dynamic linker does (see ld.so(8)), yielding the same libraries as `ldd`:
+
+    1. Libraries named by a path are used as is.
+    1. The directories listed by `DT_RPATH` of the requiring binary and of the
+       binaries loading it, unless the requiring binary has a `DT_RUNPATH`.
+    1. The directories listed by `LD_LIBRARY_PATH`.
+    1. The directories listed by `DT_RUNPATH` of the requiring binary.
+    1. The ld.so cache, see `utils.load_ldconfig_cache()`.
+    1. The default directories, see `_get_elf_default_dirs()`.
+
+    Libraries of another architecture than the requiring binary are skipped.
+    Unlike the dynamic linker, the hardware capability subdirectories of
+    these directories (e.g., `glibc-hwcaps/x86-64-v3`) are not searched.
+
+    Raises
+    ----------
+    ValueError
+        If PTH is no ELF binary or is malformed.
+    OSError
+        If PTH cannot be read.
+    """
+    info = _get_elf_info(pth)
+    arch = info[:3]
+
+    def _is_compatible(lib):
+        try:
+            return os.path.isfile(lib) and _get_elf_info(lib)[:3] == arch
+        except (OSError, ValueError):
+            return False
+
+    ld_library_path = compat.getenv('LD_LIBRARY_PATH')
+    ld_library_path = _get_elf_search_dirs(
+        re.split('[:;]', ld_library_path) if ld_library_path else [], None)
+
+    def _find_library(name, rpath_dirs, runpath_dirs, nodeflib):
+        if '/' in name:
+            return name if os.path.exists(name) else None
+        for path in rpath_dirs + ld_library_path + runpath_dirs:
+            lib = os.path.join(path, name)
+            if _is_compatible(lib):
+                return lib
+        if nodeflib:
+            return None
+        utils.load_ldconfig_cache()
+        lib = utils.LDCONFIG_CACHE.get(name)
+        if lib and _is_compatible(lib):
+            return lib
+        for path in _get_elf_default_dirs(info.elf_class):
+            lib = os.path.join(path, name)
+            if _is_compatible(lib):
+                return lib
+        return None
+
+    # Map the names and file identities of the binaries loaded to their
+    # paths. The dynamic linker itself is already loaded and not listed by
+    # `ldd` as a dependency.
+    loaded_names = {}
+    loaded_files = set()
+    interpreter = info.interpreter or _get_elf_interpreter()
+    if interpreter:
+        try:
+            loaded_names[_get_elf_info(interpreter).soname] = interpreter
+            loaded_files.add(_get_file_id(interpreter))
+        except (OSError, ValueError):
+            pass
+        loaded_names[os.path.basename(interpreter)] = interpreter
+    loaded_files.add(_get_file_id(pth))
+
+    rslt = set()
+    # Binaries are loaded breadth-first, each with the expanded `DT_RPATH`
+    # directories of the binaries which loaded it.
+    pending = collections.deque([(pth, info, [])])
+    while pending:
+        path, path_info, loader_rpath_dirs = pending.popleft()
+        origin = os.path.dirname(os.path.abspath(path))
+        if path_info.runpath is not None:
+            # `DT_RPATH` is ignored by binaries with a `DT_RUNPATH`, but still
+            # searched for the binaries these load.
+            own_rpath_dirs = rpath_dirs = []
+            runpath_dirs = _get_elf_search_dirs(path_info.runpath, origin)
+        else:
+            own_rpath_dirs = _get_elf_search_dirs(path_info.rpath or (),
+                                                  origin)
+            rpath_dirs = own_rpath_dirs + loader_rpath_dirs
+            runpath_dirs = []
+        nodeflib = bool(path_info.flags_1 & elf.DF_1_NODEFLIB)
+        for name in path_info.needed:
+            if name in loaded_names:
+                continue
+            lib = _find_library(name, rpath_dirs, runpath_dirs, nodeflib)
+            if lib is None:
+                logger.error('Can not find %s (needed by %s)', name, pth)
+                loaded_names[name] = None
+                continue
+            file_id = _get_file_id(lib)
+            loaded_names[name] = lib
+            if file_id in loaded_files:
+                continue
+            loaded_files.add(file_id)
+            rslt.add(lib)
+            lib_info = _get_elf_info(lib)
+            if lib_info.soname:
+                loaded_names.setdefault(lib_info.soname, lib)
+            pending.append((lib, lib_info, own_rpath_dirs + loader_rpath_dirs))
+    return rslt
+
+
+def _get_file_id(path):
+    st = os.stat(path)
+    return st.st_dev, st.st_ino
+
+
+def _get_elf_interpreter():
+    """
+    Return the path of the dynamic linker of the running Python interpreter,
+    which loads the binaries analyzed, or `None` if unknown.
+    """
+    global _elf_interpreter
+    if _elf_interpreter is None:
+        try:
+            _elf_interpreter = _get_elf_info(
+                getattr(sys, '_base_executable', sys.executable)).interpreter
+        except (OSError, ValueError):
+            pass
+        _elf_interpreter = _elf_interpreter or ''
+    return _elf_interpreter
+
+
+_elf_interpreter = None
+
+
 def _getImports_macholib(pth):
     """
     Find the binary dependencies of PTH.
@@ -719,7 +1057,21 @@ def _getImports_macholib(pth):
 def getImports(pth):
     """
     Forwards to the correct getImports implementation for the platform.
+
+    The dependencies found are recorded in `dependency_cache`, if set, and
+    reused as long as the binary and these dependencies are unchanged.
     """
+    if dependency_cache is not None:
+        imports = dependency_cache.get(pth)
+        if imports is not None:
+            return imports
+    imports = _getImports(pth)
+    if dependency_cache is not None:
+        dependency_cache.put(pth, imports)
+    return imports
+
+
+def _getImports(pth):
     if is_win or is_cygwin:
         if pth.lower().endswith(".manifest"):
             return []
@@ -739,8 +1091,53 @@ def getImports(pth):
             return []
     elif is_darwin:
         return _getImports_macholib(pth)
-    else:
+    elif USE_LDD:
         return _getImports_ldd(pth)
+    else:
+        try:
+            return _getImports_elf(pth)
+        except (OSError, ValueError) as e:
+            logger.debug('Unable to read ELF binary %s, using ldd: %s',
+                         pth, e)
+            return _getImports_ldd(pth)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_library_default_dirs():
+    """
+    Return the list of the known safe directories `findLibrary()` searches
+    libraries in, after those listed by LD_LIBRARY_PATH and the ld.so cache.
+    """
+    # Architecture independent locations.
+    paths = ['/lib', '/usr/lib']
+    # Architecture dependent locations.
+    if compat.architecture == '32bit':
+        paths.extend(['/lib32', '/usr/lib32', '/usr/lib/i386-linux-gnu'])
+    else:
+        paths.extend(['/lib64', '/usr/lib64', '/usr/lib/x86_64-linux-gnu'])
+
+    # On Debian/Ubuntu /usr/bin/python is linked statically with libpython.
+    # Newer Debian/Ubuntu with multiarch support putsh the libpythonX.Y.so
+    # To paths like /usr/lib/i386-linux-gnu/.
+    # 'multiarchsubdir' works on Debian/Ubuntu only.
+    arch_subdir = sysconfig.get_config_var('multiarchsubdir')
+    # Ignore if None is returned.
+    if arch_subdir:
+        arch_subdir = os.path.basename(arch_subdir)
+        paths.append(os.path.join('/usr/lib', arch_subdir))
+    else:
+        logger.debug('Multiarch directory not detected.')
+
+    if is_aix:
+        paths.append('/opt/freeware/lib')
+    elif is_hpux:
+        if compat.architecture == '32bit':
+            paths.append('/usr/local/lib/hpux32')
+        else:
+            paths.append('/usr/local/lib/hpux64')
+    elif is_freebsd or is_openbsd:
+        paths.append('/usr/local/lib')
+    return paths
 
 
 def findLibrary(name):
@@ -749,12 +1146,13 @@ def findLibrary(name):
 
     Emulate the algorithm used by dlopen.
     `name`must include the prefix, e.g. ``libpython2.4.so``
+
+    If several libraries in a directory match `name`, the best match is
+    chosen, see `utils.find_library_in_dirs()`.
     """
     assert is_unix, ("Current implementation for Unix only (Linux, Solaris, "
                      "AIX, FreeBSD)")
 
-    lib = None
-
     # Look in the LD_LIBRARY_PATH according to platform.
     if is_aix:
         lp = compat.getenv('LIBPATH', '')
@@ -762,11 +1160,7 @@ def findLibrary(name):
         lp = compat.getenv('DYLD_LIBRARY_PATH', '')
     else:
         lp = compat.getenv('LD_LIBRARY_PATH', '')
-    for path in lp.split(os.pathsep):
-        libs = glob(os.path.join(path, name + '*'))
-        if libs:
-            lib = libs[0]
-            break
+    lib = utils.find_library_in_dirs(name, lp.split(os.pathsep))
 
     # Look in /etc/ld.so.cache
     # Solaris does not have /sbin/ldconfig. Just check if this file exists.
@@ -778,46 +1172,7 @@ def findLibrary(name):
 
     # Look in the known safe paths.
     if lib is None:
-        # Architecture independent locations.
-        paths = ['/lib', '/usr/lib']
-        # Architecture dependent locations.
-        if compat.architecture == '32bit':
-            paths.extend(['/lib32', '/usr/lib32', '/usr/lib/i386-linux-gnu'])
-        else:
-            paths.extend(['/lib64', '/usr/lib64', '/usr/lib/x86_64-linux-gnu'])
-
-
-        # On Debian/Ubuntu /usr/bin/python is linked statically with libpython.
-        # Newer Debian/Ubuntu with multiarch support putsh the libpythonX.Y.so
-        # To paths like /usr/lib/i386-linux-gnu/.
-        try:
-            # Module available only in Python 2.7+
-            import sysconfig
-            # 'multiarchsubdir' works on Debian/Ubuntu only in Python 2.7 and 3.3+.
-            arch_subdir = sysconfig.get_config_var('multiarchsubdir')
-            # Ignore if None is returned.
-            if arch_subdir:
-                arch_subdir = os.path.basename(arch_subdir)
-                paths.append(os.path.join('/usr/lib', arch_subdir))
-            else:
-                logger.debug('Multiarch directory not detected.')
-        except ImportError:
-            logger.debug('Multiarch directory not detected.')
-
-        if is_aix:
-            paths.append('/opt/freeware/lib')
-        elif is_hpux:
-            if compat.architecture == '32bit':
-                paths.append('/usr/local/lib/hpux32')
-            else:
-                paths.append('/usr/local/lib/hpux64')
-        elif is_freebsd or is_openbsd:
-            paths.append('/usr/local/lib')
-        for path in paths:
-            libs = glob(os.path.join(path, name + '*'))
-            if libs:
-                lib = libs[0]
-                break
+        lib = utils.find_library_in_dirs(name, _get_library_default_dirs())
 
     # give up :(
     if lib is None:
@@ -840,6 +1195,11 @@ def _get_so_name(filename):
 
     Soname is usefull whene there are multiple symplinks to one library.
     """
+    try:
+        # Libraries without soname are referred to by their file name.
+        return _get_elf_info(filename).soname or os.path.basename(filename)
+    except (OSError, ValueError):
+        pass
     # TODO verify that objdump works on other unixes and not Linux only.
     cmd = ["objdump", "-p", filename]
     pattern = r'\s+SONAME\s+([^\s]+)'
@@ -875,7 +1235,8 @@ def _find_lib_in_libdirs(*libdirs):
         for libdir in libdirs:
             for name in PYDYLIB_NAMES:
                 full_path = os.path.join(libdir, name)
-                if os.path.exists(full_path):
+                if utils.has_library_dir_entry(libdir, name) and \
+                        os.path.exists(full_path):
                     return full_path
         return None
 
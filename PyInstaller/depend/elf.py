@@ -0,0 +1,172 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2020, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License (version 2
+# or later) with exception for distributing the bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#
+# SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
+#-----------------------------------------------------------------------------
+
+"""
+Read the dynamic linking information of ELF binaries, as used by the dynamic
+linker to find their dependencies, without running `ldd` or `objdump`.
+"""
+
+import collections
+import struct
+
+# Values of `EI_CLASS`.
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+
+# Values of `EI_DATA`.
+_BYTE_ORDERS = {1: '<', 2: '>'}
+
+# Program header types.
+PT_LOAD = 1
+PT_DYNAMIC = 2
+PT_INTERP = 3
+
+# Dynamic section tags.
+DT_NULL = 0
+DT_NEEDED = 1
+DT_STRTAB = 5
+DT_STRSZ = 10
+DT_SONAME = 14
+DT_RPATH = 15
+DT_RUNPATH = 29
+DT_FLAGS_1 = 0x6ffffffb
+
+# Flags of `DT_FLAGS_1`.
+DF_1_NODEFLIB = 0x800
+
+# Formats of the ELF header (after `e_ident`), of program headers and of the
+# entries of the dynamic section, per ELF class.
+_EHDR_FORMATS = {ELFCLASS32: 'HHIIIIIHHHHHH', ELFCLASS64: 'HHIQQQIHHHHHH'}
+_DYN_FORMATS = {ELFCLASS32: 'iI', ELFCLASS64: 'qQ'}
+
+ELFInfo = collections.namedtuple('ELFInfo', [
+    'elf_class', 'byte_order', 'machine', 'interpreter', 'needed', 'soname',
+    'rpath', 'runpath', 'flags_1'])
+ELFInfo.__doc__ = """
+Dynamic linking information of an ELF binary.
+
+`elf_class`, `byte_order` and `machine` identify the architecture of this
+binary, which only loads libraries of the same architecture. `interpreter` is
+the path of the dynamic linker requested by executables. `needed` is the list
+of the names of the libraries required by this binary, in load order. `rpath`
+and `runpath` are the lists of the directories these libraries are searched
+for in, not expanded yet (e.g., containing `$ORIGIN`). All of these are `None`
+or empty if undefined.
+"""
+
+
+def _unpack(fmt, data, offset=0):
+    try:
+        return struct.unpack_from(fmt, data, offset)
+    except struct.error as e:
+        raise ValueError('Truncated ELF file: %s' % e) from e
+
+
+def _read(fp, offset, size):
+    fp.seek(offset)
+    data = fp.read(size)
+    if len(data) != size:
+        raise ValueError('Truncated ELF file')
+    return data
+
+
+def get_elf_info(filename):
+    """
+    Return the `ELFInfo` of the passed ELF binary.
+
+    Like the dynamic linker, only the program headers of this binary are read,
+    so stripped binaries are supported.
+
+    Raises
+    ----------
+    ValueError
+        If this file is no ELF binary or is malformed.
+    OSError
+        If this file cannot be read.
+    """
+    with open(filename, 'rb') as fp:
+        ident = fp.read(16)
+        if len(ident) != 16 or ident[:4] != b'\x7fELF':
+            raise ValueError('%s is no ELF file' % filename)
+        elf_class = ident[4]
+        byte_order = _BYTE_ORDERS.get(ident[5])
+        if elf_class not in _EHDR_FORMATS or byte_order is None:
+            raise ValueError('Unsupported ELF file %s' % filename)
+        ehdr_format = byte_order + _EHDR_FORMATS[elf_class]
+        (_, machine, _, _, phoff, _, _, _, phentsize, phnum, _, _, _
+         ) = _unpack(ehdr_format, _read(fp, 16, struct.calcsize(ehdr_format)))
+        if phnum == 0xffff:
+            # The actual count is stored in the first section header.
+            raise ValueError('Too many program headers in %s' % filename)
+
+        segments = []
+        dynamic = interpreter = None
+        phdrs = _read(fp, phoff, phentsize * phnum)
+        for i in range(phnum):
+            if elf_class == ELFCLASS64:
+                p_type, _, offset, vaddr, _, filesz, _, _ = _unpack(
+                    byte_order + 'IIQQQQQQ', phdrs, i * phentsize)
+            else:
+                p_type, offset, vaddr, _, filesz, _, _, _ = _unpack(
+                    byte_order + 'IIIIIIII', phdrs, i * phentsize)
+            if p_type == PT_LOAD:
+                segments.append((vaddr, offset, filesz))
+            elif p_type == PT_DYNAMIC:
+                dynamic = (offset, filesz)
+            elif p_type == PT_INTERP:
+                interpreter = _read(fp, offset, filesz).split(b'\0', 1)[0]
+                interpreter = interpreter.decode('utf-8', 'surrogateescape')
+
+        tags = collections.defaultdict(list)
+        if dynamic is not None:
+            dyn_format = byte_order + _DYN_FORMATS[elf_class]
+            dyn_size = struct.calcsize(dyn_format)
+            data = _read(fp, dynamic[0], dynamic[1])
+            for offset in range(0, len(data) - dyn_size + 1, dyn_size):
+                tag, value = _unpack(dyn_format, data, offset)
+                if tag == DT_NULL:
+                    break
+                tags[tag].append(value)
+
+        # Strings are offsets into the string table, whose address has to be
+        # mapped to its offset in the file.
+        strtab = None
+        if DT_STRTAB in tags:
+            address = tags[DT_STRTAB][0]
+            for vaddr, offset, filesz in segments:
+                if vaddr <= address < vaddr + filesz:
+                    size = min(tags[DT_STRSZ][0] if DT_STRSZ in tags
+                               else filesz, vaddr + filesz - address)
+                    strtab = _read(fp, offset + address - vaddr, size)
+                    break
+
+    def _strings(tag):
+        strings = []
+        for index in tags.get(tag, ()):
+            if strtab is None or index >= len(strtab):
+                raise ValueError('Invalid string table in %s' % filename)
+            end = strtab.find(b'\0', index)
+            string = strtab[index:end if end >= 0 else len(strtab)]
+            strings.append(string.decode('utf-8', 'surrogateescape'))
+        return strings
+
+    def _paths(tag):
+        # Several entries are concatenated, like the dynamic linker does.
+        return [path for string in _strings(tag)
+                for path in string.split(':')]
+
+    soname = _strings(DT_SONAME)
+    return ELFInfo(
+        elf_class, byte_order, machine, interpreter, _strings(DT_NEEDED),
+        soname[0] if soname else None,
+        _paths(DT_RPATH) if DT_RPATH in tags else None,
+        _paths(DT_RUNPATH) if DT_RUNPATH in tags else None,
+        tags[DT_FLAGS_1][0] if DT_FLAGS_1 in tags else 0)
@@ -0,0 +1,308 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2020, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License (version 2
+# or later) with exception for distributing the bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#
+# SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
+#-----------------------------------------------------------------------------
+
+"""
+Persistent caches speeding up the construction of the module graph across
+consecutive builds.
+"""
+
+import hashlib
+import io
+import marshal
+import os
+import pickle
+import sys
+import types
+
+from .. import log as logging
+from ..lib.modulegraph import modulegraph
+from ..utils.persistentcache import PersistentCache, file_stamp, \
+    get_header, replace_file
+
+logger = logging.getLogger(__name__)
+
+
+class ModuleGraphCache(PersistentCache):
+    """
+    Cache of the modules loaded into a module graph, persisted between builds.
+
+    For each module loaded from a file, the cache records the class of its
+    graph node, its code object, the names of its global attributes and the
+    imports parsed from it. Records are keyed by the absolute path of the
+    module and are only reused if the module name, size and modification time
+    of that file are unchanged, thus only modified modules get parsed and
+    compiled again.
+
+    Edges are not stored: the recorded imports of a reused module are
+    replayed through the regular import machinery of the graph. Thus
+    imports are always resolved against the current search path, including
+    modules that changed, appeared or vanished meanwhile, and pre-find module
+    path and pre-safe import module hooks as well as excludes keep working.
+
+    Parameters
+    ----------
+    filename : str
+        Absolute path of the file this cache is persisted to.
+    """
+
+    description = 'module graph cache'
+
+    def save(self):
+        """
+        Persist the records used by the current analysis. Only these are
+        persisted, so modules no longer used by the application are dropped
+        from the cache.
+        """
+        self._write(self._new_records)
+
+    def get(self, module_name, pathname):
+        """
+        Return the cached state of the module with the passed name loaded from
+        the passed file, or `None` if there is no valid record for it.
+
+        Returns
+        ----------
+        tuple
+            4-tuple `(cls, code, global_attr_names, imports)`, where `cls` is
+            the class of the graph node, `code` the code object of the module,
+            `global_attr_names` the set of its global attributes and `imports`
+            the imports parsed from the module as returned by
+            `modulegraph._pack_imports()`.
+        """
+        record = self._get_record(module_name, pathname)
+        if record is None:
+            return None
+        _, _, cls_name, code, global_attr_names, imports = record
+        # Mark this record as used, see save().
+        self._new_records[pathname] = record
+        return (getattr(modulegraph, cls_name), code, global_attr_names,
+                imports)
+
+    def contains(self, module_name, pathname):
+        """
+        Return whether there is a valid record of the module with the passed
+        name loaded from the passed file.
+
+        Unlike `get()`, the record is not marked as used, so it is still
+        dropped from the cache if that module is not loaded by the current
+        analysis (e.g., if it was only looked up speculatively).
+        """
+        return self._get_record(module_name, pathname) is not None
+
+    def _get_record(self, module_name, pathname):
+        record = self._records.get(pathname)
+        if record is None:
+            return None
+        name, stamp = record[:2]
+        if name != module_name or stamp != file_stamp(pathname):
+            return None
+        return record
+
+    def put(self, module, code):
+        """
+        Record the passed graph node, whose imports have been parsed but not
+        yet processed, along with the passed code object of its module.
+        """
+        stamp = file_stamp(module.filename)
+        if stamp is None:
+            return
+        self._new_records[module.filename] = (
+            module.identifier, stamp, type(module).__name__, code,
+            frozenset(module._global_attr_names),
+            modulegraph._pack_imports(module._deferred_imports))
+
+
+class ImportScanCache(PersistentCache):
+    """
+    Cache of the imports parsed from module sources, shared by all builds.
+
+    For each parsed module source, the cache records the names of its global
+    attributes and the imports parsed from it. Records are keyed by the digest
+    of the source as returned by `modulegraph._source_digest()` and only
+    depend on the contents of the source, not on its location, the name of
+    its module or on the search path, excludes or hooks of the build parsing
+    it. Thus unlike the `ModuleGraphCache` this cache remains valid when
+    modules get moved or when the options of a build change, and is shared
+    by all projects using the same Python interpreter.
+
+    Code objects are not stored, as these depend on the location of the
+    module. Sources found in this cache are compiled without constructing and
+    scanning an abstract syntax tree, which is the most expensive part of
+    loading a module.
+
+    Parameters
+    ----------
+    filename : str
+        Absolute path of the file this cache is persisted to.
+    """
+
+    description = 'import scan cache'
+
+    def get(self, source_digest):
+        """
+        Return the cached scan results of the source with the passed digest,
+        or `None` if that source has not been scanned yet.
+
+        Returns
+        ----------
+        tuple
+            2-tuple `(global_attr_names, imports)`, where `global_attr_names`
+            is the set of global attributes of the module and `imports` the
+            imports parsed from its source as returned by
+            `modulegraph._pack_imports()`.
+        """
+        return (self._new_records.get(source_digest) or
+                self._records.get(source_digest))
+
+    def put(self, source_digest, module):
+        """
+        Record the passed graph node, whose imports have been parsed but not
+        yet processed, as the scan results of the source with the passed
+        digest.
+        """
+        if source_digest in self._records:
+            return
+        self._new_records[source_digest] = (
+            frozenset(module._global_attr_names),
+            modulegraph._pack_imports(module._deferred_imports))
+
+
+class _GraphPickler(pickle.Pickler):
+    """
+    Pickler setting the code objects of the pickled graph aside into the passed
+    list instead of pickling them, as code objects are not picklable.
+    """
+
+    def __init__(self, fp, code_objects):
+        super(_GraphPickler, self).__init__(fp, pickle.HIGHEST_PROTOCOL)
+        self._code_objects = code_objects
+
+    def persistent_id(self, obj):
+        if type(obj) is types.CodeType:
+            self._code_objects.append(obj)
+            return len(self._code_objects) - 1
+        return None
+
+
+class _GraphUnpickler(pickle.Unpickler):
+    """
+    Unpickler restoring the code objects set aside by `_GraphPickler` from the
+    passed list.
+    """
+
+    def __init__(self, fp, code_objects):
+        super(_GraphUnpickler, self).__init__(fp)
+        self._code_objects = code_objects
+
+    def persistent_load(self, pid):
+        return self._code_objects[pid]
+
+
+class ModuleGraphSnapshot(object):
+    """
+    Serialized state of a module graph, restorable much faster than the graph
+    can be rebuilt or deep-copied.
+
+    The graph is pickled, except for the code objects of its modules. These
+    are immutable and hence shared by all graphs restored from the same
+    snapshot in memory, and marshalled when the snapshot is persisted.
+    Persisted snapshots are only restored if all files of the modules in the
+    graph are unchanged.
+
+    Use `ModuleGraphSnapshot.create()` or `ModuleGraphSnapshot.load()` to
+    obtain an instance of this class.
+    """
+
+    def __init__(self, graph_data, code_objects, stamps):
+        self._graph_data = graph_data
+        self._code_objects = code_objects
+        self._stamps = stamps
+
+    @classmethod
+    def create(cls, graph):
+        """
+        Create a snapshot of the passed graph.
+
+        Only the state of this graph returned by its `__getstate__()` method
+        is preserved, so state specific to the current build is omitted.
+        """
+        fp = io.BytesIO()
+        code_objects = []
+        _GraphPickler(fp, code_objects).dump(graph)
+        stamps = {}
+        for node in graph.flatten():
+            filename = getattr(node, 'filename', None)
+            if isinstance(filename, str) and os.path.isabs(filename):
+                stamps[filename] = file_stamp(filename)
+        return cls(fp.getvalue(), code_objects, stamps)
+
+    def restore(self):
+        """
+        Return a new graph restored from this snapshot.
+        """
+        return _GraphUnpickler(io.BytesIO(self._graph_data),
+                               self._code_objects).load()
+
+    def save(self, filename):
+        """
+        Persist this snapshot to the passed file.
+        """
+        try:
+            replace_file(filename, marshal.dumps((
+                get_header(), self._stamps, self._graph_data,
+                self._code_objects)))
+        except (OSError, ValueError) as e:
+            logger.warning('Unable to write module graph snapshot %s: %s',
+                           filename, e)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Return the snapshot persisted to the passed file, or `None` if there
+        is no such snapshot or the files of any of its modules changed.
+        """
+        try:
+            with open(filename, 'rb') as fp:
+                header, stamps, graph_data, code_objects = marshal.load(fp)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            logger.debug('Ignoring unreadable module graph snapshot %s: %s',
+                         filename, e)
+            return None
+        if header != get_header():
+            logger.debug('Ignoring outdated module graph snapshot %s',
+                         filename)
+            return None
+        for module_filename, stamp in stamps.items():
+            if file_stamp(module_filename) != stamp:
+                logger.debug('Ignoring module graph snapshot %s, as %s '
+                             'changed', filename, module_filename)
+                return None
+        return cls(graph_data, code_objects, stamps)
+
+
+def get_base_graph_snapshot_filename(cachedir, excludes, user_hook_dirs):
+    """
+    Return the path of the file in the passed cache directory persisting the
+    snapshot of the base module graph analyzed by the current Python
+    interpreter with the passed excludes and user hook directories.
+
+    As the modules found by the graph depend on the search path, the search
+    path is part of the key of this snapshot as well, as is the optimization
+    level its code objects are compiled at.
+    """
+    key = repr((sys.version, sys.executable, os.path.dirname(os.__file__),
+                sys.path, sorted(excludes), list(user_hook_dirs),
+                sys.flags.optimize))
+    digest = hashlib.sha256(key.encode('utf-8', 'surrogatepass')).hexdigest()
+    return os.path.join(cachedir, 'basegraph_py%d%d_%s.dat' % (
+        sys.version_info[0], sys.version_info[1], digest[:16]))
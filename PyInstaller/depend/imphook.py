@@ -14,21 +14,157 @@
 Code related to processing of import hooks.
 """
 
-import glob, sys, weakref
+import glob, hashlib, sys, sysconfig, weakref
+import logging as stdlib_logging
 import os.path
 
 from ..exceptions import ImportErrorWhenRunningHook
 from .. import log as logging
 from ..compat import expand_path, importlib_load_source
+from ..config import CONF
+from ..utils.persistentcache import PersistentCache
 from .imphookapi import PostGraphAPI
 from ..building.utils import format_binaries_and_datas
+from ..utils import hooks as hookutils
 
 logger = logging.getLogger(__name__)
 
+
+class _LogRecorder(stdlib_logging.Handler):
+    """
+    Handler recording the loggers, levels and messages of the records emitted
+    while running a hook script, to replay these when its results are reused.
+    """
+
+    def __init__(self):
+        super(_LogRecorder, self).__init__()
+        self.records = []
+
+    def emit(self, record):
+        try:
+            self.records.append(
+                (record.name, record.levelno, record.getMessage()))
+        except Exception:
+            self.handleError(record)
+
 # Safety check: Hook module names need to be unique. Duplicate names might
 # occur if the cached PyuModuleGraph has an issue.
 HOOKS_MODULE_NAMES = set()
 
+class HookDirectoryCache(PersistentCache):
+    """
+    Cache of the hook scripts found in hook directories, shared by all builds.
+
+    For each scanned hook directory, the cache records the stamp identifying
+    the state of that directory when scanned and the hook scripts found in it,
+    so that unchanged hook directories are only stat'ed by subsequent builds
+    instead of being globbed again.
+
+    Parameters
+    ----------
+    filename : str
+        Absolute path of the file this cache is persisted to.
+    """
+
+    description = 'hook directory cache'
+
+    def get(self, hook_dir):
+        """
+        Return the 2-tuple `(stamp, hooks)` recorded for the passed hook
+        directory, or `None` if that directory has not been scanned yet.
+
+        The caller is responsible for comparing `stamp` with the current
+        state of the directory.
+        """
+        return (self._new_records.get(hook_dir) or
+                self._records.get(hook_dir))
+
+    def put(self, hook_dir, stamp, hooks):
+        """
+        Record the list of 2-tuples `(module_name, hook_filename)` of all hook
+        scripts found in the passed hook directory in the state identified by
+        the passed stamp.
+        """
+        self._new_records[hook_dir] = (
+            tuple(stamp), tuple(tuple(hook) for hook in hooks))
+
+
+# Dictionary mapping the absolute paths of all hook directories scanned by this
+# process to 2-tuples "(stamp, hooks)", where "stamp" identifies the state of
+# that directory when scanned and "hooks" is the list of 2-tuples
+# "(module_name, hook_filename)" of all hook scripts found in that directory.
+# Hook directories are scanned whenever the hooks of a module graph are reset,
+# thus repeatedly by test suites and builds analyzing several scripts.
+_HOOK_DIR_REGISTRY = {}
+
+# `HookDirectoryCache` of the current build persisting the registry above to
+# the cache directory, so that subsequent builds only scan hook directories
+# changed since, or `None` outside of builds.
+hook_dir_cache = None
+
+
+def _get_hook_dir_registry(hook_dir):
+    """
+    List the 2-tuples `(module_name, hook_filename)` of all hook scripts in
+    the passed directory, only scanning this directory again if it changed
+    since previously scanned by this process or by a previous build.
+
+    Parameters
+    ----------
+    hook_dir : str
+        Absolute path of a directory containing hook scripts.
+    """
+    st = os.stat(hook_dir)
+    stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+    registry = _HOOK_DIR_REGISTRY.get(hook_dir)
+    if ((registry is None or registry[0] != stamp) and
+            hook_dir_cache is not None):
+        registry = hook_dir_cache.get(hook_dir)
+    if registry is None or registry[0] != stamp:
+        hooks = tuple(
+            # Fully-qualified name of this hook's corresponding module,
+            # constructed by removing the "hook-" prefix and ".py" suffix.
+            (os.path.basename(hook_filename)[5:-3], hook_filename)
+            for hook_filename in glob.glob(os.path.join(hook_dir, 'hook-*.py'))
+        )
+        registry = (stamp, hooks)
+        if hook_dir_cache is not None:
+            hook_dir_cache.put(hook_dir, stamp, hooks)
+    _HOOK_DIR_REGISTRY[hook_dir] = registry
+    return registry[1]
+
+
+def _normalize_path(path):
+    """
+    Return the passed path with all symbolic links resolved and, on
+    case-insensitive platforms, lowercased.
+    """
+    return os.path.normcase(os.path.realpath(path))
+
+
+# Prefixes and suffixes of the names of the environment variables read by hook
+# scripts, by the helpers of `PyInstaller.utils.hooks` and by the packages
+# these inspect (e.g., `QT_PLUGIN_PATH`, `GI_TYPELIB_PATH` or
+# `DJANGO_SETTINGS_MODULE`). Other variables do not affect the attributes of
+# hook scripts. See `_get_hook_environment()`.
+_HOOK_ENV_VAR_PREFIXES = (
+    'PYTHON', 'PYINSTALLER', 'CONDA', 'VIRTUAL_ENV', 'DJANGO', 'QT', 'QML',
+    'GDK_', 'GI_', 'GIO_', 'GST_', 'GTK_', 'PANGO_', 'KIVY_', 'MPL', 'TCL_',
+    'TK_', 'XDG_')
+_HOOK_ENV_VAR_SUFFIXES = ('PATH', '_DIR', '_HOME', '_PREFIX')
+
+
+def _get_hook_environment():
+    """
+    Return the sorted list of the 2-tuples `(name, value)` of all environment
+    variables which may affect the attributes of hook scripts.
+    """
+    return sorted(
+        (name, value) for name, value in os.environ.items()
+        if name.startswith(_HOOK_ENV_VAR_PREFIXES) or
+        name.endswith(_HOOK_ENV_VAR_SUFFIXES))
+
+
 class ModuleHookCache(dict):
     """
     Cache of lazily loadable hook script objects.
@@ -119,11 +255,7 @@ def _cache_hook_dirs(self, hook_dirs):
                     'Hook directory "{}" not found.'.format(hook_dir))
 
             # For each hook script in this directory...
-            hook_filenames = glob.glob(os.path.join(hook_dir, 'hook-*.py'))
-            for hook_filename in hook_filenames:
-                # Fully-qualified name of this hook's corresponding module,
-                # constructed by removing the "hook-" prefix and ".py" suffix.
-                module_name = os.path.basename(hook_filename)[5:-3]
+            for module_name, hook_filename in _get_hook_dir_registry(hook_dir):
                 if module_name in self:
                     logger.warning("Several hooks defined for module %r. "
                                    "Please take care they do not conflict.",
@@ -399,11 +531,28 @@ def _load_hook_module(self):
                     super(ModuleHook, self).__setattr__(attr_name, attr_type())
             return
 
+        head, tail = os.path.split(self.hook_filename)
+
+        # Reuse the attributes of this hook script from a previous build if
+        # neither this script, the hooked module nor the environment changed.
+        result_key, dependencies = self._get_result_key()
+        if result_key is not None and self._load_hook_result(result_key):
+            logger.info(
+                'Reusing results of module hook %r from %r...', tail, head)
+            # Not None, as this hook script defines no hook() function.
+            self._hook_module = True
+            return
+
         # Load and execute the hook script. Even if mechanisms from the import
         # machinery are used, this does not import the hook as the module.
-        head, tail = os.path.split(self.hook_filename)
         logger.info(
             'Loading module hook %r from %r...', tail, head)
+        # Record the messages logged by this hook script, to replay these if
+        # its attributes are reused.
+        log_recorder = _LogRecorder()
+        root_logger = stdlib_logging.getLogger()
+        if result_key is not None:
+            root_logger.addHandler(log_recorder)
         try:
             self._hook_module = importlib_load_source(
                 self.hook_module_name, self.hook_filename)
@@ -411,6 +560,8 @@ def _load_hook_module(self):
             logger.debug("Hook failed with:", exc_info=True)
             raise ImportErrorWhenRunningHook(
                 self.hook_module_name, self.hook_filename)
+        finally:
+            root_logger.removeHandler(log_recorder)
 
 
         # Copy hook script attributes into magic attributes exposed as instance
@@ -431,6 +582,106 @@ def _load_hook_module(self):
             # Expose this attribute as an instance variable of the same name.
             setattr(self, attr_name, attr_value)
 
+        # The attributes of hook scripts defining a hook() function depend on
+        # the module graph, so cannot be reused.
+        if result_key is not None and not hasattr(self._hook_module, 'hook'):
+            hookutils.query_cache.store(
+                result_key,
+                (tuple(list(getattr(self, attr_name))
+                       for attr_name in _MAGIC_MODULE_HOOK_ATTRS),
+                 log_recorder.records),
+                dependencies)
+
+
+    def _get_result_key(self):
+        """
+        Return a 2-tuple `(key, dependencies)` of the key of the attributes of
+        this hook script in the hook query cache (see
+        `PyInstaller.utils.hooks.cache.HookQueryCache.lookup()`) and the paths
+        of the files and directories these attributes depend on, or
+        `(None, None)` if these attributes should not be cached.
+
+        These attributes are only cached for modules of the standard library
+        and of distributions recording the files installed, whose contents are
+        identified by the version of Python or of the distribution. As hook
+        scripts may read environment variables (e.g., `QT_PLUGIN_PATH` or
+        `PYTHONPATH`), the key includes these returned by
+        `_get_hook_environment()`.
+        """
+        if hookutils.query_cache is None or \
+                hookutils.distribution_index is None:
+            return None, None
+        node = self.module_graph.findNode(self.module_name, create_nspkg=False)
+        filename = getattr(node, 'filename', None)
+        if not filename or not os.path.isabs(filename):
+            return None, None
+        try:
+            with open(self.hook_filename, 'rb') as fp:
+                hook_digest = hashlib.sha256(fp.read()).hexdigest()
+        except OSError:
+            return None, None
+        dependencies = [self.hook_filename, filename]
+
+        # Distribution locations are indexed normalized, see
+        # `PyInstaller.utils.hooks.cache.DistributionIndex`.
+        real_filename = _normalize_path(filename)
+        dist = hookutils.distribution_index.get_package_distribution(
+            self.module_name.split('.')[0])
+        site_dirs = [_normalize_path(sysconfig.get_path(name))
+                     for name in ('purelib', 'platlib')]
+        if dist is not None and \
+                real_filename.startswith(os.path.join(dist.location, '')):
+            for record_name in ('RECORD', 'installed-files.txt'):
+                record_filename = os.path.join(dist.metadata_dir, record_name)
+                if os.path.isfile(record_filename):
+                    break
+            else:
+                # Possibly installed in development mode.
+                return None, None
+            dependencies.append(record_filename)
+            module_version = (dist.key, dist.version)
+        elif real_filename.startswith(os.path.join(
+                _normalize_path(sysconfig.get_path('stdlib')), '')) and \
+                not any(real_filename.startswith(os.path.join(site_dir, ''))
+                        for site_dir in site_dirs):
+            module_version = ('python', sys.version)
+        else:
+            return None, None
+
+        # Hook scripts may inspect any other distribution, so the results are
+        # outdated as soon as any distribution is installed or removed.
+        dependencies.extend(os.path.abspath(path or '.') for path in sys.path)
+        env = _get_hook_environment()
+        key = ('module_hook', os.path.abspath(self.hook_filename), hook_digest,
+               self.module_name, module_version, CONF.get('workpath'),
+               CONF.get('pathex'), CONF.get('main_script'), os.getcwd(), env)
+        return key, dependencies
+
+
+    def _load_hook_result(self, result_key):
+        """
+        Set the magic attributes of this hook script to these recorded in the
+        hook query cache with the passed key by a previous build and return
+        `True`, or return `False` if there is no valid record.
+        """
+        result = hookutils.query_cache.lookup(result_key)
+        if result is None:
+            return False
+        attrs, log_records = result
+        result = dict(zip(_MAGIC_MODULE_HOOK_ATTRS, attrs))
+        # Files collected from the work path may have been removed meanwhile.
+        if not all(os.path.exists(src_name)
+                   for attr_name in ('datas', 'binaries')
+                   for _, src_name in result[attr_name]):
+            return False
+        for attr_name, (default_type, _) in _MAGIC_MODULE_HOOK_ATTRS.items():
+            super(ModuleHook, self).__setattr__(
+                attr_name, default_type(result[attr_name]))
+        # Replay the messages logged by this hook script.
+        for name, level, message in log_records:
+            logging.getLogger(name).log(level, '%s', message)
+        return True
+
 
     ## Hooks
 
@@ -0,0 +1,211 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2020, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License (version 2
+# or later) with exception for distributing the bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#
+# SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
+#-----------------------------------------------------------------------------
+
+"""
+Read the cache of the libraries found by `ldconfig` in the trusted library
+directories (`/etc/ld.so.cache`), as the dynamic linker of glibc does, without
+running `ldconfig -p`.
+"""
+
+import collections
+import marshal
+import os
+import struct
+import sys
+
+from . import elf
+
+LD_SO_CACHE = '/etc/ld.so.cache'
+
+# Format of caches written by glibc < 2.32 by default, possibly followed by
+# the new format.
+_OLD_MAGIC = b'ld.so-1.7.0'
+_OLD_HEADER_SIZE = 16
+_OLD_ENTRY_SIZE = 12
+
+# Format read by glibc >= 2.2 and only written by glibc >= 2.32.
+_NEW_MAGIC = b'glibc-ld.so.cache1.1'
+_NEW_HEADER_SIZE = 48
+_NEW_ENTRY_SIZE = 24
+# Byte orders per value of the flags of the header of the new format.
+_NEW_BYTE_ORDERS = {0: '=', 2: '<', 3: '>'}
+
+# Type of the libraries (the lower byte of the flags of an entry).
+FLAG_TYPE_MASK = 0x00ff
+FLAG_ELF = 0x0001
+FLAG_ELF_LIBC6 = 0x0003
+
+# Flags of the libraries loaded by the dynamic linker of each architecture,
+# mapping `(elf_class, e_machine)` to the `_DL_CACHE_DEFAULT_ID` of glibc.
+_DEFAULT_FLAGS = {
+    (elf.ELFCLASS32, 3): FLAG_ELF_LIBC6,  # i386
+    (elf.ELFCLASS64, 62): FLAG_ELF_LIBC6 | 0x0300,  # x86-64
+    (elf.ELFCLASS32, 62): FLAG_ELF_LIBC6 | 0x0800,  # x32
+    (elf.ELFCLASS64, 183): FLAG_ELF_LIBC6 | 0x0a00,  # AArch64
+    (elf.ELFCLASS64, 21): FLAG_ELF_LIBC6 | 0x0500,  # PowerPC 64
+    (elf.ELFCLASS64, 22): FLAG_ELF_LIBC6 | 0x0400,  # s390x
+    (elf.ELFCLASS64, 43): FLAG_ELF_LIBC6 | 0x0100,  # SPARC 64
+    (elf.ELFCLASS64, 50): FLAG_ELF_LIBC6 | 0x0200,  # IA-64
+}
+
+LDCacheEntry = collections.namedtuple(
+    'LDCacheEntry', ['name', 'path', 'flags', 'hwcap'])
+LDCacheEntry.__doc__ = """
+Entry of the ld.so cache.
+
+`name` is the soname of the library at `path`. The architecture and ABI of
+this library are encoded by `flags`. A non-zero `hwcap` marks the libraries
+optimized for a subset of the CPUs of this architecture, which the dynamic
+linker prefers on these CPUs.
+"""
+
+# Version of the layout of the memo written by `load_ld_so_cache()`.
+# Increment whenever this layout changes.
+_MEMO_FORMAT = 1
+
+
+def _unpack(fmt, data, offset=0):
+    try:
+        return struct.unpack_from(fmt, data, offset)
+    except struct.error as e:
+        raise ValueError('Truncated ld.so cache: %s' % e) from e
+
+
+def _string(data, offset):
+    end = data.find(b'\0', offset)
+    if offset >= len(data) or end < 0:
+        raise ValueError('Invalid string offset in ld.so cache')
+    return os.fsdecode(data[offset:end])
+
+
+def parse_ld_so_cache(data):
+    """
+    Return the list of the `LDCacheEntry` of the passed contents of an ld.so
+    cache, in the order of the cache.
+
+    Raises
+    ----------
+    ValueError
+        If these contents are no ld.so cache of a known format.
+    """
+    new_offset = 0
+    if data.startswith(_OLD_MAGIC):
+        nlibs, = _unpack('=I', data, len(_OLD_MAGIC) + 1)
+        entries_end = _OLD_HEADER_SIZE + nlibs * _OLD_ENTRY_SIZE
+        # The new format follows, aligned like its header.
+        new_offset = (entries_end + 7) & ~7
+        if not data.startswith(_NEW_MAGIC, new_offset):
+            # Strings are relative to the end of the entries.
+            strings = data[entries_end:]
+            entries = []
+            for i in range(nlibs):
+                flags, key, value = _unpack(
+                    '=iII', data, _OLD_HEADER_SIZE + i * _OLD_ENTRY_SIZE)
+                entries.append(LDCacheEntry(
+                    _string(strings, key), _string(strings, value), flags, 0))
+            return entries
+    elif not data.startswith(_NEW_MAGIC):
+        raise ValueError('Unknown format of ld.so cache')
+
+    # Strings are relative to the header of the new format.
+    strings = data[new_offset:]
+    byte_order = _NEW_BYTE_ORDERS.get(strings[28] & 3 if len(strings) > 28
+                                      else None)
+    if byte_order is None:
+        raise ValueError('Invalid byte order of ld.so cache')
+    nlibs, = _unpack(byte_order + 'I', strings, len(_NEW_MAGIC))
+    entries = []
+    for i in range(nlibs):
+        flags, key, value, _, hwcap = _unpack(
+            byte_order + 'iIIIQ', strings,
+            _NEW_HEADER_SIZE + i * _NEW_ENTRY_SIZE)
+        entries.append(LDCacheEntry(
+            _string(strings, key), _string(strings, value), flags, hwcap))
+    return entries
+
+
+def get_default_flags():
+    """
+    Return the flags of the entries of the ld.so cache loaded by the dynamic
+    linker of the running Python interpreter, or `None` if unknown.
+    """
+    try:
+        info = elf.get_elf_info(sys.executable)
+    except (OSError, ValueError):
+        return None
+    return _DEFAULT_FLAGS.get((info.elf_class, info.machine))
+
+
+def select_libraries(entries, default_flags=None):
+    """
+    Map the names of the libraries of the passed entries of an ld.so cache to
+    the path of the library the dynamic linker would load.
+
+    Only the libraries of the passed `default_flags` (see
+    `get_default_flags()`) are selected or, if these are `None`, those of any
+    architecture. As bundled libraries have to run on any CPU, generic
+    libraries are preferred to those optimized for some CPUs, which the
+    dynamic linker would load on this one. Otherwise, the first entry wins.
+    """
+    libraries = {}
+    generic = set()
+    for entry in entries:
+        if default_flags is None:
+            if entry.flags & FLAG_TYPE_MASK not in (FLAG_ELF, FLAG_ELF_LIBC6):
+                continue
+        elif entry.flags not in (FLAG_ELF, default_flags):
+            continue
+        if entry.name in generic:
+            continue
+        if entry.name not in libraries or not entry.hwcap:
+            libraries[entry.name] = entry.path
+            if not entry.hwcap:
+                generic.add(entry.name)
+    return libraries
+
+
+def load_ld_so_cache(filename=LD_SO_CACHE, memo_filename=None):
+    """
+    Return the list of the `LDCacheEntry` of the passed ld.so cache.
+
+    If `memo_filename` is passed, the entries are read from this file as long
+    as the ld.so cache is unchanged since they were written to it, and
+    written to it otherwise.
+
+    Raises
+    ----------
+    ValueError
+        If this file is no ld.so cache of a known format.
+    OSError
+        If this file cannot be read.
+    """
+    # The ld.so cache is replaced by `ldconfig`, never modified in place.
+    st = os.stat(filename)
+    stamp = (os.path.abspath(filename), st.st_ino, st.st_mtime_ns,
+             st.st_size)
+    if memo_filename:
+        try:
+            with open(memo_filename, 'rb') as fp:
+                memo_format, memo_stamp, entries = marshal.load(fp)
+            if memo_format == _MEMO_FORMAT and memo_stamp == stamp:
+                return [LDCacheEntry(*entry) for entry in entries]
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+    with open(filename, 'rb') as fp:
+        entries = parse_ld_so_cache(fp.read())
+    if memo_filename:
+        from ..utils.persistentcache import replace_file
+        try:
+            replace_file(memo_filename, marshal.dumps(
+                (_MEMO_FORMAT, stamp, [tuple(entry) for entry in entries])))
+        except OSError:
+            pass
+    return entries
@@ -15,30 +15,24 @@
 Utility functions related to analyzing/bundling dependencies.
 """
 
+import bisect
 import ctypes
 import ctypes.util
-import io
-import marshal
 import os
 import re
-import struct
 import zipfile
 
 from ..exceptions import ExecCommandFailed
 from ..lib.modulegraph import util, modulegraph
 
 from .. import compat
-from ..compat import (is_darwin, is_unix, is_freebsd, is_openbsd, is_py37,
-                      BYTECODE_MAGIC, PY3_BASE_MODULES)
+from ..compat import (is_darwin, is_unix, is_freebsd, is_openbsd,
+                      PY3_BASE_MODULES)
+from . import ldcache
 from .dylib import include_library
+from ..utils.misc import get_pyc_data
 from .. import log as logging
 
-try:
-    # source_hash only exists in Python 3.7
-    from importlib.util import source_hash as importlib_source_hash
-except ImportError:
-    pass
-
 logger = logging.getLogger(__name__)
 
 
@@ -67,45 +61,28 @@ def create_py3_base_library(libzip_filename, graph):
         with zipfile.ZipFile(libzip_filename, mode='w') as zf:
             zf.debug = 3
             # Sort the graph nodes by identifier to ensure repeatable builds
-            graph_nodes = list(graph.flatten())
+            graph_nodes = list(graph.iter_reachable_nodes(
+                ('SourceModule', 'Package'), from_top_script=False))
             graph_nodes.sort(key=lambda item: item.identifier)
             for mod in graph_nodes:
-                if type(mod) in (modulegraph.SourceModule, modulegraph.Package):
-                    # Bundling just required modules.
-                    if module_filter.match(mod.identifier):
-                        st = os.stat(mod.filename)
-                        timestamp = int(st.st_mtime)
-                        size = st.st_size & 0xFFFFFFFF
-                        # Name inside the archive. The ZIP format
-                        # specification requires forward slashes as
-                        # directory separator.
-                        # TODO use .pyo suffix if optimize flag is enabled.
-                        if type(mod) is modulegraph.Package:
-                            new_name = mod.identifier.replace('.', '/') \
-                                + '/__init__.pyc'
-                        else:
-                            new_name = mod.identifier.replace('.', '/') \
-                                + '.pyc'
-
-                        # Write code to a file.
-                        # This code is similar to py_compile.compile().
-                        with io.BytesIO() as fc:
-                            # Prepare all data in byte stream file-like object.
-                            fc.write(BYTECODE_MAGIC)
-                            if is_py37:
-                                # Additional bitfield according to PEP 552
-                                # 0b01 means hash based but don't check the hash
-                                fc.write(struct.pack('<I', 0b01))
-                                with open(mod.filename, 'rb') as fs:
-                                    source_bytes = fs.read()
-                                source_hash = importlib_source_hash(source_bytes)
-                                fc.write(source_hash)
-                            else:
-                                fc.write(struct.pack('<II', timestamp, size))
-                            marshal.dump(mod.code, fc)
-                            # Use a ZipInfo to set timestamp for deterministic build
-                            info = zipfile.ZipInfo(new_name)
-                            zf.writestr(info, fc.getvalue())
+                # Bundling just required modules.
+                if module_filter.match(mod.identifier):
+                    # Name inside the archive. The ZIP format
+                    # specification requires forward slashes as
+                    # directory separator.
+                    # TODO use .pyo suffix if optimize flag is enabled.
+                    if type(mod) is modulegraph.Package:
+                        new_name = mod.identifier.replace('.', '/') \
+                            + '/__init__.pyc'
+                    else:
+                        new_name = mod.identifier.replace('.', '/') \
+                            + '.pyc'
+
+                    # Write the code object compiled by the module graph.
+                    # Use a ZipInfo to set timestamp for deterministic build
+                    info = zipfile.ZipInfo(new_name)
+                    zf.writestr(info, get_pyc_data(
+                        graph.get_frozen_code(mod), mod.filename))
 
     except Exception as e:
         logger.error('base_library.zip could not be created!')
@@ -152,7 +129,7 @@ def __recursivly_scan_code_objects_for_ctypes(co, binaries):
     # for clarity.
     binaries.extend(
         __scan_code_instruction_for_ctypes(
-            util.iterate_instructions(co)))
+            util.iterate_opcodes(co)))
 
 
 def __scan_code_instruction_for_ctypes(instructions):
@@ -161,27 +138,33 @@ def __scan_code_instruction_for_ctypes(instructions):
     should cover most common ctypes usages; returns a tuple of two
     lists, one containing names of binaries detected as
     dependencies, the other containing warnings.
+
+    The instructions are `(opname, argval)` tuples as yielded by
+    `util.iterate_opcodes()`.
     """
+    def _next_instruction():
+        # Treat the end of a code-block like any unexpected instruction.
+        return next(instructions) or (None, None)
+
     def _libFromConst():
         """Extracts library name from an expected LOAD_CONST instruction and
         appends it to local binaries list.
         """
-        instruction = next(instructions)
-        if instruction.opname == 'LOAD_CONST':
-            soname = instruction.argval
+        opname, soname = _next_instruction()
+        if opname == 'LOAD_CONST':
             if isinstance(soname, str):
                 return soname
 
+    expected_ops = ('LOAD_GLOBAL', 'LOAD_NAME')
+    load_method = ('LOAD_ATTR', 'LOAD_METHOD')
     while True:
         try:
             instruction = next(instructions)
-            expected_ops = ('LOAD_GLOBAL', 'LOAD_NAME')
-            load_method = ('LOAD_ATTR', 'LOAD_METHOD')
 
-            if not instruction or instruction.opname not in expected_ops:
+            if not instruction or instruction[0] not in expected_ops:
                 continue
 
-            name = instruction.argval
+            opname, name = instruction
             if name == "ctypes":
                 # Guesses ctypes has been imported as `import ctypes` and
                 # the members are accessed like: ctypes.CDLL("library.so")
@@ -192,10 +175,9 @@ def _libFromConst():
                 #
                 # In this case "strip" the `ctypes` by advancing and expecting
                 # `LOAD_ATTR` next.
-                instruction = next(instructions)
-                if instruction.opname not in load_method:
+                opname, name = _next_instruction()
+                if opname not in load_method:
                     continue
-                name = instruction.argval
 
             if name in ("CDLL", "WinDLL", "OleDLL", "PyDLL"):
                 # Guesses ctypes imports of this type: CDLL("library.so")
@@ -218,16 +200,16 @@ def _libFromConst():
                 #     LOAD_GLOBAL   0 (cdll) <--- we "are" here right now
                 #     LOAD_ATTR     1 (LoadLibrary)
                 #     LOAD_CONST    1 ('library.so')
-                instruction = next(instructions)
-                if instruction.opname in load_method:
-                    if instruction.argval == "LoadLibrary":
+                opname, attr = _next_instruction()
+                if opname in load_method:
+                    if attr == "LoadLibrary":
                         # Second type, needs to fetch one more instruction
                         yield _libFromConst()
                     else:
                         # First type
-                        yield instruction.argval + ".dll"
+                        yield attr + ".dll"
 
-            elif instruction.opname == 'LOAD_ATTR' and name in ("util",):
+            elif opname == 'LOAD_ATTR' and name in ("util",):
                 # Guesses ctypes imports of these types::
                 #
                 #  ctypes.util.find_library('gs')
@@ -236,9 +218,9 @@ def _libFromConst():
                 #     LOAD_ATTR     1 (util) <--- we "are" here right now
                 #     LOAD_ATTR     1 (find_library)
                 #     LOAD_CONST    1 ('gs')
-                instruction = next(instructions)
-                if instruction.opname in load_method:
-                    if instruction.argval == "find_library":
+                opname, attr = _next_instruction()
+                if opname in load_method:
+                    if attr == "find_library":
                         libname = _libFromConst()
                         if libname:
                             lib = ctypes.util.find_library(libname)
@@ -309,9 +291,12 @@ def _restorePaths(old):
             if cpath is None:
                 cpath = cbin
             # "man ld.so" says that we should first search LD_LIBRARY_PATH
-            # and then the ldcache
+            # and then the ldcache. Names with a path component (e.g.,
+            # `sub/libfoo.so`) are not entries of the searched directories.
+            has_dirname = os.sep in cpath
             for d in compat.getenv(envvar, '').split(os.pathsep):
-                if os.path.isfile(os.path.join(d, cpath)):
+                if (has_dirname or has_library_dir_entry(d, cpath)) and \
+                        os.path.isfile(os.path.join(d, cpath)):
                     cpath = os.path.join(d, cpath)
                     break
             else:
@@ -337,6 +322,93 @@ def _restorePaths(old):
     return ret
 
 
+# Mapping the path of each directory searched for libraries to a 2-tuple
+# `(mtime, names)` of its modification time and the sorted names of its
+# entries when it was listed.
+_LIBRARY_DIR_INDEX = {}
+
+# Paths of the directories in `_LIBRARY_DIR_INDEX` checked to be unchanged by
+# the current build, set by the build. Directories searched for libraries are
+# assumed to not change during a build, so each is only stat'ed once per
+# build. If `None`, directories are checked on each lookup.
+checked_library_dirs = None
+
+_VERSION_SUFFIX = re.compile(r'(?:\.\d+)+$')
+
+
+def _get_library_dir_names(path):
+    """
+    Return the sorted list of the names of the entries of the passed
+    directory, listing it again only if it changed since the last call.
+    """
+    index = _LIBRARY_DIR_INDEX.get(path)
+    if index is not None and checked_library_dirs is not None and \
+            path in checked_library_dirs:
+        return index[1]
+    try:
+        mtime = os.stat(path or os.curdir).st_mtime_ns
+    except (OSError, ValueError):
+        return []
+    if checked_library_dirs is not None:
+        checked_library_dirs.add(path)
+    if index is None or index[0] != mtime:
+        try:
+            names = sorted(os.listdir(path or os.curdir))
+        except OSError:
+            names = []
+        index = (mtime, names)
+        _LIBRARY_DIR_INDEX[path] = index
+    return index[1]
+
+
+def has_library_dir_entry(path, name):
+    """
+    Return whether the passed directory has an entry of the passed name.
+    """
+    names = _get_library_dir_names(path)
+    i = bisect.bisect_left(names, name)
+    return i < len(names) and names[i] == name
+
+
+def _library_match_key(name, candidate):
+    # Prefer runtime libraries, whose names end with a version, to the
+    # development files of the same name (e.g., `libfoo.so`, which may be a
+    # linker script). Of these, prefer the passed name, then the highest
+    # version (e.g., `libfoo.so.2` over `libfoo.so.1.0`), then other names
+    # starting with it.
+    suffix = candidate[len(name):]
+    if _VERSION_SUFFIX.search(candidate) and (
+            not suffix or _VERSION_SUFFIX.match(suffix)):
+        return (0, tuple(-int(part) for part in suffix[1:].split('.')
+                         if part), candidate)
+    return (1 if not suffix else 2, (), candidate)
+
+
+def find_library_in_dirs(name, dirs):
+    """
+    Return the path of the library of the passed name or whose name starts
+    with it (e.g., with a version suffix), in the first of the passed
+    directories containing one, or `None` if there is no such library.
+
+    Matches the paths found by `glob.glob(os.path.join(path, name + '*'))`
+    for each directory, but if several entries match, the best match is
+    returned rather than an arbitrary one (see `_library_match_key()`). Each
+    directory is only listed again when it changed since last searched.
+    """
+    for path in dirs:
+        names = _get_library_dir_names(path)
+        candidates = []
+        for i in range(bisect.bisect_left(names, name), len(names)):
+            if not names[i].startswith(name):
+                break
+            candidates.append(names[i])
+        if candidates:
+            return os.path.join(path, min(
+                candidates,
+                key=lambda candidate: _library_match_key(name, candidate)))
+    return None
+
+
 LDCONFIG_CACHE = None  # cache the output of `/sbin/ldconfig -p`
 
 def load_ldconfig_cache():
@@ -344,12 +416,29 @@ def load_ldconfig_cache():
     Create a cache of the `ldconfig`-output to call it only once.
     It contains thousands of libraries and running it on every dylib
     is expensive.
+
+    With glibc, the ld.so cache is read directly instead, see
+    `ldcache.load_ld_so_cache()`.
     """
     global LDCONFIG_CACHE
 
     if LDCONFIG_CACHE is not None:
         return
 
+    if not (is_freebsd or is_openbsd) and os.path.isfile(ldcache.LD_SO_CACHE):
+        from ..config import CONF
+        memo_filename = None
+        if CONF.get('cachedir'):
+            memo_filename = os.path.join(CONF['cachedir'], 'ldsocache.dat')
+        try:
+            entries = ldcache.load_ld_so_cache(memo_filename=memo_filename)
+        except (OSError, ValueError) as e:
+            logger.debug("Failed to read %s: %s", ldcache.LD_SO_CACHE, e)
+        else:
+            LDCONFIG_CACHE = ldcache.select_libraries(
+                entries, ldcache.get_default_flags())
+            return
+
     from distutils.spawn import find_executable
     ldconfig = find_executable('ldconfig')
     if ldconfig is None:
@@ -395,10 +484,15 @@ def load_ldconfig_cache():
 
     text = text.strip().splitlines()[splitlines_count:]
 
-    LDCONFIG_CACHE = {}
+    # Only publish the cache once complete, as it may be used by several
+    # threads (see `bindepend.Dependencies()`).
+    ldconfig_cache = {}
     for line in text:
         # :fixme: this assumes libary names do not contain whitespace
         m = pattern.match(line)
+        # Newer versions of ldconfig append an informative line as well.
+        if not m:
+            continue
         path = m.groups()[-1]
         if is_freebsd or is_openbsd:
             # Insert `.so` at the end of the lib's basename. soname
@@ -414,8 +508,9 @@ def load_ldconfig_cache():
         # ldconfig may know about several versions of the same lib,
         # e.g. differents arch, different libc, etc. Use the first
         # entry.
-        if not name in LDCONFIG_CACHE:
-            LDCONFIG_CACHE[name] = path
+        if not name in ldconfig_cache:
+            ldconfig_cache[name] = path
+    LDCONFIG_CACHE = ldconfig_cache
 
 
 def get_path_to_egg(path):
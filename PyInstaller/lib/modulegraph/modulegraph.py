@@ -17,7 +17,10 @@
 
 import ast
 import codecs
+import hashlib
 import imp
+import importlib.machinery
+import importlib.util
 import marshal
 import os
 import pkgutil
@@ -50,6 +53,23 @@ def is_package(self, fqname):
         return True
 
 
+_MODULE_SUFFIXES = tuple(importlib.machinery.all_suffixes())
+"""
+Suffixes of all files importable as modules by the default path finder.
+"""
+
+
+def _is_import_case_insensitive():
+    """
+    `True` if module names are matched case-insensitively against file names
+    by the default path finder, as requested by the `PYTHONCASEOK` environment
+    variable on case-insensitive platforms.
+    """
+    return (sys.platform.startswith(('win', 'cygwin', 'darwin')) and
+            not sys.flags.ignore_environment and
+            'PYTHONCASEOK' in os.environ)
+
+
 #FIXME: Leverage this rather than magic numbers below.
 ABSOLUTE_OR_RELATIVE_IMPORT_LEVEL = -1
 """
@@ -311,6 +331,11 @@ def _merged(self, other):
                     fromlist=self.fromlist and other.fromlist)
 
 
+# Immutable empty set shared by all graph nodes until modified. See the `Node`
+# class for details.
+_EMPTY_SET = frozenset()
+
+
 #FIXME: Shift the following Node class hierarchy into a new
 #"PyInstaller.lib.modulegraph.node" module. This module is much too long.
 #FIXME: Refactor "_deferred_imports" from a tuple into a proper lightweight
@@ -408,9 +433,16 @@ class Node(object):
     _submodule_basename_to_node : dict
         Dictionary mapping from the unqualified name of each submodule
         contained by the parent module corresponding to this graph node to that
-        submodule's graph node. If this dictionary is non-empty, this parent
-        module is typically but _not_ always a package (e.g., the non-package
-        `os` module containing the `os.path` submodule).
+        submodule's graph node _or_ `None` if this module contains no
+        submodules. If this dictionary is non-empty, this parent module is
+        typically but _not_ always a package (e.g., the non-package `os` module
+        containing the `os.path` submodule).
+
+    To minimize the memory consumed by large graphs, subclasses of this class
+    must define `__slots__` as well. The sets above are created on first
+    modification: until then, these attributes share an immutable empty (or
+    cached) set, which must hence only be modified via the methods of this
+    class.
     """
 
     __slots__ = [
@@ -436,15 +468,20 @@ def __init__(self, identifier):
             package, or C extension.
         """
 
+        # Share identifiers with equal strings elsewhere in the graph (e.g.,
+        # names in code objects).
+        if type(identifier) is str:
+            identifier = sys.intern(identifier)
+
         self.code = None
         self.filename = None
         self.graphident = identifier
         self.identifier = identifier
         self.packagepath = None
         self._deferred_imports = None
-        self._global_attr_names = set()
-        self._starimported_ignored_module_names = set()
-        self._submodule_basename_to_node = dict()
+        self._global_attr_names = _EMPTY_SET
+        self._starimported_ignored_module_names = _EMPTY_SET
+        self._submodule_basename_to_node = None
 
 
     def is_global_attr(self, attr_name):
@@ -508,7 +545,8 @@ def is_submodule(self, submodule_basename):
             `True` only if this parent module contains this submodule.
         """
 
-        return submodule_basename in self._submodule_basename_to_node
+        return (self._submodule_basename_to_node is not None and
+                submodule_basename in self._submodule_basename_to_node)
 
 
     def add_global_attr(self, attr_name):
@@ -527,6 +565,8 @@ def add_global_attr(self, attr_name):
             Unqualified name of the attribute to be added.
         """
 
+        if type(self._global_attr_names) is not set:
+            self._global_attr_names = set(self._global_attr_names)
         self._global_attr_names.add(attr_name)
 
 
@@ -546,9 +586,30 @@ def add_global_attrs_from_module(self, target_module):
             Graph node of the target module to import attributes from.
         """
 
+        if not target_module._global_attr_names:
+            return
+        if type(self._global_attr_names) is not set:
+            self._global_attr_names = set(self._global_attr_names)
         self._global_attr_names.update(target_module._global_attr_names)
 
 
+    def add_starimported_ignored_module_names(self, module_names):
+        """
+        Record the modules with the passed fully-qualified names to be
+        unparsable modules this module attempted to perform star imports from.
+
+        Parameters
+        ----------
+        module_names : iterable
+            Fully-qualified names of these modules.
+        """
+
+        if type(self._starimported_ignored_module_names) is not set:
+            self._starimported_ignored_module_names = set(
+                self._starimported_ignored_module_names)
+        self._starimported_ignored_module_names.update(module_names)
+
+
     def add_submodule(self, submodule_basename, submodule_node):
         """
         Add the submodule with the passed name and previously imported graph
@@ -565,6 +626,8 @@ def add_submodule(self, submodule_basename, submodule_node):
             Graph node of this submodule.
         """
 
+        if self._submodule_basename_to_node is None:
+            self._submodule_basename_to_node = {}
         self._submodule_basename_to_node[submodule_basename] = submodule_node
 
 
@@ -589,6 +652,8 @@ def get_submodule(self, submodule_basename):
             Graph node of this submodule.
         """
 
+        if self._submodule_basename_to_node is None:
+            raise KeyError(submodule_basename)
         return self._submodule_basename_to_node[submodule_basename]
 
 
@@ -613,6 +678,8 @@ def get_submodule_or_none(self, submodule_basename):
             submodule _or_ `None`.
         """
 
+        if self._submodule_basename_to_node is None:
+            return None
         return self._submodule_basename_to_node.get(submodule_basename)
 
 
@@ -646,6 +713,8 @@ def remove_global_attr_if_found(self, attr_name):
         """
 
         if self.is_global_attr(attr_name):
+            if type(self._global_attr_names) is not set:
+                self._global_attr_names = set(self._global_attr_names)
             self._global_attr_names.remove(attr_name)
 
 
@@ -757,6 +826,17 @@ def __init__(self, name, node):
         #must remain equal to "name" for lookup purposes? This is, after all,
         #an alias. The idea is for the two nodes to effectively be the same.
 
+        # Share the sets and dictionaries of the source module created on first
+        # modification, so that the alias follows later modifications.
+        if isinstance(node, Node):
+            if type(node._global_attr_names) is not set:
+                node._global_attr_names = set(node._global_attr_names)
+            if type(node._starimported_ignored_module_names) is not set:
+                node._starimported_ignored_module_names = set(
+                    node._starimported_ignored_module_names)
+            if node._submodule_basename_to_node is None:
+                node._submodule_basename_to_node = {}
+
         # Copy some attributes from this source module into this target alias.
         for attr_name in (
             'identifier', 'packagepath',
@@ -766,23 +846,27 @@ def __init__(self, name, node):
                 setattr(self, attr_name, getattr(node, attr_name))
 
 
+    __slots__ = ()
+
     def infoTuple(self):
         return (self.graphident, self.identifier)
 
 
 class BadModule(Node):
-    pass
+    __slots__ = ()
 
 
 class ExcludedModule(BadModule):
-    pass
+    __slots__ = ()
 
 
 class MissingModule(BadModule):
-    pass
+    __slots__ = ()
 
 
 class InvalidRelativeImport (BadModule):
+    __slots__ = ('relative_path', 'from_name')
+
     def __init__(self, relative_path, from_name):
         identifier = relative_path
         if relative_path.endswith('.'):
@@ -798,6 +882,8 @@ def infoTuple(self):
 
 
 class Script(Node):
+    __slots__ = ()
+
     def __init__(self, filename):
         super(Script, self).__init__(filename)
         self.filename = filename
@@ -807,6 +893,8 @@ def infoTuple(self):
 
 
 class BaseModule(Node):
+    __slots__ = ()
+
     def __init__(self, name, filename=None, path=None):
         super(BaseModule, self).__init__(name)
         self.filename = filename
@@ -817,34 +905,34 @@ def infoTuple(self):
 
 
 class BuiltinModule(BaseModule):
-    pass
+    __slots__ = ()
 
 
 class SourceModule(BaseModule):
-    pass
+    __slots__ = ()
 
 
 class InvalidSourceModule(SourceModule):
-    pass
+    __slots__ = ()
 
 
 class CompiledModule(BaseModule):
-    pass
+    __slots__ = ()
 
 
 class InvalidCompiledModule(BaseModule):
-    pass
+    __slots__ = ()
 
 
 class Extension(BaseModule):
-    pass
+    __slots__ = ()
 
 
 class Package(BaseModule):
     """
     Graph node representing a non-namespace package.
     """
-    pass
+    __slots__ = ()
 
 
 class ExtensionPackage(Extension, Package):
@@ -852,14 +940,14 @@ class ExtensionPackage(Extension, Package):
     Graph node representing a package where the __init__ module is an extension
     module.
     """
-    pass
+    __slots__ = ()
 
 
 class NamespacePackage(Package):
     """
     Graph node representing a namespace package.
     """
-    pass
+    __slots__ = ()
 
 
 class RuntimeModule(BaseModule):
@@ -881,7 +969,7 @@ class RuntimeModule(BaseModule):
     and added to the graph, this node is typically added to the graph by
     calling the `ModuleGraph.add_module()` method.
     """
-    pass
+    __slots__ = ()
 
 
 class RuntimePackage(Package):
@@ -903,12 +991,14 @@ class RuntimePackage(Package):
     and added to the graph, this node is typically added to the graph by
     calling the `ModuleGraph.add_module()` method.
     """
-    pass
+    __slots__ = ()
 
 
 #FIXME: Safely removable. We don't actually use this anywhere. After removing
 #this class, remove the corresponding entry from "compat".
 class FlatPackage(BaseModule):
+    __slots__ = ()
+
     def __init__(self, *args, **kwds):
         warnings.warn(
             "This class will be removed in a future version of modulegraph",
@@ -919,6 +1009,8 @@ def __init__(self, *args, **kwds):
 #FIXME: Safely removable. We don't actually use this anywhere. After removing
 #this class, remove the corresponding entry from "compat".
 class ArchiveModule(BaseModule):
+    __slots__ = ()
+
     def __init__(self, *args, **kwds):
         warnings.warn(
             "This class will be removed in a future version of modulegraph",
@@ -988,9 +1080,84 @@ def uniq(seq):
     DEFAULT_IMPORT_LEVEL = 0
 
 
+def _pack_imports(deferred_imports):
+    """
+    Convert the passed `Node._deferred_imports` list into a list of plain
+    tuples independent of the graph, which may be marshalled or pickled.
+
+    Each tuple of the returned list is a 5-tuple `(have_star,
+    target_module_partname, target_attr_names, level, edge_attr)`, where
+    `edge_attr` is either the `DependencyInfo` of this import converted into a
+    plain tuple or `None`.
+    """
+    imports = []
+    for have_star, import_args, import_kwargs in deferred_imports:
+        target_module_partname, _, target_attr_names, level = import_args
+        edge_attr = import_kwargs.get('edge_attr')
+        imports.append((
+            have_star, target_module_partname, target_attr_names, level,
+            None if edge_attr is None else tuple(edge_attr)))
+    return imports
+
+
+def _unpack_imports(module, imports):
+    """
+    Convert the passed list of imports packed by `_pack_imports()` back into a
+    `Node._deferred_imports` list for the passed source module.
+    """
+    return [
+        (have_star, (target_module_partname, module, target_attr_names, level),
+         {} if edge_attr is None
+         else {'edge_attr': DependencyInfo(*edge_attr)})
+        for have_star, target_module_partname, target_attr_names, level,
+        edge_attr in imports]
+
+
+def _source_digest(src):
+    """
+    Return the digest identifying the passed module source, as used to key
+    the scan results of this source in import scan caches.
+    """
+    return hashlib.sha256(src.encode('utf-8', 'surrogatepass')).digest()
+
+
+def _parse_source_file(pathname):
+    """
+    Parse and compile the Python source file with the passed path and scan it
+    for imports.
+
+    This function is independent of any graph, as it is run by the worker
+    processes started by `ModuleGraph.start_parse_workers()`.
+
+    Returns
+    ----------
+    tuple
+        4-tuple `(code, global_attr_names, imports, source_digest)`, where
+        `code` is the marshalled code object of this file, `global_attr_names`
+        the set of the names of its global attributes, `imports` the imports
+        parsed from it as returned by `_pack_imports()` and `source_digest` the
+        digest of its source as returned by `_source_digest()`, or `None` if
+        this file cannot be compiled. In the latter case the file is to be loaded serially to
+        report the error.
+    """
+    try:
+        with open(pathname, 'rb') as fp:
+            src = importlib.util.decode_source(fp.read())
+        co_ast = compile(src, pathname, 'exec', ast.PyCF_ONLY_AST, True)
+        co = compile(co_ast, pathname, 'exec', 0, True)
+    except Exception:
+        return None
+
+    module = Node(pathname)
+    module._deferred_imports = []
+    ModuleGraph._scan_ast(module, co_ast)
+    ModuleGraph._scan_bytecode(module, co, is_scanning_imports=False)
+    return (marshal.dumps(co), frozenset(module._global_attr_names),
+            _pack_imports(module._deferred_imports), _source_digest(src))
+
+
 class _Visitor(ast.NodeVisitor):
-    def __init__(self, graph, module):
-        self._graph = graph
+    def __init__(self, module):
         self._module = module
         self._level = DEFAULT_IMPORT_LEVEL
         self._in_if = [False]
@@ -1123,6 +1290,41 @@ def __init__(self, path=None, excludes=(), replace_paths=(), implies=(), graph=N
         # Maintain own list of package path mappings in the scope of Modulegraph
         # object.
         self._package_path_map = _packagePathMap
+        # Index of the entries of all directories searched for modules, and
+        # set of the modules known to be missing in a list of directories.
+        # See _find_module_path() for details.
+        self._reset_path_index()
+        # Optional cache of previously loaded modules, providing the methods
+        # `get(module_name, pathname)` and `put(module, code)`. See
+        # `PyInstaller.depend.graphcache.ModuleGraphCache` for details.
+        self._module_cache = None
+        # Optional cache of the imports parsed from module sources, providing
+        # the methods `get(source_digest)` and `put(source_digest, module)`.
+        # See `PyInstaller.depend.graphcache.ImportScanCache` for details.
+        self._scan_cache = None
+        # Pool of worker processes parsing and compiling modules ahead of the
+        # graph walk if started by start_parse_workers() or `None` otherwise,
+        # and the futures of all source files submitted to this pool, keyed
+        # by their absolute paths.
+        self._parse_pool = None
+        self._parse_futures = {}
+
+    def __getstate__(self):
+        """
+        Return the state of this graph to be copied or pickled, omitting all
+        caches, indexes and worker processes specific to the current build.
+        """
+        state = self.__dict__.copy()
+        state.update(
+            _path_entries={},
+            _search_path_indexes={},
+            _missing_module_paths=set(),
+            _module_cache=None,
+            _scan_cache=None,
+            _parse_pool=None,
+            _parse_futures={},
+        )
+        return state
 
     def set_setuptools_nspackages(self):
         # This is used when running in the test-suite
@@ -2001,6 +2203,94 @@ def append_package_path(self, package_name, directory):
 
         paths = self._package_path_map.setdefault(package_name, [])
         paths.append(directory)
+        self._reset_path_index()
+
+
+    def _reset_path_index(self):
+        """
+        Forget all directory entries and missing modules indexed by
+        `_find_module_path()`, e.g., after the contents of or paths to
+        directories searched for modules changed.
+        """
+        # 2-tuples "(importer, names)" of each directory searched so far,
+        # keyed by the path of that directory. See _get_path_entries().
+        self._path_entries = {}
+        # 2-tuples "(candidates, unindexed)" of each list of directories
+        # searched so far, keyed by the tuple of these directories. See
+        # _get_search_path_index().
+        self._search_path_indexes = {}
+        # (module_name, search_dirs) tuples of all modules not found so far.
+        self._missing_module_paths = set()
+
+
+    def _get_path_entries(self, search_dir):
+        """
+        Return the 2-tuple `(importer, names)` of the passed directory, looked
+        up and listed once and then indexed.
+
+        `importer` is the PEP 302-compliant importer of this directory or
+        `None` if this directory is not importable. `names` is the set of the
+        names of all modules this directory may provide a file or subdirectory
+        for, or `None` if this directory cannot be indexed and is to be
+        searched by its importer instead.
+        """
+        try:
+            return self._path_entries[search_dir]
+        except KeyError:
+            pass
+
+        importer = pkgutil.get_importer(search_dir)
+        names = None
+        # Only plain directories are listed, and only if module names match
+        # file names case-sensitively.
+        if (isinstance(importer, importlib.machinery.FileFinder) and
+                not _is_import_case_insensitive()):
+            try:
+                entries = os.listdir(importer.path)
+            except FileNotFoundError:
+                entries = ()
+            except OSError:
+                entries = None
+            if entries is not None:
+                names = set(entries)
+                for entry in entries:
+                    for suffix in _MODULE_SUFFIXES:
+                        if entry.endswith(suffix):
+                            names.add(entry[:-len(suffix)])
+        path_entries = self._path_entries[search_dir] = (importer, names)
+        return path_entries
+
+
+    def _get_search_path_index(self, search_dirs):
+        """
+        Return the 2-tuple `(candidates, unindexed)` indexing the passed tuple
+        of directories, built once and then indexed.
+
+        `candidates` maps the name of each module found in any indexed
+        directory to the list of the positions of all these directories
+        providing a file or subdirectory for it. `unindexed` is the list of
+        the positions of all importable directories that cannot be indexed and
+        are to be queried for every module.
+        """
+        try:
+            return self._search_path_indexes[search_dirs]
+        except KeyError:
+            pass
+
+        candidates = {}
+        unindexed = []
+        for position, search_dir in enumerate(search_dirs):
+            importer, names = self._get_path_entries(search_dir)
+            if importer is None:
+                continue
+            if names is None:
+                unindexed.append(position)
+                continue
+            for name in names:
+                candidates.setdefault(name, []).append(position)
+        index = self._search_path_indexes[search_dirs] = (
+            candidates, unindexed)
+        return index
 
 
     def _safe_import_module(
@@ -2128,50 +2418,108 @@ def _load_module(self, fqname, pathname, loader):
                 return m
 
         co = None
+        cached = None
+        source_digest = None
+        is_in_module_cache = False
         if loader is BUILTIN_MODULE:
             cls = BuiltinModule
         elif isinstance(loader, ExtensionFileLoader):
             cls = Extension
         else:
-            src = loader.get_source(partname)
-            if src is not None:
+            if self._module_cache is not None:
+                cached = self._module_cache.get(fqname, pathname)
+                is_in_module_cache = cached is not None
+            if cached is None and pathname in self._parse_futures:
                 try:
-                    co = compile(src, pathname, 'exec', ast.PyCF_ONLY_AST,
-                                 True)
-                    cls = SourceModule
-                    if sys.version_info[:2] == (3, 5):
-                        # In Python 3.5 some syntax problems with async
-                        # functions are only reported when compiling to
-                        # bytecode
-                        compile(co, '-', 'exec', 0, True)
-                except SyntaxError:
-                    co = None
-                    cls = InvalidSourceModule
-                except Exception as exc:  # FIXME: more specific?
-                    cls = InvalidSourceModule
-                    self.msg(2, "load_module: InvalidSourceModule", pathname,
+                    parsed = self._parse_futures.pop(pathname).result()
+                except Exception as exc:
+                    # The worker crashed (e.g., `BrokenProcessPool`) or its
+                    # result could not be transferred. Parse this module here.
+                    self.msg(2, "load_module: parse worker failed", pathname,
                              exc)
+                    parsed = None
+                if parsed is not None:
+                    # This module has already been parsed and compiled by a
+                    # parse worker.
+                    code, global_attr_names, imports, source_digest = parsed
+                    cached = (SourceModule, marshal.loads(code),
+                              global_attr_names, imports)
+            if cached is not None:
+                # This module is unchanged since it was cached or has been
+                # parsed by a parse worker. Reuse its code object and parsed
+                # imports instead of parsing it again.
+                cls = cached[0]
             else:
-                # no src available
-                try:
-                    co = loader.get_code(partname)
-                    cls = (CompiledModule if co is not None
-                           else InvalidCompiledModule)
-                except Exception as exc:  # FIXME: more specific?
-                    self.msg(2, "load_module: InvalidCompiledModule, "
-                             "Cannot load code", pathname, exc)
-                    cls = InvalidCompiledModule
+                src = loader.get_source(partname)
+                if src is not None and self._scan_cache is not None:
+                    source_digest = _source_digest(src)
+                    scanned = self._scan_cache.get(source_digest)
+                    if scanned is not None:
+                        # The imports of this source have already been parsed
+                        # by a previous build. Compile it straight into a code
+                        # object, skipping its abstract syntax tree.
+                        try:
+                            co = compile(src, pathname, 'exec', 0, True)
+                        except Exception:
+                            co = None
+                        else:
+                            cached = (SourceModule, co) + scanned
+                if cached is not None:
+                    cls = cached[0]
+                elif src is not None:
+                    try:
+                        co = compile(src, pathname, 'exec', ast.PyCF_ONLY_AST,
+                                     True)
+                        cls = SourceModule
+                        if sys.version_info[:2] == (3, 5):
+                            # In Python 3.5 some syntax problems with async
+                            # functions are only reported when compiling to
+                            # bytecode
+                            compile(co, '-', 'exec', 0, True)
+                    except SyntaxError:
+                        co = None
+                        cls = InvalidSourceModule
+                    except Exception as exc:  # FIXME: more specific?
+                        cls = InvalidSourceModule
+                        self.msg(2, "load_module: InvalidSourceModule", pathname,
+                                 exc)
+                else:
+                    # no src available
+                    try:
+                        co = loader.get_code(partname)
+                        cls = (CompiledModule if co is not None
+                               else InvalidCompiledModule)
+                    except Exception as exc:  # FIXME: more specific?
+                        self.msg(2, "load_module: InvalidCompiledModule, "
+                                 "Cannot load code", pathname, exc)
+                        cls = InvalidCompiledModule
 
         m = self.createNode(cls, fqname)
         m.filename = pathname
-        if co is not None:
+        if cached is not None:
+            _, co, global_attr_names, imports = cached
+            # Share the immutable set of global attributes with the cache.
+            if m._global_attr_names:
+                m._global_attr_names = m._global_attr_names | global_attr_names
+            else:
+                m._global_attr_names = global_attr_names
+            m._deferred_imports = _unpack_imports(m, imports)
+            if not is_in_module_cache:
+                self._cache_parsed_imports(m, co, source_digest)
+            self._process_imports(m)
+            if self.replace_paths:
+                co = self._replace_paths_in_code(co)
+            m.code = co
+        elif co is not None:
             try:
                 if isinstance(co, ast.AST):
                     co_ast = co
                     co = compile(co_ast, pathname, 'exec', 0, True)
                 else:
                     co_ast = None
-                self._scan_code(m, co, co_ast)
+                self._parse_imports(m, co, co_ast)
+                self._cache_parsed_imports(m, co, source_digest)
+                self._process_imports(m)
 
                 if self.replace_paths:
                     co = self._replace_paths_in_code(co)
@@ -2628,6 +2976,34 @@ def _scan_code(
             `module_code_object` is parsed instead.
         """
 
+        self._parse_imports(
+            module, module_code_object, module_code_object_ast)
+
+        # Add all imports parsed above to this graph.
+        self._process_imports(module)
+
+
+    def _parse_imports(
+        self,
+        module,
+        module_code_object,
+        module_code_object_ast=None):
+        """
+        Parse all import statements from the passed code object of the passed
+        source module into the list of deferred imports of this module,
+        _without_ adding these imports to this graph.
+
+        Parameters
+        ----------
+        module : Node
+            Graph node of the module to be parsed.
+        module_code_object : PyCodeObject
+            Code object providing this module's disassembled Python bytecode.
+        module_code_object_ast : optional[ast.AST]
+            Optional abstract syntax tree (AST) of this module if any or `None`
+            otherwise. See `_scan_code()` for details.
+        """
+
         # For safety, guard against multiple scans of the same module by
         # resetting this module's list of deferred target imports. While
         # uncommon, this edge case can occur due to:
@@ -2654,11 +3030,31 @@ def _scan_code(
             self._scan_bytecode(
                 module, module_code_object, is_scanning_imports=True)
 
-        # Add all imports parsed above to this graph.
-        self._process_imports(module)
 
+    def _cache_parsed_imports(self, module, module_code_object, source_digest):
+        """
+        Record the imports parsed but not yet processed from the passed module
+        in the module cache and the import scan cache of this graph if any.
 
-    def _scan_ast(self, module, module_code_object_ast):
+        Parameters
+        ----------
+        module : Node
+            Graph node of the module whose imports have been parsed.
+        module_code_object : PyCodeObject
+            Code object of this module.
+        source_digest : bytes
+            Digest of the source of this module as returned by
+            `_source_digest()` or `None` if unknown, in which case this module
+            is not recorded in the import scan cache.
+        """
+        if self._module_cache is not None:
+            self._module_cache.put(module, module_code_object)
+        if self._scan_cache is not None and source_digest is not None:
+            self._scan_cache.put(source_digest, module)
+
+
+    @staticmethod
+    def _scan_ast(module, module_code_object_ast):
         """
         Parse and add all import statements from the passed abstract syntax
         tree (AST) of the passed source module to this graph, non-recursively.
@@ -2671,7 +3067,7 @@ def _scan_ast(self, module, module_code_object_ast):
             Abstract syntax tree (AST) of this module to be parsed.
         """
 
-        visitor = _Visitor(self, module)
+        visitor = _Visitor(module)
         visitor.visit(module_code_object_ast)
 
     #FIXME: Optimize. Global attributes added by this method are tested by
@@ -2684,8 +3080,8 @@ def _scan_ast(self, module, module_code_object_ast):
     #After doing so, the "Node._global_attr_names" attribute and all methods
     #using this attribute (e.g., Node.is_global()) should be moved from the
     #"Node" superclass to the "Package" subclass.
-    def _scan_bytecode(
-        self, module, module_code_object, is_scanning_imports):
+    @staticmethod
+    def _scan_bytecode(module, module_code_object, is_scanning_imports):
         """
         Parse and add all import statements from the passed code object of the
         passed source module to this graph, non-recursively.
@@ -2753,30 +3149,31 @@ def _scan_bytecode(
         # 'deque' is a list-like container with fast appends, pops on
         # either end, and automatically discarding elements too much.
         prev_insts = deque(maxlen=2)
-        for inst in util.iterate_instructions(module_code_object):
+        for inst in util.iterate_opcodes(module_code_object):
             if not inst:
                 continue
+            opname, argval = inst
             # If this is an import statement originating from this module,
             # parse this import.
             #
             # Note that the related "IMPORT_FROM" opcode need *NOT* be parsed.
             # "IMPORT_NAME" suffices. For further details, see
             #     http://probablyprogramming.com/2008/04/14/python-import_name
-            if inst.opname == 'IMPORT_NAME':
+            if opname == 'IMPORT_NAME':
                 # If this method is ignoring import statements, skip to the
                 # next opcode.
                 if not is_scanning_imports:
                     continue
 
-                assert prev_insts[-2].opname == 'LOAD_CONST'
-                assert prev_insts[-1].opname == 'LOAD_CONST'
+                assert prev_insts[-2][0] == 'LOAD_CONST'
+                assert prev_insts[-1][0] == 'LOAD_CONST'
 
                 # Python >=2.5: LOAD_CONST flags, LOAD_CONST names, IMPORT_NAME name
-                level = prev_insts[-2].argval
-                fromlist = prev_insts[-1].argval
+                level = prev_insts[-2][1]
+                fromlist = prev_insts[-1][1]
 
                 assert fromlist is None or type(fromlist) is tuple
-                target_module_partname = inst.argval
+                target_module_partname = argval
 
                 #FIXME: The exact same logic appears in _collect_import(),
                 #which isn't particularly helpful. Instead, defer this logic
@@ -2805,7 +3202,7 @@ def _scan_bytecode(
                     {}
                 ))
 
-            elif inst.opname in ('STORE_NAME', 'STORE_GLOBAL'):
+            elif opname in ('STORE_NAME', 'STORE_GLOBAL'):
                 # If this is the declaration of a global attribute (e.g.,
                 # class, variable) in this module, store this declaration for
                 # subsequent lookup. See method docstring for further details.
@@ -2818,16 +3215,14 @@ def _scan_bytecode(
                 # in "from foo import bar", which is either a non-ignorable
                 # submodule of "foo" or an ignorable global attribute of
                 # "foo.__init__").
-                name = inst.argval
-                module.add_global_attr(name)
+                module.add_global_attr(argval)
 
-            elif inst.opname in ('DELETE_NAME', 'DELETE_GLOBAL'):
+            elif opname in ('DELETE_NAME', 'DELETE_GLOBAL'):
                 # If this is the undeclaration of a previously declared global
                 # attribute (e.g., class, variable) in this module, remove that
                 # declaration to prevent subsequent lookup. See method docstring
                 # for further details.
-                name = inst.argval
-                module.remove_global_attr_if_found(name)
+                module.remove_global_attr_if_found(argval)
 
             prev_insts.append(inst)
 
@@ -2849,6 +3244,11 @@ def _process_imports(self, source_module):
         if not source_module._deferred_imports:
             return
 
+        # Let the parse workers if any parse the target modules ahead, while
+        # these are graphed below one after another.
+        if self._parse_pool is not None:
+            self._submit_imports_to_parse_workers(source_module)
+
         # For each target module imported by this source module...
         for have_star, import_info, kwargs in source_module._deferred_imports:
             # Graph node of the target module specified by the "from" portion
@@ -2874,20 +3274,156 @@ def _process_imports(self, source_module):
                 #    prefixed by "_" should be imported.
                 source_module.add_global_attrs_from_module(target_module)
 
-                source_module._starimported_ignored_module_names.update(
+                source_module.add_starimported_ignored_module_names(
                     target_module._starimported_ignored_module_names)
 
                 # If this target module has no code object and hence is
                 # unparsable, record its name for posterity.
                 if target_module.code is None:
                     target_module_name = import_info[0]
-                    source_module._starimported_ignored_module_names.add(
-                        target_module_name)
+                    source_module.add_starimported_ignored_module_names(
+                        (target_module_name,))
 
         # For safety, prevent these imports from being reprocessed.
         source_module._deferred_imports = None
 
 
+    def start_parse_workers(self, max_workers=None):
+        """
+        Start a pool of worker processes parsing and compiling the source
+        files of modules ahead of the graph walk.
+
+        Parsing and compiling modules is CPU-bound and independent for each
+        module. When graphing the imports of a module, the source files of all
+        target modules which can already be located are submitted to these
+        workers. The code objects and parsed imports of these modules are then
+        consumed by `_load_module()`, while the graph itself is still built by
+        this process only.
+
+        Parameters
+        ----------
+        max_workers : int
+            Maximum number of worker processes, defaulting to the number of
+            processors of this machine.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        self.stop_parse_workers()
+        self._parse_pool = ProcessPoolExecutor(max_workers)
+
+    def stop_parse_workers(self):
+        """
+        Stop the worker processes started by `start_parse_workers()` if any.
+        """
+        if self._parse_pool is None:
+            return
+        for future in self._parse_futures.values():
+            future.cancel()
+        self._parse_pool.shutdown()
+        self._parse_pool = None
+        self._parse_futures = {}
+
+    def _submit_imports_to_parse_workers(self, source_module):
+        """
+        Submit the source files of all modules imported by the passed source
+        module, which can be located and have not been graphed yet, to the
+        parse workers.
+
+        This is speculative: modules are located without running any hooks,
+        thus the submitted source file may differ from the one finally loaded
+        by `_load_module()`, in which case the result is simply not used.
+        """
+        for _, import_info, _ in source_module._deferred_imports:
+            target_module_partname, _, target_attr_names, level = import_info
+
+            # Resolve relative imports against the package of the source module.
+            if level is not None and level > 0:
+                if isinstance(source_module, Package):
+                    package_name = source_module.identifier
+                else:
+                    package_name = source_module.identifier.rpartition('.')[0]
+                package_parts = package_name.split('.') if package_name else []
+                if level - 1 >= len(package_parts):
+                    continue
+                package_parts = package_parts[:len(package_parts) - level + 1]
+                if target_module_partname:
+                    package_parts.append(target_module_partname)
+                target_module_name = '.'.join(package_parts)
+            else:
+                target_module_name = target_module_partname
+            if not target_module_name:
+                continue
+
+            # Submit the target module and all its parent packages as far as
+            # these can be located yet, followed by all submodules possibly
+            # imported from the target package by a "from"-style import.
+            module_names = target_module_name.split('.')
+            module_names = ['.'.join(module_names[:i])
+                            for i in range(1, len(module_names) + 1)]
+            if target_attr_names:
+                module_names.extend(
+                    target_module_name + '.' + attr_name
+                    for attr_name in target_attr_names)
+            for module_name in module_names:
+                if not self._submit_module_to_parse_workers(module_name):
+                    break
+            if self._parse_pool is None:
+                # The pool failed and was stopped.
+                return
+
+    def _submit_module_to_parse_workers(self, module_name):
+        """
+        Submit the source file of the module with the passed name to the parse
+        workers if this module can be located and has not been graphed yet.
+
+        Returns
+        ----------
+        bool
+            `False` only if this module can not be located yet, as its parent
+            package has not been graphed yet.
+        """
+        # Lazy nodes are instantiated by findNode(), which must be left to
+        # the regular graph walk.
+        if module_name in self.lazynodes:
+            return False
+        if self.findNode(module_name, create_nspkg=False) is not None:
+            return True
+
+        parent_name, _, module_partname = module_name.rpartition('.')
+        if parent_name:
+            if parent_name in self.lazynodes:
+                return False
+            parent = self.findNode(parent_name, create_nspkg=False)
+            if parent is None or not parent.packagepath:
+                return False
+            search_dirs = parent.packagepath
+        elif module_name in sys.builtin_module_names:
+            return True
+        else:
+            search_dirs = self.path
+
+        # Bypass subclasses of this class, which may run hooks on locating
+        # modules.
+        try:
+            pathname, loader = ModuleGraph._find_module_path(
+                self, module_name, module_partname, search_dirs)
+        except ImportError:
+            return False
+        if (not isinstance(loader, importlib.machinery.SourceFileLoader) or
+                pathname in self._parse_futures):
+            return True
+        if (self._module_cache is not None and
+                self._module_cache.contains(module_name, pathname)):
+            return True
+        try:
+            self._parse_futures[pathname] = self._parse_pool.submit(
+                _parse_source_file, pathname)
+        except Exception as exc:
+            # The pool is broken (e.g., a worker was killed). Modules not
+            # parsed yet are parsed by this process instead.
+            self.msg(2, "submit_module_to_parse_workers: pool failed", exc)
+            self.stop_parse_workers()
+        return True
+
     def _find_module(self, name, path, parent=None):
         """
         3-tuple describing the physical location of the module with the passed
@@ -2980,6 +3516,24 @@ def _find_module_path(self, fullname, module_name, search_dirs):
         """
         self.msgin(4, "_find_module_path <-", fullname, search_dirs)
 
+        # If this module was already not found in these directories, fail
+        # without searching them again.
+        search_dirs = tuple(search_dirs)
+        missing_key = (module_name, search_dirs)
+        if missing_key in self._missing_module_paths:
+            self.msgout(4, "_find_module_path -> missing")
+            raise ImportError("No module named " + repr(module_name))
+
+        # Only search the directories indexed as providing a file or
+        # subdirectory for this module and those that cannot be indexed, in
+        # order. This avoids looking up and querying the importers of all
+        # other directories, which check the modification time of their
+        # directory on each query.
+        candidates, unindexed = self._get_search_path_index(search_dirs)
+        positions = candidates.get(module_name, ())
+        if unindexed:
+            positions = sorted(set(positions).union(unindexed))
+
         # Top-level 2-tuple to be returned.
         path_data = None
 
@@ -2988,14 +3542,9 @@ def _find_module_path(self, fullname, module_name, search_dirs):
         namespace_dirs = []
 
         try:
-            for search_dir in search_dirs:
+            for position in positions:
                 # PEP 302-compliant importer making loaders for this directory.
-                importer = pkgutil.get_importer(search_dir)
-
-                # If this directory is not importable, continue.
-                if importer is None:
-                    # self.msg(4, "_find_module_path importer not found", search_dir)
-                    continue
+                importer, _ = self._get_path_entries(search_dirs[position])
 
                 # Get the PEP 302-compliant loader object loading this module.
                 #
@@ -3064,6 +3613,7 @@ def _find_module_path(self, fullname, module_name, search_dirs):
         # If this module was not found, raise an exception.
         self.msgout(4, "_find_module_path ->", path_data)
         if path_data is None:
+            self._missing_module_paths.add(missing_key)
             raise ImportError("No module named " + repr(module_name))
 
         return path_data
@@ -11,6 +11,7 @@
 import marshal
 import warnings
 import inspect
+import dis
 
 try:
     unicode
@@ -149,3 +150,114 @@ def iterate_instructions(code_object):
         if inspect.iscode(constant):
             for instruction in iterate_instructions(constant):
                 yield instruction
+
+
+# Instructions whose argument is resolved by iterate_opcodes(), mapped to the
+# kind of this argument: an index into "co_consts" or into "co_names".
+_ARG_CONST = 1
+_ARG_NAME = 2
+# Index into "co_names" shifted left by one bit, the lowest bit being a flag.
+_ARG_FLAGGED_NAME = 3
+_RESOLVED_OPNAMES = {
+    'LOAD_CONST': _ARG_CONST,
+    'IMPORT_NAME': _ARG_NAME,
+    'STORE_NAME': _ARG_NAME,
+    'STORE_GLOBAL': _ARG_NAME,
+    'DELETE_NAME': _ARG_NAME,
+    'DELETE_GLOBAL': _ARG_NAME,
+    'LOAD_NAME': _ARG_NAME,
+    'LOAD_GLOBAL': (_ARG_FLAGGED_NAME if sys.version_info >= (3, 11)
+                    else _ARG_NAME),
+    'LOAD_ATTR': (_ARG_FLAGGED_NAME if sys.version_info >= (3, 12)
+                  else _ARG_NAME),
+    'LOAD_METHOD': _ARG_NAME,
+}
+# For each opcode, 2-tuple of its name and the kind of its resolved argument.
+_OPCODE_TABLE = tuple(
+    (opname, _RESOLVED_OPNAMES.get(opname)) for opname in dis.opname)
+_EXTENDED_ARG = dis.EXTENDED_ARG
+# Inline cache entries following some instructions since Python 3.11.
+_CACHE = dis.opmap.get('CACHE', -1)
+
+
+def _decode_wordcode(code_object):
+    code = code_object.co_code
+    consts = code_object.co_consts
+    names = code_object.co_names
+    table = _OPCODE_TABLE
+    extended_arg = 0
+    for i in range(0, len(code), 2):
+        op = code[i]
+        if op == _EXTENDED_ARG:
+            extended_arg = (extended_arg | code[i + 1]) << 8
+            continue
+        arg = extended_arg | code[i + 1]
+        extended_arg = 0
+        if op == _CACHE:
+            continue
+        opname, kind = table[op]
+        if kind is None:
+            yield opname, None
+        elif kind == _ARG_CONST:
+            yield opname, consts[arg]
+        elif kind == _ARG_NAME:
+            yield opname, names[arg]
+        else:
+            yield opname, names[arg >> 1]
+
+
+def _decode_bytecode(code_object):
+    # Python < 3.6: instructions taking an argument span three bytes.
+    code = code_object.co_code
+    consts = code_object.co_consts
+    names = code_object.co_names
+    table = _OPCODE_TABLE
+    extended_arg = 0
+    i = 0
+    n = len(code)
+    while i < n:
+        op = code[i]
+        if op < dis.HAVE_ARGUMENT:
+            i += 1
+            yield table[op][0], None
+            continue
+        arg = extended_arg | code[i + 1] | (code[i + 2] << 8)
+        i += 3
+        if op == _EXTENDED_ARG:
+            extended_arg = arg << 16
+            continue
+        extended_arg = 0
+        opname, kind = table[op]
+        if kind is None:
+            yield opname, None
+        elif kind == _ARG_CONST:
+            yield opname, consts[arg]
+        else:
+            yield opname, names[arg]
+
+
+def iterate_opcodes(code_object):
+    """Delivers the byte-code instructions as a continuous stream of
+    `(opname, argval)` tuples, decoded directly from `co_code`.
+
+    This is a much faster alternative to `iterate_instructions()` for scanning
+    imports, global names and library loads. `argval` is only resolved for
+    instructions loading constants, importing modules and loading or storing
+    names and attributes, and is `None` for all other instructions.
+    `EXTENDED_ARG` prefixes are folded into the argument of the following
+    instruction and inline cache entries are skipped. After each code-block
+    (`co_code`), `None` is yielded to mark the end of the block and to
+    interrupt the stream.
+    """
+    if sys.version_info >= (3, 6):
+        yield from _decode_wordcode(code_object)
+    else:
+        yield from _decode_bytecode(code_object)
+
+    yield None
+
+    # For each constant in this code object that is itself a code object,
+    # parse this constant in the same manner.
+    for constant in code_object.co_consts:
+        if inspect.iscode(constant):
+            yield from iterate_opcodes(constant)
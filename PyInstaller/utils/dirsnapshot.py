@@ -0,0 +1,313 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2020, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License (version 2
+# or later) with exception for distributing the bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#
+# SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
+#-----------------------------------------------------------------------------
+
+"""
+Snapshot of the contents of directories, shared by all steps of a build
+collecting files from these directories.
+
+Hooks collecting the data files and dynamic libraries of a package, the
+expansion of the globs listed by hooks and `Tree` each walk the same
+directories. Walking these through a snapshot lists each directory once per
+build.
+"""
+
+import fnmatch
+import functools
+import os
+import re
+import time
+from pathlib import PurePath
+
+from ..compat import is_win
+
+# Snapshot shared by the steps of the current build, set by the build. If
+# `None`, each caller walks the filesystem through a snapshot of its own.
+snapshot = None
+
+_MAGIC = re.compile('[*?[]')
+
+# Listings of directories modified less than this many seconds ago are not
+# reused, as further changes within the granularity of modification times
+# would go unnoticed.
+_RACY_INTERVAL = 2
+
+
+def get_snapshot():
+    """
+    Return the snapshot shared by the steps of the current build or, outside
+    of a build, a new empty snapshot.
+    """
+    return snapshot if snapshot is not None else DirectorySnapshot()
+
+
+@functools.lru_cache(maxsize=512)
+def _compile(pattern):
+    """
+    Return the function matching file names against the passed glob pattern,
+    as `fnmatch.fnmatch()` does.
+    """
+    return re.compile(fnmatch.translate(os.path.normcase(pattern))).match
+
+
+@functools.lru_cache(maxsize=512)
+def _compile_path_pattern(pattern):
+    """
+    Return the function matching file names against the passed component of
+    a glob pattern, as `pathlib.Path.glob()` does.
+    """
+    flags = re.IGNORECASE if is_win else 0
+    return re.compile(fnmatch.translate(pattern), flags).fullmatch
+
+
+class DirectorySnapshot(object):
+    """
+    Snapshot of the entries of the directories walked through it.
+
+    The entries of each directory are listed by `os.scandir()` on first
+    access and reused afterwards, along with the types of these entries, as
+    long as the modification time of this directory is unchanged. Entries
+    added, removed or renamed meanwhile (e.g., by the build or its spec file)
+    are thus listed again. The contents of the passed directories written to
+    by the build (e.g., its work path) are never reused.
+
+    The methods of this class mimic the functions of `os`, `os.path`, `glob`
+    and `pathlib` of the same name.
+
+    Parameters
+    ----------
+    volatile_dirs : list
+        Paths of the directories whose contents may change while this
+        snapshot is used.
+    """
+
+    def __init__(self, volatile_dirs=()):
+        # Mapping the normalized path of each directory listed to a 2-tuple
+        # of the identity and modification time of this directory when
+        # listed and a dict mapping the normalized names of its entries to
+        # 4-tuples `(name, is_dir, is_file, is_symlink)`.
+        self._entries = {}
+        self._volatile_dirs = tuple(
+            os.path.join(os.path.normcase(os.path.abspath(path)), '')
+            for path in volatile_dirs)
+
+    def _is_volatile(self, key):
+        return (key + os.sep).startswith(self._volatile_dirs)
+
+    def _get_entries(self, path):
+        """
+        Return the entries of the passed directory, raising `OSError` if
+        this directory cannot be listed.
+        """
+        key = os.path.normcase(os.path.abspath(path))
+        st = os.stat(path or os.curdir)
+        stamp = (st.st_dev, st.st_ino, st.st_mtime_ns)
+        record = self._entries.get(key)
+        if record is not None and record[0] == stamp:
+            return record[1]
+        entries = {}
+        # Not used as context manager, which requires Python 3.6.
+        for entry in list(os.scandir(path or os.curdir)):
+            try:
+                is_dir = entry.is_dir()
+                is_file = not is_dir and entry.is_file()
+            except OSError:
+                is_dir = is_file = False
+            entries[os.path.normcase(entry.name)] = (
+                entry.name, is_dir, is_file, entry.is_symlink())
+        if not self._is_volatile(key) and \
+                time.time() - st.st_mtime >= _RACY_INTERVAL:
+            self._entries[key] = (stamp, entries)
+        return entries
+
+    def _get_entry(self, path):
+        """
+        Return the entry of the passed path in the snapshot of its parent
+        directory, `None` if there is no such entry or `False` if the parent
+        directory cannot be listed.
+        """
+        dirname, basename = os.path.split(path)
+        if not basename or basename in (os.curdir, os.pardir):
+            return False
+        try:
+            entries = self._get_entries(dirname)
+        except OSError:
+            return False
+        return entries.get(os.path.normcase(basename))
+
+    ## os and os.path
+
+    def listdir(self, path):
+        return [entry[0] for entry in self._get_entries(path).values()]
+
+    def isdir(self, path):
+        entry = self._get_entry(path)
+        if entry is False:
+            return os.path.isdir(path)
+        return entry is not None and entry[1]
+
+    def isfile(self, path):
+        entry = self._get_entry(path)
+        if entry is False:
+            return os.path.isfile(path)
+        return entry is not None and entry[2]
+
+    def islink(self, path):
+        entry = self._get_entry(path)
+        if entry is False:
+            return os.path.islink(path)
+        return entry is not None and entry[3]
+
+    def lexists(self, path):
+        entry = self._get_entry(path)
+        if entry is False:
+            return os.path.lexists(path)
+        return entry is not None
+
+    def exists(self, path):
+        entry = self._get_entry(path)
+        if entry is False or (entry and entry[3] and not entry[1] and
+                              not entry[2]):
+            # Symbolic links may point to other types of files.
+            return os.path.exists(path)
+        return entry is not None
+
+    def stat(self, path):
+        # Never reused, as files may be modified in place.
+        return os.stat(path)
+
+    def walk(self, top):
+        """
+        Walk the passed directory top-down without following symbolic links,
+        as `os.walk()` does.
+        """
+        try:
+            entries = self._get_entries(top)
+        except OSError:
+            return
+        dirnames = []
+        filenames = []
+        for name, is_dir, _, _ in entries.values():
+            (dirnames if is_dir else filenames).append(name)
+        yield top, dirnames, filenames
+        # Subdirectories removed from the yielded list are skipped.
+        for name in dirnames:
+            entry = entries.get(os.path.normcase(name))
+            if entry is None or not entry[3]:
+                yield from self.walk(os.path.join(top, name))
+
+    ## glob
+
+    def glob(self, pattern):
+        """
+        Return the list of the paths matching the passed pattern, as
+        `glob.glob()` does without the `recursive` argument.
+        """
+        return list(self._iglob(pattern, False))
+
+    def _iglob(self, pattern, dironly):
+        dirname, basename = os.path.split(pattern)
+        if not _MAGIC.search(pattern):
+            if basename:
+                if self.lexists(pattern):
+                    yield pattern
+            # Patterns ending with a slash should match only directories.
+            elif self.isdir(dirname):
+                yield pattern
+            return
+        if not dirname:
+            yield from self._glob1(dirname, basename, dironly)
+            return
+        if dirname != pattern and _MAGIC.search(dirname):
+            dirs = self._iglob(dirname, True)
+        else:
+            dirs = [dirname]
+        for dirname in dirs:
+            if _MAGIC.search(basename):
+                names = self._glob1(dirname, basename, dironly)
+            elif not basename:
+                names = [basename] if self.isdir(dirname) else []
+            else:
+                names = [basename] if self.lexists(
+                    os.path.join(dirname, basename)) else []
+            for name in names:
+                yield os.path.join(dirname, name)
+
+    def _glob1(self, dirname, pattern, dironly):
+        try:
+            entries = self._get_entries(dirname)
+        except OSError:
+            return []
+        match = _compile(pattern)
+        # Hidden files only match patterns of hidden files.
+        hidden = pattern.startswith('.')
+        return [name for name, is_dir, _, _ in entries.values()
+                if (is_dir or not dironly) and
+                (hidden or not name.startswith('.')) and
+                match(os.path.normcase(name))]
+
+    ## pathlib
+
+    def path_glob(self, root, pattern):
+        """
+        Return the list of the paths matching the passed pattern relative to
+        the passed directory, as `pathlib.Path(root).glob(pattern)` does.
+        """
+        parts = list(PurePath(pattern).parts)
+        if not parts or PurePath(pattern).anchor:
+            raise NotImplementedError("Non-relative patterns are unsupported")
+        if pattern[-1] in (os.sep, os.altsep):
+            parts.append('')
+        for part in parts:
+            if '**' in part and part != '**':
+                raise ValueError(
+                    "Invalid pattern: '**' can only be an entire path "
+                    "component")
+        root = str(PurePath(root))
+        if not self.isdir(root):
+            return []
+        return list(self._select(root, parts))
+
+    def _select(self, path, parts):
+        if not parts or not parts[0]:
+            yield path
+            return
+        part, parts = parts[0], parts[1:]
+        dironly = bool(parts)
+        if part == '**':
+            yielded = set()
+            for start in self._iter_dirs(path):
+                for selected in self._select(start, parts):
+                    if selected not in yielded:
+                        yielded.add(selected)
+                        yield selected
+        elif _MAGIC.search(part):
+            try:
+                entries = self._get_entries(path)
+            except PermissionError:
+                return
+            match = _compile_path_pattern(part)
+            for name, is_dir, _, _ in list(entries.values()):
+                if (is_dir or not dironly) and match(name):
+                    yield from self._select(os.path.join(path, name), parts)
+        else:
+            child = os.path.join(path, part)
+            if self.isdir(child) if dironly else self.exists(child):
+                yield from self._select(child, parts)
+
+    def _iter_dirs(self, path):
+        yield path
+        try:
+            entries = self._get_entries(path)
+        except PermissionError:
+            return
+        for name, is_dir, _, is_symlink in list(entries.values()):
+            if is_dir and not is_symlink:
+                yield from self._iter_dirs(os.path.join(path, name))
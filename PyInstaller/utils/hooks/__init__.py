@@ -8,21 +8,24 @@
 #
 # SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
 #-----------------------------------------------------------------------------
-import copy
-import glob
+import importlib.machinery
+import importlib.util
 import os
 import pkg_resources
 import pkgutil
 import sys
 import textwrap
-from pathlib import Path
 
 from ...compat import base_prefix, exec_command_stdout, exec_python, \
-    is_darwin, is_venv, string_types, open_file, \
+    is_darwin, is_venv, string_types, \
     EXTENSION_SUFFIXES, ALL_SUFFIXES
 from ... import HOMEPATH
 from ... import log as logging
 from ...exceptions import ExecCommandFailed
+from ...utils import dirsnapshot
+from . import staticanalysis
+from .cache import DistributionIndex
+from .worker_pool import HookWorkerPool
 
 logger = logging.getLogger(__name__)
 
@@ -40,19 +43,46 @@
 # which protocol of the wx module should be bundled.
 hook_variables = {}
 
+# Cache of the results of statements and scripts run by hooks, set by the
+# build to a `PyInstaller.utils.hooks.cache.HookQueryCache` to reuse the
+# results of previous builds. If `None`, all statements and scripts are run.
+query_cache = None
 
-def __exec_python_cmd(cmd, env=None):
+# Pool of interpreters running hook statements and scripts, started on first
+# use.
+_hook_worker_pool = None
+
+# Index of the distributions installed on the search path, set by the build to
+# a `PyInstaller.utils.hooks.cache.DistributionIndex` persisted between builds.
+# If `None`, an index is built on first use and not persisted.
+distribution_index = None
+
+
+def _get_distribution_index():
+    global distribution_index
+    if distribution_index is None:
+        distribution_index = DistributionIndex()
+    return distribution_index
+
+
+def __exec_python_cmd(cmd, env=None, cache_dependencies=None):
     """
     Executes an externally spawned Python interpreter and returns
     anything that was emitted in the standard output as a single
     string.
+
+    The statement or script is run by an interpreter of the hook worker pool
+    if possible, see `worker_pool.HookWorkerPool`. If `cache_dependencies` is
+    not `None`, results recorded in the `query_cache` are reused instead, see
+    `exec_statement()`.
     """
+    global _hook_worker_pool
     # 'PyInstaller.config' cannot be imported as other top-level modules.
     from ...config import CONF
     if env is None:
         env = {}
     # Update environment. Defaults to 'os.environ'
-    pp_env = copy.deepcopy(os.environ)
+    pp_env = dict(os.environ)
     pp_env.update(env)
     # Prepend PYTHONPATH with pathex
     # Some functions use some PyInstaller code in subprocess so add
@@ -65,21 +95,47 @@ def __exec_python_cmd(cmd, env=None):
         pp = os.pathsep.join([pp_env.get('PYTHONPATH'), pp])
     pp_env['PYTHONPATH'] = pp
 
-    txt = exec_python(*cmd, env=pp_env)
+    if cmd[0] == '-c':
+        filename, source, argv = '<string>', cmd[1], ['-c']
+    else:
+        filename, source, argv = cmd[0], None, list(cmd)
+    use_cache = query_cache is not None and cache_dependencies is not None
+    if use_cache:
+        txt = query_cache.get(filename, source, argv, pp_env)
+        if txt is not None:
+            return txt.strip()
+    if _hook_worker_pool is None:
+        _hook_worker_pool = HookWorkerPool()
+    result = _hook_worker_pool.run(filename, source, argv, pp_env)
+    if result is None:
+        txt = exec_python(*cmd, env=pp_env)
+    else:
+        txt, dependencies = result
+        if use_cache and dependencies is not None:
+            dependencies += [os.path.abspath(path)
+                             for path in cache_dependencies]
+            query_cache.put(filename, source, argv, pp_env, txt, dependencies)
     return txt.strip()
 
 
-def exec_statement(statement):
+def exec_statement(statement, cache_dependencies=None):
     """
     Executes a Python statement in an externally spawned interpreter, and
     returns anything that was emitted in the standard output as a single string.
+
+    If `cache_dependencies` is passed, the output is recorded in the
+    `query_cache` and reused by later builds as long as the modules imported
+    by the statement, the directories searched for modules and the files and
+    directories listed by `cache_dependencies` are unchanged. Only pass it if
+    the output depends on nothing else (e.g., data files read by the modules
+    and not listed, or other system state).
     """
     statement = textwrap.dedent(statement)
     cmd = ['-c', statement]
-    return __exec_python_cmd(cmd)
+    return __exec_python_cmd(cmd, cache_dependencies=cache_dependencies)
 
 
-def exec_script(script_filename, *args, env=None):
+def exec_script(script_filename, *args, env=None, cache_dependencies=None):
     """
     Executes a Python script in an externally spawned interpreter, and
     returns anything that was emitted in the standard output as a
@@ -87,6 +143,8 @@ def exec_script(script_filename, *args, env=None):
 
     To prevent misuse, the script passed to utils.hooks.exec_script
     must be located in the `PyInstaller/utils/hooks/subproc` directory.
+
+    See `exec_statement()` for `cache_dependencies`.
     """
     script_filename = os.path.basename(script_filename)
     script_filename = os.path.join(os.path.dirname(__file__), 'subproc', script_filename)
@@ -97,19 +155,21 @@ def exec_script(script_filename, *args, env=None):
 
     cmd = [script_filename]
     cmd.extend(args)
-    return __exec_python_cmd(cmd, env=env)
+    return __exec_python_cmd(cmd, env=env,
+                             cache_dependencies=cache_dependencies)
 
 
-def eval_statement(statement):
-    txt = exec_statement(statement).strip()
+def eval_statement(statement, cache_dependencies=None):
+    txt = exec_statement(statement, cache_dependencies).strip()
     if not txt:
         # return an empty string which is "not true" but iterable
         return ''
     return eval(txt)
 
 
-def eval_script(scriptfilename, *args, env=None):
-    txt = exec_script(scriptfilename, *args, env=env).strip()
+def eval_script(scriptfilename, *args, env=None, cache_dependencies=None):
+    txt = exec_script(scriptfilename, *args, env=env,
+                      cache_dependencies=cache_dependencies).strip()
     if not txt:
         # return an empty string which is "not true" but iterable
         return ''
@@ -145,7 +205,7 @@ def get_pyextension_imports(modname):
         # Print module list to stdout.
         print(list(diff))
     """ % {'modname': modname}
-    module_imports = eval_statement(statement)
+    module_imports = eval_statement(statement, cache_dependencies=[])
 
     if not module_imports:
         logger.error('Cannot find imports for module %s' % modname)
@@ -221,15 +281,110 @@ def remove_file_extension(filename):
     return os.path.splitext(filename)[0]
 
 
+def _find_module_spec(module_name):
+    """
+    Return the module spec of the module with the passed name or `None` if
+    this module is not found.
+
+    Unlike `importlib.util.find_spec()`, the parent packages of this module
+    are searched for this module without being imported. Top-level modules
+    are searched for in `CONF['pathex']` and then in `sys.path`, as by the
+    subprocesses of `get_module_attribute()`.
+    """
+    # 'PyInstaller.config' cannot be imported as other top-level modules.
+    from ...config import CONF
+    parent_name, _, _ = module_name.rpartition('.')
+    try:
+        if not parent_name:
+            for finder in (importlib.machinery.BuiltinImporter,
+                           importlib.machinery.FrozenImporter):
+                spec = finder.find_spec(module_name)
+                if spec is not None:
+                    return spec
+            return importlib.machinery.PathFinder.find_spec(
+                module_name, list(CONF['pathex']) + sys.path)
+        parent_spec = _find_module_spec(parent_name)
+        if parent_spec is None or not parent_spec.submodule_search_locations:
+            return None
+        return importlib.machinery.PathFinder.find_spec(
+            module_name, list(parent_spec.submodule_search_locations))
+    # Finders may raise about anything on broken modules.
+    except Exception:
+        return None
+
+
+def _get_static_module_attribute(module_name, attr_name):
+    """
+    Get the string value of the passed attribute from the passed module
+    without importing this module or `None` if this value cannot be determined
+    statically.
+
+    This value is searched for, in order, in:
+
+    1. The module spec found by `importlib` for the `__file__` attribute.
+    1. The literals assigned to this attribute by the module source.
+    1. The metadata of the distribution of the same name providing this
+       module for the `__version__` attribute of top-level modules, if the
+       module source binds this attribute dynamically (e.g., from
+       `pkg_resources.get_distribution()` or a generated version module).
+    """
+    spec = _find_module_spec(module_name)
+    if spec is None:
+        return None
+    if attr_name == '__file__':
+        return spec.origin if spec.has_location else None
+    if spec.origin is None or os.path.splitext(spec.origin)[1] not in \
+            importlib.machinery.SOURCE_SUFFIXES:
+        # Namespace packages, extensions, built-in and frozen modules.
+        return None
+    if spec.submodule_search_locations and _find_module_spec(
+            module_name + '.' + attr_name) is not None:
+        # The attribute may be set to the submodule of this package of the
+        # same name once this submodule is imported.
+        return None
+    try:
+        source = spec.loader.get_source(module_name)
+    except Exception:
+        return None
+    try:
+        bound, value = staticanalysis.get_literal_assignment(source, attr_name)
+    except ValueError:
+        # This attribute is bound dynamically.
+        pass
+    # Syntax errors, literals too deeply nested to be evaluated...
+    except Exception:
+        return None
+    else:
+        if not bound:
+            return None
+        # Format this value like `print()`, as done by `exec_statement()`.
+        return str(value).strip()
+    if attr_name != '__version__' or '.' in module_name:
+        return None
+
+    dist = _get_distribution_index().get_package_distribution(module_name)
+    if dist is None or dist.key != pkg_resources.safe_name(
+            module_name).lower():
+        return None
+    # Ignore distributions shadowed by the module found first.
+    module_dir = os.path.dirname(spec.origin)
+    if spec.submodule_search_locations:
+        module_dir = os.path.dirname(module_dir)
+    if os.path.normcase(os.path.realpath(module_dir)) != dist.location:
+        return None
+    return dist.version
+
+
 # TODO: Replace most calls to exec_statement() with calls to this function.
 def get_module_attribute(module_name, attr_name):
     """
     Get the string value of the passed attribute from the passed module if this
     attribute is defined by this module _or_ raise `AttributeError` otherwise.
 
-    Since modules cannot be directly imported during analysis, this function
-    spawns a subprocess importing this module and returning the string value of
-    this attribute in this module.
+    Since modules cannot be directly imported during analysis, this value is
+    first determined statically (e.g., from literals assigned by the module
+    source). Failing that, this function spawns a subprocess importing this
+    module and returning the string value of this attribute in this module.
 
     Parameters
     ----------
@@ -248,6 +403,10 @@ def get_module_attribute(module_name, attr_name):
     AttributeError
         If this attribute is undefined.
     """
+    attr_value = _get_static_module_attribute(module_name, attr_name)
+    if attr_value is not None:
+        return attr_value
+
     # Magic string to be printed and captured below if this attribute is
     # undefined, which should be sufficiently obscure as to avoid collisions
     # with actual attribute values. That's the hope, anyway.
@@ -255,7 +414,8 @@ def get_module_attribute(module_name, attr_name):
     attr_value = exec_statement("""
         import %s as m
         print(getattr(m, %r, %r))
-    """ % (module_name, attr_name, attr_value_if_undefined))
+    """ % (module_name, attr_name, attr_value_if_undefined),
+        cache_dependencies=[])
 
     if attr_value == attr_value_if_undefined:
         raise AttributeError(
@@ -268,9 +428,10 @@ def get_module_file_attribute(package):
     """
     Get the absolute path of the module with the passed name.
 
-    Since modules *cannot* be directly imported during analysis, this function
-    spawns a subprocess importing this module and returning the value of this
-    module's `__file__` attribute.
+    Since modules *cannot* be directly imported during analysis, this path is
+    first searched for by `importlib` without importing this module or its
+    parent packages. Failing that, this function spawns a subprocess importing
+    this module and returning the value of this module's `__file__` attribute.
 
     Parameters
     ----------
@@ -282,18 +443,13 @@ def get_module_file_attribute(package):
     str
         Absolute path of this module.
     """
-    # First try to use 'pkgutil'. - fastest but doesn't work on
+    # First try to find the module spec - fastest but doesn't work on
     # certain modules in pywin32, which replace all module attributes
     # with those of the .dll
-    try:
-        loader = pkgutil.find_loader(package)
-        attr = loader.get_filename(package)
-        # The built-in ``datetime`` module returns ``None``. Mark this as
-        # an ``ImportError``.
-        if not attr:
-            raise ImportError('Unable to load module attributes')
-    # Second try to import module in a subprocess. Might raise ImportError.
-    except (AttributeError, ImportError) as e:
+    attr = _get_static_module_attribute(package, '__file__')
+    # The built-in ``datetime`` module has no location. Second try to import
+    # module in a subprocess. Might raise ImportError.
+    if not attr:
         # Statement to return __file__ attribute of a package.
         __file__statement = """
             import %s as p
@@ -303,9 +459,10 @@ def get_module_file_attribute(package):
                 # If p lacks a file attribute, hide the exception.
                 pass
         """
-        attr = exec_statement(__file__statement % package)
+        attr = exec_statement(__file__statement % package,
+                              cache_dependencies=[])
         if not attr.strip():
-            raise ImportError('Unable to load module attribute') from e
+            raise ImportError('Unable to load module attribute')
     return attr
 
 
@@ -358,10 +515,11 @@ class method (e.g., `idontevenknow<1.6,>1.9,!=1.9.6,<2.0a0,==2.4c1`) is
            their constituent components. This is surprisingly non-trivial!
         1. The current version of the desired module is found as follows:
            * If the passed `version` parameter is non-`None`, that is used.
-           * Else, a subprocess importing this module is spawned and the value
-             of this module's version attribute in that subprocess is used. The
-             name of this attribute defaults to `__version__` but may be
-             configured with the passed `version_attr` parameter.
+           * Else, the value of this module's version attribute is used, as
+             found by `get_module_attribute()` (i.e., statically if possible,
+             else by importing this module in a subprocess). The name of this
+             attribute defaults to `__version__` but may be configured with
+             the passed `version_attr` parameter.
         1. These requirements are validated against this version.
 
     Note that `setuptools` is generally considered to be the most robust means
@@ -441,6 +599,10 @@ class method (e.g., `idontevenknow<1.6,>1.9,!=1.9.6,<2.0a0,==2.4c1`) is
         # If a setuptools distribution exists for this module, this validation
         # is a simple one-liner. This approach supports non-version validation
         # (e.g., of "["- and "]"-delimited extras) and is hence preferable.
+        requirements_parsed = pkg_resources.Requirement.parse(requirements)
+        dist = _get_distribution_index().get(requirements_parsed.key)
+        if dist is not None and not requirements_parsed.extras:
+            return dist.version in requirements_parsed
         try:
             pkg_resources.get_distribution(requirements)
         # If no such distribution exists, fallback to the logic below.
@@ -460,7 +622,8 @@ class method (e.g., `idontevenknow<1.6,>1.9,!=1.9.6,<2.0a0,==2.4c1`) is
 
     # If no version was explicitly passed, query this module for it.
     if version is None:
-        module_name = requirements_parsed.project_name
+        # The project name is a safe name, with dashes replacing underscores.
+        module_name = requirements_parsed.name
         version = get_module_attribute(module_name, version_attr)
 
     if not version:
@@ -516,36 +679,17 @@ def get_package_paths(package):
     return pkg_base, pkg_dir
 
 
-def collect_submodules(package, filter=lambda name: True):
-    """
-    :param package: A string which names the package which will be search for
-        submodules.
-    :param approve: A function to filter through the submodules found,
-        selecting which should be included in the returned list. It takes one
-        argument, a string, which gives the name of a submodule. Only if the
-        function returns true is the given submodule is added to the list of
-        returned modules. For example, ``filter=lambda name: 'test' not in
-        name`` will return modules that don't contain the word ``test``.
-    :return: A list of strings which specify all the modules in package. Its
-        results can be directly assigned to ``hiddenimports`` in a hook script;
-        see, for example, ``hook-sphinx.py``.
+# Packages whose submodules `collect_submodules()` finds by importing these
+# packages and their subpackages rather than by scanning their directories.
+# Hooks may add packages which locate or generate their submodules at import
+# time in ways not detected by `collect_submodules()`.
+COLLECT_SUBMODULES_BY_IMPORT = set()
 
-    This function is used only for hook scripts, but not by the body of
-    PyInstaller.
+def _find_submodules_by_import(package, pkg_dir):
+    """
+    Return the names of all submodules of the passed package found by
+    importing this package and its subpackages.
     """
-    # Accept only strings as packages.
-    if not isinstance(package, string_types):
-        raise TypeError('package must be a str')
-
-    logger.debug('Collecting submodules for %s' % package)
-    # Skip a module which is not a package.
-    if not is_package(package):
-        logger.debug('collect_submodules - Module %s is not a package.' % package)
-        return []
-
-    # Determine the filesystem path to the specified package.
-    pkg_base, pkg_dir = get_package_paths(package)
-
     # Walk the package. Since this performs imports, do it in a separate
     # process. Because module import may result in exta output to stdout,
     # we enclose the output module names with special prefix and suffix.
@@ -593,19 +737,66 @@ def seen(p, m={{}}):
             print('\\n$_pyi:' + name + '*')
         """.format(
                   # Use repr to escape Windows backslashes.
-                  repr(pkg_dir), package))
+                  repr(pkg_dir), package),
+        # The directories of the packages walked are those of modules.
+        cache_dependencies=[pkg_dir])
+
+    # Filter out extra output during module imports by checking
+    # for the special prefix and suffix
+    return [name[6:-1] for name in names.split()
+            if name.startswith("$_pyi:") and name.endswith("*")]
+
+
+def collect_submodules(package, filter=lambda name: True):
+    """
+    :param package: A string which names the package which will be search for
+        submodules.
+    :param approve: A function to filter through the submodules found,
+        selecting which should be included in the returned list. It takes one
+        argument, a string, which gives the name of a submodule. Only if the
+        function returns true is the given submodule is added to the list of
+        returned modules. For example, ``filter=lambda name: 'test' not in
+        name`` will return modules that don't contain the word ``test``.
+    :return: A list of strings which specify all the modules in package. Its
+        results can be directly assigned to ``hiddenimports`` in a hook script;
+        see, for example, ``hook-sphinx.py``.
+
+    Submodules are found by scanning the directory of the package, without
+    importing it. Only if this package or any of its subpackages might change
+    its ``__path__`` when imported, or if it is listed in
+    ``COLLECT_SUBMODULES_BY_IMPORT``, the package and its subpackages are
+    imported in a separate process to find the submodules.
+
+    This function is used only for hook scripts, but not by the body of
+    PyInstaller.
+    """
+    # Accept only strings as packages.
+    if not isinstance(package, string_types):
+        raise TypeError('package must be a str')
+
+    logger.debug('Collecting submodules for %s' % package)
+    # Skip a module which is not a package.
+    if not is_package(package):
+        logger.debug('collect_submodules - Module %s is not a package.' % package)
+        return []
+
+    # Determine the filesystem path to the specified package.
+    pkg_base, pkg_dir = get_package_paths(package)
+
+    names = None
+    if not any(is_module_or_submodule(package, name)
+               for name in COLLECT_SUBMODULES_BY_IMPORT):
+        names = staticanalysis.find_submodules_in_dirs(package, pkg_dir)
+        if names is None:
+            logger.debug('collect_submodules - Package %s might change its '
+                         '__path__, importing it.', package)
+    if names is None:
+        names = _find_submodules_by_import(package, pkg_dir)
 
     # Include the package itself in the results.
     mods = {package}
     # Filter through the returend submodules.
-    for name in names.split():
-        # Filter out extra output during module imports by checking
-        # for the special prefix and suffix
-        if name.startswith("$_pyi:") and name.endswith("*"):
-            name = name[6:-1]
-        else:
-            continue
-
+    for name in names:
         if filter(name):
             mods.add(name)
 
@@ -651,11 +842,12 @@ def collect_dynamic_libs(package, destdir=None):
     logger.debug('Collecting dynamic libraries for %s' % package)
     pkg_base, pkg_dir = get_package_paths(package)
     # Walk through all file in the given package, looking for dynamic libraries.
+    snapshot = dirsnapshot.get_snapshot()
     dylibs = []
-    for dirpath, _, __ in os.walk(pkg_dir):
+    for dirpath, _, __ in snapshot.walk(pkg_dir):
         # Try all file patterns in a given directory.
         for pattern in PY_DYLIB_PATTERNS:
-            files = glob.glob(os.path.join(dirpath, pattern))
+            files = snapshot.glob(os.path.join(dirpath, pattern))
             for source in files:
                 # Produce the tuple
                 # (/abs/path/to/source/mod/submod/file.pyd,
@@ -746,8 +938,9 @@ def collect_data_files(package, include_py_files=False, subdir=None,
     includes = list(includes) if includes else ["**/*"]
     includes_len = len(includes)
 
-    # Determine what source files to use.
-    sources = set()
+    # Determine what source files to use, keyed by their normalized path.
+    sources = {}
+    snapshot = dirsnapshot.get_snapshot()
 
     # A helper function to glob the in/ex "cludes", adding a wildcard to refer
     # to all files under a subdirectory if a subdirectory is matched by the
@@ -763,20 +956,25 @@ def clude_walker(
         is_include
     ):
         for i, c in enumerate(cludes):
-            for g in Path(pkg_dir).glob(c):
-                if g.is_dir():
+            for g in snapshot.path_glob(pkg_dir, c):
+                if snapshot.isdir(g):
                     # Only files are sources. Subdirectories are not.
                     if i < clude_len:
                         # In/exclude all files under a matching subdirectory.
-                        cludes.append(str((g / "**/*").relative_to(pkg_dir)))
+                        cludes.append(os.path.join(
+                            os.path.relpath(g, pkg_dir), '**', '*'))
+                elif is_include:
+                    # Include a matching file.
+                    sources[os.path.normcase(g)] = g
                 else:
-                    # In/exclude a matching file.
-                    sources.add(g) if is_include else sources.discard(g)
+                    # Exclude a matching file.
+                    sources.pop(os.path.normcase(g), None)
     clude_walker(includes, includes_len, True)
     clude_walker(excludes, excludes_len, False)
 
     # Tranform the sources into tuples for ``datas``.
-    datas = [(str(s), remove_prefix(str(s.parent), pkg_base)) for s in sources]
+    datas = [(s, remove_prefix(os.path.dirname(s), pkg_base))
+             for s in sources.values()]
 
     logger.debug("collect_data_files - Found files: %s", datas)
     return datas
@@ -806,7 +1004,7 @@ def collect_system_data_files(path, destdir=None, include_py_files=False):
 
     # Walk through all file in the given package, looking for data files.
     datas = []
-    for dirpath, dirnames, files in os.walk(path):
+    for dirpath, dirnames, files in dirsnapshot.get_snapshot().walk(path):
         for f in files:
             extension = os.path.splitext(f)[1]
             if include_py_files or (extension not in PY_IGNORE_EXTENSIONS):
@@ -904,12 +1102,19 @@ def copy_metadata(package_name):
     # See https://pythonhosted.org/setuptools/pkg_resources.html#getting-or-creating-distributions.
     # Unfortunately, there's no documentation on the ``egg_info`` attribute; it
     # was found through trial and error.
-    dist = pkg_resources.get_distribution(package_name)
-    metadata_dir = dist.egg_info
+    dist = _get_distribution_index().get(package_name)
+    if dist is None:
+        # Not indexed (e.g., in a zipped egg).
+        dist = pkg_resources.get_distribution(package_name)
+        metadata_dir = dist.egg_info
+        egg_name = dist.egg_name()
+    else:
+        metadata_dir = dist.metadata_dir
+        egg_name = dist.egg_name
     # Determine a destination directory based on the standardized egg name for
     # this distribution. This avoids some problems discussed in
     # https://github.com/pyinstaller/pyinstaller/issues/1888.
-    dest_dir = '{}.egg-info'.format(dist.egg_name())
+    dest_dir = '{}.egg-info'.format(egg_name)
     # Per https://github.com/pyinstaller/pyinstaller/issues/1888, ``egg_info``
     # isn't always defined. Try a workaround based on a suggestion by
     # @benoit-pierre in that issue.
@@ -936,25 +1141,24 @@ def get_installer(module):
     site_dir = file_name[:file_name.index('site-packages') + len('site-packages')]
     # This is necessary for situations where the project name and module name don't match, i.e.
     # Project name: pyenchant Module name: enchant
-    pkgs = pkg_resources.find_distributions(site_dir)
+    dists = _get_distribution_index().find_distributions(site_dir)
     package = None
-    for pkg in pkgs:
-        if module.lower() in pkg.key:
-            package = pkg
+    for dist in dists:
+        if module.split('.')[0] in dist.top_level:
+            package = dist
             break
-    metadata_dir, dest_dir = copy_metadata(package)[0]
-    # Check for an INSTALLER file in the metedata_dir and return the first line
-    # which should be the program that installed the module.
-    installer_file = os.path.join(metadata_dir, 'INSTALLER')
-    if os.path.isdir(metadata_dir) and os.path.exists(installer_file):
-        with open_file(installer_file, 'r') as installer_file_object:
-            lines = installer_file_object.readlines()
-            if lines[0] != '':
-                installer = lines[0].rstrip('\r\n')
-                logger.debug(
-                    'Found installer: \'{0}\' for module: \'{1}\' from package: \'{2}\''.format(installer, module,
-                                                                                                package))
-                return installer
+    else:
+        for dist in dists:
+            if module.lower() in dist.key:
+                package = dist
+                break
+    # The INSTALLER file in the metadata of the distribution names the
+    # program that installed the module.
+    if package is not None and package.installer:
+        logger.debug(
+            'Found installer: \'{0}\' for module: \'{1}\' from package: \'{2}\''.format(package.installer, module,
+                                                                                        package.project_name))
+        return package.installer
     if is_darwin:
         try:
             output = exec_command_stdout('port', 'provides', file_name)
@@ -972,45 +1176,10 @@ def get_installer(module):
     return None
 
 
-# ``_map_distribution_to_packages`` is expensive. Compute it when used, then
-# return the memoized value. This is a simple alternative to
-# ``functools.lru_cache``.
-def _memoize(f):
-    memo = []
-
-    def helper():
-        if not memo:
-            memo.append(f())
-        return memo[0]
-
-    return helper
-
-
-# Walk through every package, determining which distribution it is in.
-@_memoize
+# Map every distribution to the top-level packages it provides.
 def _map_distribution_to_packages():
-    logger.info('Determining a mapping of distributions to packages...')
-    dist_to_packages = {}
-    for p in sys.path:
-        # The path entry ``''`` refers to the current directory.
-        if not p:
-            p = '.'
-        # Ignore any entries in ``sys.path`` that don't exist.
-        try:
-            lds = os.listdir(p)
-        except Exception:
-            pass
-        else:
-            for ld in lds:
-                # Not all packages belong to a distribution. Skip these.
-                try:
-                    dist = pkg_resources.get_distribution(ld)
-                except Exception:
-                    pass
-                else:
-                    dist_to_packages.setdefault(dist.key, []).append(ld)
-
-    return dist_to_packages
+    return {dist.key: list(dist.top_level)
+            for dist in _get_distribution_index() if dist.top_level}
 
 
 # Given a ``package_name`` as a string, this function returns a list of packages
@@ -1019,8 +1188,15 @@ def _map_distribution_to_packages():
 def requirements_for_package(package_name):
     hiddenimports = []
 
+    dist = _get_distribution_index().get(package_name)
+    if dist is None:
+        # Not indexed (e.g., in a zipped egg).
+        requires = pkg_resources.get_distribution(package_name).requires()
+    else:
+        requires = pkg_resources.parse_requirements(dist.requires)
+
     dist_to_packages = _map_distribution_to_packages()
-    for requirement in pkg_resources.get_distribution(package_name).requires():
+    for requirement in requires:
         if requirement.key in dist_to_packages:
             required_packages = dist_to_packages[requirement.key]
             hiddenimports.extend(required_packages)
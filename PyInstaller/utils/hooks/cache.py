@@ -0,0 +1,368 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2020, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License (version 2
+# or later) with exception for distributing the bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#
+# SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
+#-----------------------------------------------------------------------------
+
+"""
+Persistent caches of the results of hook helpers, reused by consecutive
+builds.
+"""
+
+import collections
+import csv
+import hashlib
+import marshal
+import os
+import sys
+
+import pkg_resources
+
+from ... import compat
+from ... import log as logging
+from ..persistentcache import PersistentCache, file_stamp
+
+logger = logging.getLogger(__name__)
+
+
+class HookQueryCache(PersistentCache):
+    """
+    Cache of the results of statements and scripts run by hooks in a separate
+    interpreter (see `PyInstaller.utils.hooks.exec_statement()`), shared by
+    all builds. Only the results of statements and scripts run by helpers
+    declaring what these depend on are recorded (see the `cache_dependencies`
+    of `exec_statement()`).
+
+    Records are keyed by the statement or the path and contents of the
+    script, its arguments, the current directory and the environment of
+    the interpreter, including the search path. A record is only reused if
+    all files and directories its result depends on are unchanged. These
+    are the directories searched for modules, whose modification time
+    changes when distributions are installed or removed, the files and
+    directories of all modules imported by the statement or script, and the
+    files and directories declared by the helper.
+
+    Parameters
+    ----------
+    filename : str
+        Absolute path of the file this cache is persisted to.
+    """
+
+    description = 'hook query cache'
+
+    # Environment variables specific to the current shell session, which do
+    # not affect the results of statements and scripts.
+    _IGNORED_ENV_VARS = frozenset(('_', 'OLDPWD', 'PWD', 'SHLVL'))
+
+    def __init__(self, filename):
+        super(HookQueryCache, self).__init__(filename)
+        # Keys of the records found to be outdated by the current build.
+        self._outdated_keys = set()
+
+    def _is_modified(self):
+        return bool(self._new_records or self._outdated_keys)
+
+    def _merge(self, records):
+        for key in self._outdated_keys:
+            records.pop(key, None)
+        self._outdated_keys = set()
+        super(HookQueryCache, self)._merge(records)
+
+    def _key(self, filename, source, argv, env):
+        if source is None:
+            # Scripts are identified by their contents as well.
+            try:
+                with open(filename, 'rb') as fp:
+                    source = hashlib.sha256(fp.read()).hexdigest()
+            except OSError:
+                return None
+        env = sorted(item for item in env.items()
+                     if item[0] not in self._IGNORED_ENV_VARS)
+        return (filename, source, argv, os.getcwd(), env)
+
+    def get(self, filename, source, argv, env):
+        """
+        Return the cached output of the passed source or, if `None`, of the
+        script with the passed filename run with the passed `sys.argv` and
+        environment, or `None` if there is no valid record for it.
+        """
+        key = self._key(filename, source, argv, env)
+        return None if key is None else self.lookup(key)
+
+    def put(self, filename, source, argv, env, output, dependencies):
+        """
+        Record the output of the passed source or script, as run with the
+        passed `sys.argv` and environment, along with the paths of the files
+        and directories this output depends on.
+        """
+        key = self._key(filename, source, argv, env)
+        if key is not None:
+            self.store(key, output, dependencies)
+
+    def lookup(self, key):
+        """
+        Return the value recorded with the passed key, or `None` if there is
+        no valid record for it.
+
+        Besides the results of statements and scripts, hooks may record any
+        other value computed from files (see `store()`). The key is a tuple
+        of strings and other literals identifying the value.
+        """
+        digest = self._digest(key)
+        record = self._new_records.get(digest) or self._records.get(digest)
+        if record is None:
+            return None
+        value, stamps = record
+        for path, stamp in stamps.items():
+            if file_stamp(path) != stamp:
+                logger.debug('Hook query result outdated, as %s changed',
+                             path)
+                self._outdated_keys.add(digest)
+                return None
+        return value
+
+    def store(self, key, value, dependencies):
+        """
+        Record the passed value with the passed key, along with the paths of
+        the files and directories this value depends on. The value has to be
+        serializable by `marshal`.
+        """
+        try:
+            marshal.dumps(value)
+        except ValueError:
+            logger.debug('Unable to record hook query result %r', key)
+            return
+        digest = self._digest(key)
+        self._outdated_keys.discard(digest)
+        self._new_records[digest] = (
+            value, {path: file_stamp(path) for path in dependencies})
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.sha256(
+            repr(key).encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+# Distribution found on the search path, as recorded by `DistributionIndex`.
+#
+# `key` is the lower-case name used to look up the distribution (see
+# `pkg_resources.Distribution.key`), `egg_name` the standardized name of its
+# metadata directory (see `pkg_resources.Distribution.egg_name()`),
+# `metadata_dir` the path of its `.dist-info` or `.egg-info` metadata,
+# `top_level` the names of the top-level modules and packages it provides,
+# `requires` the strings of the requirements of the distribution itself (not
+# of its extras) applying to the current interpreter and `installer` the name
+# of the tool which installed it, or `None` if unknown.
+DistributionRecord = collections.namedtuple('DistributionRecord', (
+    'key', 'project_name', 'version', 'egg_name', 'metadata_dir', 'location',
+    'top_level', 'requires', 'installer'))
+
+
+class DistributionIndex(PersistentCache):
+    """
+    Index of the distributions installed on the search path, built on first
+    use and shared by all builds.
+
+    Distributions are looked up like `pkg_resources.get_distribution()` does:
+    the first distribution found with the given name along `sys.path` wins.
+    Each entry of `sys.path` is scanned once for `.dist-info` and `.egg-info`
+    metadata. The distributions found in an entry are recorded along with the
+    modification times of this entry and of their metadata, and are only
+    scanned again if one of these changed (e.g., as a distribution was
+    installed into or removed from this entry).
+
+    Distributions in zipped eggs are not indexed and have to be looked up with
+    `pkg_resources` instead.
+
+    Parameters
+    ----------
+    filename : str
+        Absolute path of the file this index is persisted to, or `None` if
+        this index should not be persisted.
+    """
+
+    description = 'distribution index'
+
+    def __init__(self, filename=None):
+        # Records map the absolute path of each path entry scanned to a
+        # 2-tuple `(stamps, records)`. The new records are these of the path
+        # entries scanned by this process.
+        super(DistributionIndex, self).__init__(filename)
+        # Path entries scanned or checked to be unchanged by this process.
+        self._checked_entries = set()
+        # Search path the distributions below were looked up along.
+        self._path = None
+        self._distributions = {}
+        # Mapping the names of top-level packages to the distributions
+        # providing these, built on first use.
+        self._packages = None
+
+    def _decode(self, entries):
+        return {path_item: (stamps, [DistributionRecord(*record)
+                                     for record in records])
+                for path_item, (stamps, records) in entries.items()}
+
+    def _encode(self, entries):
+        return {path_item: (stamps, [tuple(record) for record in records])
+                for path_item, (stamps, records) in entries.items()}
+
+    def find_distributions(self, path_item):
+        """
+        Return the list of the `DistributionRecord` of all distributions
+        found in the passed entry of the search path, in the order these are
+        looked up.
+        """
+        # Normalize the path entry like `pkg_resources.find_on_path()`.
+        path_item = os.path.normcase(os.path.realpath(path_item or '.'))
+        entry = (self._new_records.get(path_item) or
+                 self._records.get(path_item))
+        if path_item not in self._checked_entries:
+            if entry is None or any(file_stamp(path) != stamp
+                                    for path, stamp in entry[0].items()):
+                entry = self._new_records[path_item] = self._scan(path_item)
+            self._checked_entries.add(path_item)
+        return entry[1]
+
+    def _update(self):
+        if self._path == sys.path:
+            return
+        distributions = {}
+        for path_item in sys.path:
+            for record in self.find_distributions(path_item):
+                distributions.setdefault(record.key, record)
+        self._path = list(sys.path)
+        self._distributions = distributions
+        self._packages = None
+
+    def get(self, name):
+        """
+        Return the `DistributionRecord` of the distribution with the passed
+        name found first on the search path, or `None` if no such
+        distribution was found.
+        """
+        self._update()
+        return self._distributions.get(pkg_resources.safe_name(name).lower())
+
+    def get_package_distribution(self, package_name):
+        """
+        Return the `DistributionRecord` of the distribution providing the
+        top-level module or package with the passed name, or `None` if no
+        distribution found on the search path provides it.
+        """
+        self._update()
+        if self._packages is None:
+            self._packages = {}
+            for record in self._distributions.values():
+                for name in record.top_level:
+                    self._packages.setdefault(name, record)
+        return self._packages.get(package_name)
+
+    def __iter__(self):
+        """
+        Iterate over the `DistributionRecord` of all distributions found on
+        the search path.
+        """
+        self._update()
+        return iter(list(self._distributions.values()))
+
+    @staticmethod
+    def _scan(path_item):
+        """
+        Return the 2-tuple `(stamps, records)` of the distributions found in
+        the passed normalized path entry, mimicking
+        `pkg_resources.find_on_path()`.
+        """
+        stamps = {path_item: file_stamp(path_item)}
+        distributions = []
+        names = {}
+        egg_info = os.path.join(path_item, 'EGG-INFO')
+        if path_item.lower().endswith('.egg') and os.path.isdir(egg_info):
+            # Unzipped egg.
+            stamps[egg_info] = file_stamp(egg_info)
+            distributions.append(pkg_resources.Distribution.from_filename(
+                path_item,
+                metadata=pkg_resources.PathMetadata(path_item, egg_info)))
+        else:
+            try:
+                # Not used as context manager, which requires Python 3.6.
+                dir_entries = list(os.scandir(path_item))
+            except OSError:
+                dir_entries = []
+            for dir_entry in dir_entries:
+                name = dir_entry.name
+                names.setdefault(pkg_resources.safe_name(name).lower(),
+                                 []).append(name)
+                lower = name.lower()
+                try:
+                    is_dir = dir_entry.is_dir()
+                    if is_dir and lower.endswith(('.dist-info', '.egg-info')):
+                        if not os.listdir(dir_entry.path):
+                            continue
+                        metadata = pkg_resources.PathMetadata(
+                            path_item, dir_entry.path)
+                    elif lower.endswith('.egg-info'):
+                        metadata = pkg_resources.FileMetadata(dir_entry.path)
+                    else:
+                        continue
+                except OSError:
+                    continue
+                stamps[dir_entry.path] = file_stamp(dir_entry.path)
+                distributions.append(pkg_resources.Distribution.from_location(
+                    path_item, name, metadata,
+                    precedence=pkg_resources.DEVELOP_DIST))
+        records = []
+        for dist in distributions:
+            try:
+                records.append(DistributionRecord(
+                    dist.key, dist.project_name, dist.version,
+                    dist.egg_name(), dist.egg_info, dist.location,
+                    DistributionIndex._get_top_level(dist, names),
+                    tuple(str(req) for req in dist.requires()),
+                    next(iter(dist.get_metadata_lines('INSTALLER')), None)
+                    if dist.has_metadata('INSTALLER') else None))
+            except Exception as e:
+                # Leave distributions with invalid metadata to pkg_resources.
+                logger.debug('Ignoring distribution %s: %s', dist, e)
+        # Look up the latest version first, if several are installed.
+        if len({record.key for record in records}) < len(records):
+            try:
+                records.sort(key=lambda record: pkg_resources.parse_version(
+                    record.version), reverse=True)
+            except (ValueError, TypeError):
+                pass
+        return stamps, records
+
+    @staticmethod
+    def _get_top_level(dist, names):
+        """
+        Return the names of the top-level modules and packages provided by
+        the passed distribution, whose path entry contains the files with the
+        passed names, keyed by their `pkg_resources.safe_name()` in lower case.
+        """
+        if dist.has_metadata('top_level.txt'):
+            return tuple(name.replace('/', '.') for name in
+                         dist.get_metadata_lines('top_level.txt'))
+        if dist.has_metadata('RECORD'):
+            top_level = []
+            for row in csv.reader(dist.get_metadata_lines('RECORD')):
+                parts = row[0].split('/') if row else ()
+                if len(parts) > 1:
+                    name = parts[0]
+                else:
+                    name = None
+                    for suffix in compat.ALL_SUFFIXES:
+                        if parts and parts[0].endswith(suffix):
+                            name = parts[0][:-len(suffix)]
+                            break
+                if name and name.isidentifier() and name != '__pycache__' \
+                        and name not in top_level:
+                    top_level.append(name)
+            return tuple(top_level)
+        # Without any record of the files installed, assume the distribution
+        # provides the packages named like itself.
+        return tuple(names.get(dist.key, ()))
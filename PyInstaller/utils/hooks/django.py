@@ -8,9 +8,18 @@
 #
 # SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
 # ----------------------------------------------------------------------------
+import ast
+import hashlib
+import importlib.machinery
 import os
+import sys
 
-from ..hooks import eval_script
+from .. import hooks as hookutils
+from ..hooks import eval_script, get_module_attribute
+from ...compat import getenv
+from .cache import HookQueryCache
+from .staticanalysis import find_submodules_in_dirs, get_literal_assignment
+from ... import log as logging
 from ...utils import misc
 
 
@@ -18,13 +27,37 @@
     'django_dottedstring_imports', 'django_find_root_dir'
 ]
 
+logger = logging.getLogger(__name__)
 
-def django_dottedstring_imports(django_root_dir):
+# Settings listing the modules found by `django_import_finder.py`.
+_IMPORT_SETTINGS = (
+    'INSTALLED_APPS', 'TEMPLATE_CONTEXT_PROCESSORS', 'TEMPLATE_LOADERS',
+    'ROOT_URLCONF', 'AUTHENTICATION_BACKENDS', 'DEFAULT_FILE_STORAGE',
+    'FILE_UPLOAD_HANDLERS', 'MIDDLEWARE_CLASSES', 'DATABASES',
+)
+
+# Placeholder for the parts of settings which are not literals.
+_UNKNOWN = object()
+
+
+def django_dottedstring_imports(django_root_dir, static=None):
     """
     Get all the necessary Django modules specified in settings.py.
 
     In the settings.py the modules are specified in several variables
     as strings.
+
+    These modules are found by a script setting up Django with these settings,
+    which takes a while for large projects. Its result is recorded in the hook
+    query cache of the build and reused as long as the source of the settings
+    module and of the modules next to it, the environment, the version of
+    Django and the packages of the installed apps are unchanged.
+
+    If `static` is true or, if `None`, if the environment variable
+    `PYINSTALLER_DJANGO_STATIC_SETTINGS` is `1`, these modules are searched for
+    in the source of the settings module instead of setting up Django. This
+    requires the settings listing modules to be literals, or else the script
+    is run anyway.
     """
     pths = []
     # Extend PYTHONPATH with parent dir of django_root_dir.
@@ -36,11 +69,258 @@ def django_dottedstring_imports(django_root_dir):
 
     default_settings_module = os.path.basename(django_root_dir) + '.settings'
     settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', default_settings_module)
-    env = {'DJANGO_SETTINGS_MODULE': settings_module,
-           'PYTHONPATH': os.pathsep.join(pths)}
-    ret = eval_script('django_import_finder.py', env=env)
+    if static is None:
+        static = getenv('PYINSTALLER_DJANGO_STATIC_SETTINGS') == '1'
+
+    query_cache = hookutils.query_cache
+    key = _get_cache_key(settings_module, pths, static) if query_cache \
+        else None
+    if key is not None:
+        hiddenimports = query_cache.lookup(key)
+        if hiddenimports is not None:
+            logger.info('Reusing Django imports of %s', settings_module)
+            return hiddenimports
+
+    ret = None
+    if static:
+        try:
+            ret = _find_imports_statically(settings_module, pths)
+        except ValueError as e:
+            logger.info('Unable to find Django imports statically: %s', e)
+    if ret is None:
+        env = {'DJANGO_SETTINGS_MODULE': settings_module,
+               'PYTHONPATH': os.pathsep.join(pths)}
+        hiddenimports = eval_script('django_import_finder.py', env=env)
+        if not hiddenimports:
+            return []
+        # The script lists the templatetags package of each installed app.
+        installed_apps = [name[:-len('.templatetags')]
+                          for name in hiddenimports
+                          if isinstance(name, str) and
+                          name.endswith('.templatetags')]
+        ret = {'hiddenimports': hiddenimports,
+               'installed_apps': installed_apps}
+
+    if key is not None:
+        query_cache.store(key, ret['hiddenimports'],
+                          _get_dependencies(settings_module, pths,
+                                            ret['installed_apps']))
+    return ret['hiddenimports']
+
+
+def _find_spec(module_name, path):
+    """
+    Return the module spec of the module with the passed name, searched for
+    in the passed directories, then in `CONF['pathex']` and `sys.path` like
+    `eval_script()` does, or `None` if this module is not found. Parent
+    packages are not imported.
+    """
+    # 'PyInstaller.config' cannot be imported as other top-level modules.
+    from ...config import CONF
+    spec = None
+    search_path = list(path) + list(CONF['pathex']) + sys.path
+    names = module_name.split('.')
+    for i in range(len(names)):
+        if spec is not None:
+            search_path = spec.submodule_search_locations
+            if not search_path:
+                return None
+        try:
+            spec = importlib.machinery.PathFinder.find_spec(
+                '.'.join(names[:i + 1]), list(search_path))
+        # Finders may raise about anything on broken modules.
+        except Exception:
+            return None
+        if spec is None:
+            return None
+    return spec
+
+
+def _get_cache_key(settings_module, pths, static):
+    """
+    Return the key of the modules found for the passed settings module in the
+    hook query cache, or `None` if this module is not found.
+    """
+    # 'PyInstaller.config' cannot be imported as other top-level modules.
+    from ...config import CONF
+    spec = _find_spec(settings_module, pths)
+    if spec is None or not spec.has_location:
+        return None
+    try:
+        with open(spec.origin, 'rb') as fp:
+            digest = hashlib.sha256(fp.read()).hexdigest()
+    except OSError:
+        return None
+    env = sorted(item for item in os.environ.items()
+                 if item[0] not in HookQueryCache._IGNORED_ENV_VARS)
+    try:
+        django_version = get_module_attribute('django', '__version__')
+    except AttributeError:
+        return None
+    return ('django_dottedstring_imports', settings_module, spec.origin,
+            digest, django_version, tuple(pths), tuple(CONF['pathex']),
+            env, bool(static))
+
+
+def _get_dependencies(settings_module, pths, installed_apps):
+    """
+    Return the paths of the files and directories the modules found for the
+    passed settings module depend on.
+    """
+    paths = []
+    spec = _find_spec(settings_module, pths)
+    if spec is not None and spec.has_location:
+        # Settings commonly import the modules next to them (e.g., local
+        # settings overriding these).
+        settings_dir = os.path.dirname(spec.origin)
+        paths.append(settings_dir)
+        paths += [os.path.join(settings_dir, name)
+                  for name in sorted(os.listdir(settings_dir))
+                  if name.endswith('.py')]
+    for app in installed_apps:
+        # Apps may be listed by the path of their `AppConfig` subclass, so
+        # consider every package along this path.
+        names = app.split('.')
+        for i in range(len(names)):
+            spec = _find_spec('.'.join(names[:i + 1]), pths)
+            if spec is None:
+                break
+            if spec.has_location:
+                paths.append(spec.origin)
+            for path in spec.submodule_search_locations or ():
+                paths += [path, os.path.join(path, 'templatetags')]
+    return sorted(set(paths))
+
+
+def _eval_setting(node):
+    """
+    Evaluate the passed expression assigned to a setting like
+    `ast.literal_eval()`, replacing the items of lists, tuples and dicts which
+    are not literals by `_UNKNOWN`.
+    """
+    if isinstance(node, ast.Dict):
+        value = {}
+        for key_node, value_node in zip(node.keys, node.values):
+            # Keys are `None` for unpacked dicts.
+            key = ast.literal_eval(key_node) if key_node else _UNKNOWN
+            if key is _UNKNOWN:
+                raise ValueError('dict keys are not literals')
+            value[key] = _eval_setting(value_node)
+        return value
+    if isinstance(node, (ast.List, ast.Tuple)):
+        if any(isinstance(elt, ast.Starred) for elt in node.elts):
+            raise ValueError('items are unpacked')
+        return [_eval_setting(elt) for elt in node.elts]
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return _UNKNOWN
+
+
+def _find_imports_statically(settings_module, pths):
+    """
+    Find the modules listed by the passed settings module like
+    `django_import_finder.py`, from the source of this module and the default
+    settings of Django.
+
+    The result of the script is mirrored exactly, including its quirks (e.g.,
+    `TEMPLATES` never contributes any module). Whenever this is not possible
+    from the sources alone, `ValueError` is raised to run the script instead.
+
+    Raises
+    ----------
+    ValueError
+        If the settings listing modules are not literals of the types the
+        script expects, are modified after their assignment, or if an
+        installed app is not found.
+    """
+    settings = {}
+    for module_name in ('django.conf.global_settings', settings_module):
+        spec = _find_spec(module_name, pths)
+        if spec is None or not spec.has_location:
+            raise ValueError('module %s not found' % module_name)
+        try:
+            source = spec.loader.get_source(module_name)
+            for name in _IMPORT_SETTINGS:
+                bound, value = get_literal_assignment(source, name,
+                                                      _eval_setting)
+                if bound:
+                    settings[name] = value
+            # Settings may still be modified after their assignment (e.g.,
+            # `MIDDLEWARE_CLASSES += [...]` or `DATABASES['default'] = ...`).
+            for node in ast.walk(ast.parse(source)):
+                if isinstance(node, ast.Name) and \
+                        isinstance(node.ctx, ast.Load) and \
+                        node.id in _IMPORT_SETTINGS:
+                    raise ValueError('%s is referenced by %s' %
+                                     (node.id, module_name))
+        except (ImportError, OSError, SyntaxError) as e:
+            raise ValueError(str(e)) from e
+
+    def _get_list(name):
+        # The script iterates these settings, which would split a string into
+        # its characters.
+        value = settings.get(name, ())
+        if not isinstance(value, (list, tuple)) or \
+                not all(isinstance(item, str) for item in value):
+            raise ValueError('%s is not a literal list of strings' % name)
+        return list(value)
+
+    def _get_string(name):
+        value = settings.get(name)
+        if not isinstance(value, str):
+            raise ValueError('%s is not a literal string' % name)
+        return value
+
+    def _remove_class(class_name):
+        return '.'.join(class_name.split('.')[0:-1])
+
+    installed_apps = _get_list('INSTALLED_APPS')
+    # Setting up Django fails, and the script finds nothing, if any installed
+    # app is not found. Apps may be listed by the path of their `AppConfig`
+    # subclass.
+    for app in installed_apps:
+        if _find_spec(app, pths) is None and \
+                _find_spec(app.rpartition('.')[0], pths) is None:
+            raise ValueError('installed app %s not found' % app)
+    hiddenimports = list(installed_apps)
+    hiddenimports += _get_list('TEMPLATE_CONTEXT_PROCESSORS')
+    hiddenimports += _get_list('TEMPLATE_LOADERS')
+    hiddenimports.append(_get_string('ROOT_URLCONF'))
+    for name in ('AUTHENTICATION_BACKENDS', 'FILE_UPLOAD_HANDLERS',
+                 'MIDDLEWARE_CLASSES'):
+        hiddenimports += [_remove_class(cl) for cl in _get_list(name)]
+    if 'DEFAULT_FILE_STORAGE' in settings:
+        hiddenimports.append(
+            _remove_class(_get_string('DEFAULT_FILE_STORAGE')))
+    # Include database backends - it is a dict.
+    databases = settings.get('DATABASES')
+    if not isinstance(databases, dict) or not all(
+            isinstance(v, dict) and isinstance(v.get('ENGINE'), str)
+            for v in databases.values()):
+        raise ValueError('DATABASES is not a literal')
+    hiddenimports += [v['ENGINE'] for v in databases.values()]
+
+    # Add templatetags and context processors for each installed app.
+    for app in installed_apps:
+        app_templatetag_module = app + '.templatetags'
+        hiddenimports.append(app_templatetag_module)
+        # Like `collect_submodules()`, without importing the app.
+        spec = _find_spec(app_templatetag_module, pths)
+        if spec is not None and spec.submodule_search_locations:
+            if not spec.has_location:
+                raise ValueError('%s is a namespace package' %
+                                 app_templatetag_module)
+            names = find_submodules_in_dirs(app_templatetag_module,
+                                            os.path.dirname(spec.origin))
+            if names is None:
+                raise ValueError('%s might change its __path__' %
+                                 app_templatetag_module)
+            hiddenimports += names
+        hiddenimports.append(app + '.context_processors')
 
-    return ret
+    return {'hiddenimports': sorted(set(hiddenimports)),
+            'installed_apps': installed_apps}
 
 
 def django_find_root_dir():
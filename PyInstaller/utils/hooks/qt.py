@@ -13,6 +13,7 @@
 import json
 import glob
 
+from .. import hooks as hookutils
 from ..hooks import eval_statement, exec_statement, get_homebrew_path, \
     get_module_file_attribute
 from PyInstaller.depend.bindepend import getImports, getfullnameof
@@ -35,6 +36,9 @@ def __init__(self, namespace):
             raise Exception('Invalid namespace: {0}'.format(namespace))
         self.namespace = namespace
         self.is_PyQt5 = namespace == 'PyQt5'
+        # Direct Qt dependencies of the libraries of this namespace, shared
+        # by all hooks. See `_get_direct_qt_dependencies()`.
+        self.dependencies = {}
 
     # Initialize most of this class only when values are first requested from
     # it.
@@ -445,6 +449,84 @@ def get_qmake_path(version=''):
 }
 
 
+def _get_qt_lib_name(imp):
+    """
+    Return the raw name of the passed library, as listed in
+    `_qt_dynamic_dependencies_dict` if it is a Qt library.
+    """
+    # Strip off the extension and ``lib`` prefix (Linux/Mac) to give the raw
+    # name. Lowercase (since Windows always normalized names to lowercase).
+    lib_name = os.path.splitext(os.path.basename(imp))[0].lower()
+    # Linux libraries sometimes have a dotted version number --
+    # ``libfoo.so.3``. It's now ''libfoo.so``, but the ``.so`` must also be
+    # removed.
+    if is_linux and os.path.splitext(lib_name)[1] == '.so':
+        lib_name = os.path.splitext(lib_name)[0]
+    if lib_name.startswith('lib'):
+        lib_name = lib_name[3:]
+    # Mac: rename from ``qt`` to ``qt5`` to match names in Windows/Linux.
+    if is_darwin and lib_name.startswith('qt'):
+        lib_name = 'qt5' + lib_name[2:]
+
+    # match libs with QT_LIBINFIX set to '_conda', i.e. conda-forge builds
+    if lib_name.endswith('_conda'):
+        lib_name = lib_name[:-6]
+    return lib_name
+
+
+def _get_direct_qt_dependencies(library, library_info):
+    """
+    Return the list of 2-tuples `(lib_name, path)` of the raw names and paths
+    of the Qt libraries the passed library directly depends on.
+
+    These are only examined once per library and then shared by all hooks of
+    the namespace of the passed `Qt5LibraryInfo`.
+    """
+    dependencies = library_info.dependencies.get(library)
+    if dependencies is not None:
+        return dependencies
+    dependencies = []
+    for imp in getImports(library):
+        # On Windows, find this library; other platforms already provide the
+        # full path.
+        if is_win:
+            imp = getfullnameof(imp,
+                # First, look for Qt binaries in the local Qt install.
+                library_info.location['BinariesPath'])
+
+        lib_name = _get_qt_lib_name(imp)
+        logger.debug('add_qt5_dependencies: raw lib %s -> parsed lib %s',
+                     imp, lib_name)
+
+        # Follow only Qt dependencies.
+        if lib_name in _qt_dynamic_dependencies_dict:
+            logger.debug('add_qt5_dependencies: Import of %s.', imp)
+            dependencies.append((lib_name, imp))
+    library_info.dependencies[library] = dependencies
+    return dependencies
+
+
+def _get_qt_dependencies(library, library_info):
+    """
+    Return a 2-tuple `(lib_names, libraries)` of the raw names and paths of
+    the Qt libraries the passed dynamically-linked library (``.so``/``.dll``/
+    ``.dylib``) depends on, directly or through other Qt libraries.
+    """
+    lib_names = set()
+    libraries = set()
+    # Follow the Qt dependencies to find additional dependencies. Each
+    # library is examined once, in case of circular dependencies.
+    pending = [library]
+    while pending:
+        for lib_name, imp in _get_direct_qt_dependencies(pending.pop(),
+                                                         library_info):
+            lib_names.add(lib_name)
+            if imp not in libraries:
+                libraries.add(imp)
+                pending.append(imp)
+    return lib_names, libraries
+
+
 # add_qt5_dependencies
 # --------------------
 # Find the Qt dependencies based on the hook name of a PyQt5 hook. Returns
@@ -472,62 +554,36 @@ def add_qt5_dependencies(hook_file):
         (not is_PyQt5 and not pyside2_library_info.version)):
         return [], [], []
 
+    library_info = pyqt5_library_info if is_PyQt5 else pyside2_library_info
+
     # Look up the module returned by this import.
     module = get_module_file_attribute(module_name)
     logger.debug('add_qt5_dependencies: Examining %s, based on hook of %s.',
                  module, hook_file)
 
-    # Walk through all the static dependencies of a dynamically-linked library
-    # (``.so``/``.dll``/``.dylib``).
-    imports = set(getImports(module))
-    while imports:
-        imp = imports.pop()
-
-        # On Windows, find this library; other platforms already provide the
-        # full path.
-        if is_win:
-            imp = getfullnameof(imp,
-                # First, look for Qt binaries in the local Qt install.
-                pyqt5_library_info.location['BinariesPath'] if is_PyQt5 else
-                pyside2_library_info.location['BinariesPath']
-            )
-
-        # Strip off the extension and ``lib`` prefix (Linux/Mac) to give the raw
-        # name. Lowercase (since Windows always normalized names to lowercase).
-        lib_name = os.path.splitext(os.path.basename(imp))[0].lower()
-        # Linux libraries sometimes have a dotted version number --
-        # ``libfoo.so.3``. It's now ''libfoo.so``, but the ``.so`` must also be
-        # removed.
-        if is_linux and os.path.splitext(lib_name)[1] == '.so':
-            lib_name = os.path.splitext(lib_name)[0]
-        if lib_name.startswith('lib'):
-            lib_name = lib_name[3:]
-        # Mac: rename from ``qt`` to ``qt5`` to match names in Windows/Linux.
-        if is_darwin and lib_name.startswith('qt'):
-            lib_name = 'qt5' + lib_name[2:]
-
-        # match libs with QT_LIBINFIX set to '_conda', i.e. conda-forge builds
-        if lib_name.endswith('_conda'):
-            lib_name = lib_name[:-6]
-
-        logger.debug('add_qt5_dependencies: raw lib %s -> parsed lib %s',
-                     imp, lib_name)
-
-        # Follow only Qt dependencies.
-        if lib_name in _qt_dynamic_dependencies_dict:
-            # Follow these to find additional dependencies.
-            logger.debug('add_qt5_dependencies: Import of %s.', imp)
-            imports.update(getImports(imp))
-            # Look up which plugins and translations are needed.
-            dd = _qt_dynamic_dependencies_dict[lib_name]
-            lib_name_hiddenimports, lib_name_translations_base = dd[:2]
-            lib_name_plugins = dd[2:]
-            # Add them in.
-            if lib_name_hiddenimports:
-                hiddenimports.update([namespace + lib_name_hiddenimports])
-            plugins.update(lib_name_plugins)
-            if lib_name_translations_base:
-                translations_base.update([lib_name_translations_base])
+    # The Qt libraries found by previous builds are reused as long as the
+    # module and these libraries are unchanged.
+    key = ('add_qt5_dependencies', module,
+           os.environ.get('LD_LIBRARY_PATH'))
+    query_cache = hookutils.query_cache
+    lib_names = query_cache.lookup(key) if query_cache else None
+    if lib_names is None:
+        lib_names, libraries = _get_qt_dependencies(module, library_info)
+        if query_cache:
+            query_cache.store(key, sorted(lib_names),
+                              [module] + sorted(libraries))
+
+    for lib_name in lib_names:
+        # Look up which plugins and translations are needed.
+        dd = _qt_dynamic_dependencies_dict[lib_name]
+        lib_name_hiddenimports, lib_name_translations_base = dd[:2]
+        lib_name_plugins = dd[2:]
+        # Add them in.
+        if lib_name_hiddenimports:
+            hiddenimports.update([namespace + lib_name_hiddenimports])
+        plugins.update(lib_name_plugins)
+        if lib_name_translations_base:
+            translations_base.update([lib_name_translations_base])
 
     # Change plugins into binaries.
     binaries = []
@@ -0,0 +1,185 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2020, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License (version 2
+# or later) with exception for distributing the bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#
+# SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
+#-----------------------------------------------------------------------------
+
+"""
+Helpers shared by the hook utilities finding what modules define or contain
+from their sources and directories, without importing these modules.
+"""
+
+import ast
+import inspect
+import os
+
+from ...lib.modulegraph import util as modulegraph_util
+
+
+def get_literal_assignment(source, attr_name, evaluate=ast.literal_eval):
+    """
+    Get the value of the passed attribute from the passed module source if
+    this attribute is only bound by simple assignments of literals at the top
+    level of this source.
+
+    The assigned expressions are evaluated by the passed callable, which
+    raises `ValueError` for expressions which are not literals.
+
+    Returns
+    ----------
+    tuple
+        2-tuple `(bound, value)`, where `bound` is `True` if this attribute is
+        bound by this source and `value` is the literal last assigned to it.
+
+    Raises
+    ----------
+    ValueError
+        If any binding of this attribute is not a simple assignment of a
+        literal (e.g., a function call or an import).
+    """
+    tree = ast.parse(source)
+    literal_targets = set()
+    bound = False
+    value = None
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target = node.targets[0]
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            target = node.target
+        else:
+            continue
+        if not isinstance(target, ast.Name) or target.id != attr_name:
+            continue
+        value = evaluate(node.value)
+        bound = True
+        literal_targets.add(target)
+
+    # Any other binding of this attribute makes its value dynamic. The bodies
+    # of functions and classes only bind their own local names.
+    nodes = list(tree.body)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ast.Name):
+            if (node.id == attr_name and node not in literal_targets and
+                    not isinstance(node.ctx, ast.Load)):
+                raise ValueError('%r is bound dynamically' % attr_name)
+        elif isinstance(node, ast.alias):
+            if node.name == '*' or (node.asname or node.name.partition('.')[0]
+                                    ) == attr_name:
+                raise ValueError('%r is bound by an import' % attr_name)
+        elif isinstance(node, ast.Global):
+            if attr_name in node.names:
+                raise ValueError('%r is bound dynamically' % attr_name)
+        elif getattr(node, 'name', None) == attr_name:
+            # Function, class and exception handler names.
+            raise ValueError('%r is bound dynamically' % attr_name)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                             ast.ClassDef, ast.Lambda)):
+            # Decorators and default values are evaluated at the top level.
+            for field in ('decorator_list', 'bases', 'keywords', 'args'):
+                child = getattr(node, field, None)
+                if isinstance(child, ast.arguments):
+                    nodes.extend(child.defaults)
+                    nodes.extend(d for d in child.kw_defaults if d)
+                elif child:
+                    nodes.extend(child)
+            # Names declared global within these bodies are still searched.
+            nodes.extend(n for n in ast.walk(node)
+                         if isinstance(n, ast.Global))
+        else:
+            nodes.extend(ast.iter_child_nodes(node))
+    return bound, value
+
+
+# Names which, if referenced by the `__init__` module of a package, indicate
+# that this package might change its `__path__` when imported.
+_DYNAMIC_PATH_NAMES = ('__path__', 'extend_path', 'declare_namespace')
+
+
+def has_dynamic_path(init_filename):
+    """
+    Return `True` if the package with the passed `__init__` module might
+    change its `__path__` when imported, in which case its submodules cannot
+    be found by scanning its directory.
+    """
+    if not init_filename.endswith('.py'):
+        # Compiled or extension modules are not inspected.
+        return True
+    try:
+        with open(init_filename, 'rb') as fp:
+            source = fp.read()
+    except OSError:
+        return True
+    # Avoid compiling modules not mentioning any of these names at all.
+    if not any(name.encode('ascii') in source for name in _DYNAMIC_PATH_NAMES):
+        return False
+    try:
+        co = compile(source, init_filename, 'exec')
+    except (SyntaxError, ValueError):
+        return True
+    return any(inst is not None and inst[1] in _DYNAMIC_PATH_NAMES
+               for inst in modulegraph_util.iterate_opcodes(co))
+
+
+def find_package_init(pkg_dir):
+    """
+    Return the path of the `__init__` module in the passed directory, or
+    `None` if this directory is not a package.
+    """
+    try:
+        filenames = sorted(os.listdir(pkg_dir))
+    except OSError:
+        return None
+    for filename in filenames:
+        if inspect.getmodulename(filename) == '__init__':
+            return os.path.join(pkg_dir, filename)
+    return None
+
+
+def find_submodules_in_dirs(package, pkg_dir):
+    """
+    Return the names of all submodules of the passed package found by
+    scanning the passed directory of this package and its subdirectories,
+    or `None` if any subpackage might change its `__path__` when imported or
+    a directory cannot be scanned (e.g., as it is inside an egg).
+
+    Modules are recognized as by `pkgutil.iter_modules()`, which is used by
+    the import-based walk of `collect_submodules()`.
+    """
+    names = []
+    pending = [(package, pkg_dir)]
+    while pending:
+        pkg_name, path = pending.pop()
+        # Like the import-based walk, search the directory of the package
+        # itself regardless of its `__path__`.
+        if pkg_name != package:
+            init_filename = find_package_init(path)
+            if has_dynamic_path(init_filename):
+                return None
+        try:
+            filenames = sorted(os.listdir(path))
+        except OSError:
+            return None
+        seen = set()
+        for filename in filenames:
+            modname = inspect.getmodulename(filename)
+            if modname == '__init__' or modname in seen:
+                continue
+            subpath = os.path.join(path, filename)
+            is_pkg = False
+            if not modname and '.' not in filename and os.path.isdir(subpath):
+                if find_package_init(subpath) is None:
+                    continue
+                modname = filename
+                is_pkg = True
+            if modname and '.' not in modname:
+                seen.add(modname)
+                names.append(pkg_name + '.' + modname)
+                if is_pkg:
+                    pending.append((pkg_name + '.' + modname, subpath))
+    return names
@@ -0,0 +1,168 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2020, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License (version 2
+# or later) with exception for distributing the bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#
+# SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
+#-----------------------------------------------------------------------------
+
+
+"""
+This script runs Python statements and scripts on behalf of
+PyInstaller.utils.hooks, so a single interpreter may run several of these.
+See PyInstaller.utils.hooks.worker_pool for details.
+
+Requests are marshalled to stdin, replies marshalled to stdout. Replies list
+the files and directories the result of the request depends on. Anything
+written to stdout while running a request (including by `atexit` handlers) is
+captured in the file passed on the command line instead. Requests read
+`os.devnull` as stdin.
+
+Where `os.fork()` is available, each request is run by a child process forked
+from this interpreter, which itself never runs any request. Whatever a request
+changes (modules, attributes of modules, `atexit` handlers, threads, ...) is
+thus discarded with this child. Otherwise, this script exits after replying to
+the first request. Thus every request is run in the same state as in a freshly
+started interpreter.
+
+NOTE: Only modules already imported on startup of the interpreter are used
+      here, to not change the result of statements inspecting `sys.modules`.
+"""
+
+import builtins
+import marshal
+import os
+import sys
+
+
+def _get_dependencies(initial_modules):
+    """
+    Return the absolute paths of the directories searched for modules and of
+    the files and directories of the modules imported since startup.
+    """
+    paths = set(sys.path)
+    for name in set(sys.modules) - initial_modules:
+        module = sys.modules.get(name)
+        filename = getattr(module, '__file__', None)
+        if isinstance(filename, str):
+            paths.add(filename)
+        try:
+            paths.update(getattr(module, '__path__', None) or ())
+        except TypeError:
+            pass
+    return sorted(os.path.abspath(path) for path in paths
+                  if isinstance(path, str))
+
+
+def _run(filename, source, argv):
+    """
+    Run the passed source or, if `None`, the script with the passed filename
+    like the interpreter runs these as its main module.
+    """
+    main_module = sys.modules['__main__']
+    module = type(sys)('__main__')
+    module.__builtins__ = builtins
+    if source is None:
+        module.__file__ = filename
+        module.__cached__ = None
+        with open(filename, 'rb') as fp:
+            source = fp.read()
+        sys.path[0] = os.path.dirname(os.path.abspath(filename))
+    orig_argv = sys.argv
+    sys.argv = argv
+    sys.modules['__main__'] = module
+    try:
+        exec(compile(source, filename, 'exec'), module.__dict__)
+    except SystemExit as e:
+        if e.code is not None and not isinstance(e.code, int):
+            print(e.code, file=sys.stderr)
+    except Exception:
+        # Omit the frame of this function from the traceback.
+        exc_type, exc_value, exc_tb = sys.exc_info()
+        exc_tb = exc_tb.tb_next
+        sys.excepthook(exc_type, exc_value.with_traceback(exc_tb), exc_tb)
+    finally:
+        sys.modules['__main__'] = main_module
+        sys.argv = orig_argv
+        sys.path[0] = ''
+
+
+def _run_request(filename, source, argv, output_filename):
+    """
+    Run the passed request with its output captured in the passed file.
+
+    Returns the paths the result depends on, see `_get_dependencies()`.
+    """
+    initial_modules = set(sys.modules)
+    output_fd = os.open(output_filename, os.O_WRONLY | os.O_TRUNC)
+    os.dup2(output_fd, 1)
+    os.close(output_fd)
+    _run(filename, source, argv)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return _get_dependencies(initial_modules)
+
+
+def main():
+    output_filename = sys.argv[1]
+    # Statements are run with the current directory as first entry of the
+    # search path, as with "python -c".
+    sys.path[0] = ''
+    sys.argv = ['-c']
+    # Keep requests and replies apart from the standard streams used by
+    # requests: stdin reads the null device, stdout is captured.
+    requests = os.fdopen(os.dup(0), 'rb')
+    replies = os.fdopen(os.dup(1), 'wb')
+    null_fd = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(null_fd, 0)
+    os.close(null_fd)
+    while True:
+        try:
+            filename, source, argv = marshal.load(requests)
+        except EOFError:
+            break
+        if not hasattr(os, 'fork'):
+            # Run the request here, discarding this interpreter afterwards.
+            requests.close()
+            dependencies = _run_request(filename, source, argv,
+                                        output_filename)
+            marshal.dump((True, dependencies), replies)
+            replies.close()
+            # Exit like "python -c" does, running `atexit` handlers and
+            # waiting for threads, with stdout still captured.
+            return
+        read_fd, write_fd = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        replies.flush()
+        pid = os.fork()
+        if pid == 0:
+            # Child process: run the request, then exit like "python -c"
+            # does, running `atexit` handlers and waiting for threads.
+            requests.close()
+            replies.close()
+            os.close(read_fd)
+            dependencies = _run_request(filename, source, argv,
+                                        output_filename)
+            with os.fdopen(write_fd, 'wb') as fp:
+                marshal.dump(dependencies, fp)
+            return
+        os.close(write_fd)
+        with os.fdopen(read_fd, 'rb') as fp:
+            try:
+                dependencies = marshal.load(fp)
+            except (EOFError, ValueError, TypeError):
+                # The child died (e.g., called `os._exit()`), its result
+                # cannot be attributed to any dependencies.
+                dependencies = None
+        # The output is complete once the child exited.
+        os.waitpid(pid, 0)
+        marshal.dump((False, dependencies), replies)
+        replies.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2020, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License (version 2
+# or later) with exception for distributing the bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#
+# SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
+#-----------------------------------------------------------------------------
+
+"""
+Pool of persistent Python interpreters running the statements and scripts
+of hooks, sparing the startup of an interpreter for most of these.
+"""
+
+import atexit
+import marshal
+import os
+import subprocess
+import tempfile
+import threading
+
+from ...compat import start_python
+from ... import log as logging
+
+logger = logging.getLogger(__name__)
+
+# Script run by each worker.
+_WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), 'subproc',
+                              'hook_worker.py')
+
+# Maximum number of idle workers kept by the pool.
+_MAX_IDLE_WORKERS = 2
+
+
+class HookWorker(object):
+    """
+    Python interpreter started with the passed environment, running
+    statements and scripts until one of these changes the state of this
+    interpreter. Where `os.fork()` is available, each statement or script is
+    run by a child process forked from the worker, which thus never changes.
+    Otherwise, the worker exits after the first statement or script.
+    """
+
+    def __init__(self, env):
+        fd, self._output_filename = tempfile.mkstemp(prefix='pyi-hook-')
+        os.close(fd)
+        try:
+            self._process = start_python(
+                _WORKER_SCRIPT, self._output_filename, env=dict(env),
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        except BaseException:
+            os.remove(self._output_filename)
+            raise
+
+    def run(self, filename, source, argv):
+        """
+        Run the passed source or, if `None`, the script with the passed
+        filename with the passed `sys.argv`.
+
+        Returns
+        ----------
+        tuple
+            3-tuple `(output, state_changed, dependencies)`, where `output` is
+            the standard output of the statement or script as a string,
+            `state_changed` is `True` if this worker has exited afterwards and
+            `dependencies` is the list of the absolute paths of the
+            directories searched for modules and of the files and
+            directories of the modules imported by the statement or script,
+            or `None` if unknown (e.g., as the statement called
+            `os._exit()`).
+
+        Raises
+        ----------
+        EOFError
+            If this worker has died (e.g., as the statement called
+            `os._exit()`).
+        """
+        try:
+            marshal.dump((filename, source, argv), self._process.stdin)
+            self._process.stdin.flush()
+            state_changed, dependencies = marshal.load(self._process.stdout)
+        except (OSError, ValueError, TypeError) as e:
+            raise EOFError(str(e)) from e
+        if state_changed:
+            # The output is complete once `atexit` handlers ran.
+            self._process.wait()
+        with open(self._output_filename, 'rb') as fp:
+            output = fp.read()
+        # Decode like `compat.exec_python()`.
+        return output.decode('UTF-8'), state_changed, dependencies
+
+    def poll(self):
+        """
+        Return `True` and release the resources of this worker if it has
+        exited.
+        """
+        if self._process.poll() is None:
+            return False
+        self.close()
+        return True
+
+    def close(self):
+        """
+        Terminate this worker.
+        """
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        self._process.wait()
+        self._process.stdout.close()
+        try:
+            os.remove(self._output_filename)
+        except OSError:
+            pass
+
+
+class HookWorkerPool(object):
+    """
+    Pool of workers running the statements and scripts of hooks.
+
+    Statements and scripts are run by idle workers started with the same
+    environment. After each run, a worker is only reused if its state is
+    unchanged, i.e. if it ran the statement or script in a forked child
+    process. Otherwise, a new worker is started as soon as the previous one
+    exited, so it starts up while PyInstaller proceeds with the analysis until
+    the next statement or script is run.
+    """
+
+    def __init__(self):
+        # List of (environment, worker) tuples.
+        self._idle_workers = []
+        # Workers whose state changed, which are about to exit.
+        self._exiting_workers = []
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _acquire(self, env):
+        with self._lock:
+            # Prefer the most recently used worker.
+            for i in reversed(range(len(self._idle_workers))):
+                if self._idle_workers[i][0] == env:
+                    return self._idle_workers.pop(i)[1]
+        return HookWorker(env)
+
+    def _release(self, env, worker, state_changed):
+        with self._lock:
+            # Reap workers exited meanwhile.
+            for exiting_worker in list(self._exiting_workers):
+                if exiting_worker.poll():
+                    self._exiting_workers.remove(exiting_worker)
+            if state_changed:
+                self._exiting_workers.append(worker)
+                # Replace this worker for the next statement or script.
+                if any(worker_env == env
+                       for worker_env, _ in self._idle_workers):
+                    return
+                worker = HookWorker(env)
+            self._idle_workers.append((env, worker))
+            while len(self._idle_workers) > _MAX_IDLE_WORKERS:
+                self._idle_workers.pop(0)[1].close()
+
+    def run(self, filename, source, argv, env):
+        """
+        Run the passed source or, if `None`, the script with the passed
+        filename with the passed `sys.argv` in a worker started with the
+        passed environment.
+
+        Returns a 2-tuple `(output, dependencies)` of the standard output of
+        the statement or script and the paths its result depends on (see
+        `HookWorker.run()`), or `None` if the worker died while running the
+        statement or script, in which case it should be run by a new
+        interpreter.
+        """
+        try:
+            worker = self._acquire(env)
+        except OSError as e:
+            logger.debug('Unable to start hook worker: %s', e)
+            return None
+        try:
+            output, state_changed, dependencies = worker.run(
+                filename, source, argv)
+        except EOFError as e:
+            logger.debug('Hook worker died running %s: %s', filename, e)
+            worker.close()
+            return None
+        try:
+            self._release(env, worker, state_changed)
+        except OSError as e:
+            logger.debug('Unable to start hook worker: %s', e)
+        return output, dependencies
+
+    def close(self):
+        """
+        Terminate all workers.
+        """
+        with self._lock:
+            workers = [worker for _, worker in self._idle_workers]
+            workers += self._exiting_workers
+            self._idle_workers = []
+            self._exiting_workers = []
+        for worker in workers:
+            worker.close()
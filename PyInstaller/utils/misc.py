@@ -15,13 +15,15 @@
 """
 
 import glob
+import marshal
 import os
 import pprint
 import py_compile
+import struct
 import sys
 
 from PyInstaller import log as logging
-from PyInstaller.compat import BYTECODE_MAGIC, text_read_mode
+from PyInstaller.compat import BYTECODE_MAGIC, is_py37, text_read_mode
 
 logger = logging.getLogger(__name__)
 
@@ -157,10 +159,8 @@ def compile_py_files(toc, workpath):
                 needs_compile = fh.read()[:4] != BYTECODE_MAGIC
         if needs_compile:
             try:
-                # TODO: there should be no need to repeat the compile,
-                # because ModuleGraph does a compile and stores the result
-                # in the .code member of the graph node. Should be possible
-                # to get the node and write the code to obj_fnm
+                # Note: code objects compiled by ModuleGraph are preferably
+                # written by get_pyc_data(), this is for modules lacking them.
                 py_compile.compile(src_fnm, obj_fnm)
                 logger.debug("compiled %s", src_fnm)
             except IOError:
@@ -190,7 +190,6 @@ def compile_py_files(toc, workpath):
                     with open(obj_fnm, 'rb') as fh:
                         needs_compile = fh.read()[:4] != BYTECODE_MAGIC
                 if needs_compile:
-                    # TODO see above todo regarding using node.code
                     py_compile.compile(src_fnm, obj_fnm)
                     logger.debug("compiled %s", src_fnm)
         # if we get to here, obj_fnm is the path to the compiled module nm.py
@@ -199,6 +198,29 @@ def compile_py_files(toc, workpath):
     return new_toc
 
 
+def get_pyc_data(code, source_filename):
+    """
+    Return the contents of a .pyc file containing the passed code object,
+    compiled from the passed source file.
+
+    The header records the modification time and size of the source file,
+    as `py_compile.compile()` does by default. The filenames embedded into
+    the code object are written as is, see
+    `PyInstaller.depend.analysis.PyiModuleGraph.get_frozen_code()`.
+    """
+    try:
+        st = os.stat(source_filename)
+        timestamp, size = int(st.st_mtime), st.st_size & 0xFFFFFFFF
+    except OSError:
+        timestamp = size = 0
+    header = BYTECODE_MAGIC
+    if is_py37:
+        # Timestamp-based .pyc file (PEP 552).
+        header += struct.pack('<I', 0)
+    header += struct.pack('<II', timestamp, size)
+    return header + marshal.dumps(code)
+
+
 def save_py_data_struct(filename, data):
     """
     Save data into text file as Python data structure.
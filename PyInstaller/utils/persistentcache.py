@@ -0,0 +1,168 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2020, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License (version 2
+# or later) with exception for distributing the bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#
+# SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
+#-----------------------------------------------------------------------------
+
+"""
+Base class and helpers of the caches persisted to the cache or work directory
+and reused by consecutive builds.
+"""
+
+import marshal
+import os
+import sys
+import tempfile
+
+from .. import __version__
+from .. import compat
+from .. import log as logging
+
+logger = logging.getLogger(__name__)
+
+# Version of the layout of cached records. Increment whenever this layout
+# changes to invalidate caches written by older versions.
+_CACHE_FORMAT = 5
+
+
+def get_header():
+    """
+    Return the header of all persisted caches, identifying the version of
+    PyInstaller and the interpreter these were written by.
+
+    Code objects are compiled at the optimization level of the interpreter
+    (see the `-O` option), so this level is part of the header as well.
+    """
+    return (_CACHE_FORMAT, __version__, sys.executable, sys.version,
+            sys.platform, compat.BYTECODE_MAGIC, sys.flags.optimize)
+
+
+def replace_file(filename, data):
+    """
+    Atomically replace the contents of the passed file by the passed bytes,
+    creating this file and its directory if needed.
+    """
+    dirname = os.path.dirname(filename)
+    os.makedirs(dirname, exist_ok=True)
+    fd, tmpname = tempfile.mkstemp(dir=dirname)
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(data)
+        os.replace(tmpname, filename)
+    except BaseException:
+        os.remove(tmpname)
+        raise
+
+
+def file_stamp(filename):
+    """
+    Return a tuple identifying the current state of the passed file, or
+    `None` if the file cannot be accessed.
+    """
+    try:
+        st = os.stat(filename)
+    except (OSError, TypeError, ValueError):
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class PersistentCache(object):
+    """
+    Base class of the caches persisted to a file with `marshal`.
+
+    The records persisted by previous builds are loaded into `_records` on
+    instantiation, and these added by the current build are collected in
+    `_new_records` until saved. As a cache may be shared by concurrent
+    builds, records persisted by these meanwhile are merged on saving and the
+    file is replaced atomically, so an interrupted build never leaves a
+    truncated cache. Caches written by another version of PyInstaller or by
+    another interpreter (see `get_header()`) are ignored.
+
+    Subclasses name the cache in log messages with the `description` class
+    attribute and may override `_decode()` and `_encode()` to persist records
+    not serializable by `marshal`, and `_merge()` to drop records.
+
+    Parameters
+    ----------
+    filename : str
+        Absolute path of the file this cache is persisted to, or `None` if
+        this cache should not be persisted.
+    """
+
+    description = 'cache'
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._records = self._load()
+        # Records added by the current build.
+        self._new_records = {}
+
+    def _load(self):
+        """
+        Return the records persisted to the file of this cache, or an empty
+        dictionary if there are none or these are unreadable or outdated.
+        """
+        if self.filename is None:
+            return {}
+        try:
+            with open(self.filename, 'rb') as fp:
+                header, records = marshal.load(fp)
+        except FileNotFoundError:
+            return {}
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            logger.debug('Ignoring unreadable %s %s: %s',
+                         self.description, self.filename, e)
+            return {}
+        if header != get_header():
+            logger.debug('Ignoring outdated %s %s',
+                         self.description, self.filename)
+            return {}
+        return self._decode(records)
+
+    def _write(self, records):
+        """
+        Atomically persist the passed records to the file of this cache and
+        return whether these were written.
+        """
+        try:
+            replace_file(self.filename, marshal.dumps(
+                (get_header(), self._encode(records))))
+        except (OSError, ValueError) as e:
+            logger.warning('Unable to write %s %s: %s',
+                           self.description, self.filename, e)
+            return False
+        return True
+
+    def _decode(self, records):
+        return records
+
+    def _encode(self, records):
+        return records
+
+    def _is_modified(self):
+        return bool(self._new_records)
+
+    def _merge(self, records):
+        """
+        Merge the records added by the current build into the passed records
+        persisted meanwhile.
+        """
+        records.update(self._new_records)
+
+    def save(self):
+        """
+        Persist the records added by the current build, merged with these
+        persisted by concurrent builds meanwhile.
+        """
+        if self.filename is None or not self._is_modified():
+            return
+        records = self._load()
+        self._merge(records)
+        if self._write(records):
+            self._records = records
+            self._new_records = {}
@@ -0,0 +1,137 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2020, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License (version 2
+# or later) with exception for distributing the bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#
+# SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
+#-----------------------------------------------------------------------------
+
+
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import sysconfig
+
+import pytest
+
+from PyInstaller.depend import bindepend, elf
+from PyInstaller.depend.bindepend import BinaryDependencyCache
+
+pytestmark = pytest.mark.skipif(
+    bindepend.USE_LDD or not shutil.which('ldd'),
+    reason='ELF binaries are only read on Linux with glibc.')
+
+
+def _compile_library(tmpdir, name, deps=(), flags=()):
+    # Call a function of each dependency, so the linker does not drop these.
+    calls = [os.path.basename(dep)[3:-3] for dep in deps]
+    source = tmpdir.join(name + '.c')
+    source.write(''.join('int %s(void);\n' % call for call in calls) +
+                 'int %s(void) { return %s; }\n' % (
+                     name, ' + '.join(call + '()' for call in calls) or '0'))
+    filename = str(tmpdir.join('lib%s.so' % name))
+    subprocess.check_call(
+        ['gcc', '-shared', '-fPIC', '-o', filename, str(source),
+         '-Wl,-soname,lib%s.so' % name] + list(flags) +
+        ['-L' + os.path.dirname(dep) for dep in deps] +
+        ['-l' + call for call in calls])
+    return filename
+
+
+def test_getImports_elf_system_binaries():
+    # Cross-check the libraries found with those listed by ldd.
+    binaries = [sys.executable] + sorted(glob.glob(os.path.join(
+        sysconfig.get_paths()['platstdlib'], 'lib-dynload', '*.so')))
+    for binary in binaries:
+        assert bindepend._getImports_elf(binary) == \
+            bindepend._getImports_ldd(binary), binary
+
+
+@pytest.mark.skipif(not shutil.which('gcc'), reason='Requires gcc.')
+@pytest.mark.parametrize('dtags', ['--disable-new-dtags',
+                                   '--enable-new-dtags'])
+def test_getImports_elf_search_path(tmpdir, monkeypatch, dtags):
+    # libtop requires libmiddle, found in LD_LIBRARY_PATH, which requires
+    # liblow, found in the DT_RPATH of libtop only. A DT_RUNPATH would not
+    # be searched for the libraries required by libmiddle.
+    liblow = _compile_library(tmpdir.mkdir('lib'), 'low')
+    libmiddle = _compile_library(tmpdir.mkdir('middle'), 'middle', [liblow])
+    libtop = _compile_library(
+        tmpdir.mkdir('bin'), 'top', [libmiddle],
+        ['-Wl,' + dtags, '-Wl,-rpath,$ORIGIN/../lib'])
+    info = elf.get_elf_info(libtop)
+    assert info.soname == 'libtop.so'
+    assert info.needed[0] == 'libmiddle.so'
+    assert (info.rpath, info.runpath) == (
+        (['$ORIGIN/../lib'], None) if dtags == '--disable-new-dtags' else
+        (None, ['$ORIGIN/../lib']))
+
+    monkeypatch.setenv('LD_LIBRARY_PATH', os.path.dirname(libmiddle))
+    imports = bindepend._getImports_elf(libtop)
+    assert imports == bindepend._getImports_ldd(libtop)
+    assert libmiddle in imports
+    assert (os.path.join(os.path.dirname(libtop), '..', 'lib', 'liblow.so')
+            in imports) == (dtags == '--disable-new-dtags')
+    assert bindepend._get_so_name(libtop) == 'libtop.so'
+
+
+@pytest.mark.skipif(not shutil.which('gcc'), reason='Requires gcc.')
+def test_getImports_cache(tmpdir, monkeypatch):
+    libmiddle = _compile_library(tmpdir.mkdir('lib'), 'middle')
+    libtop = _compile_library(tmpdir.mkdir('bin'), 'top', [libmiddle],
+                              ['-Wl,-rpath,' + os.path.dirname(libmiddle)])
+    filename = str(tmpdir.join('cache', 'bindepend.dat'))
+    monkeypatch.setattr(bindepend, 'dependency_cache',
+                        BinaryDependencyCache(filename))
+    imports = bindepend.getImports(libtop)
+    assert libmiddle in imports
+    bindepend.dependency_cache.save()
+
+    # The dependencies are found again only if the binary or one of its
+    # dependencies changed.
+    parsed = []
+    _getImports = bindepend._getImports
+    monkeypatch.setattr(bindepend, '_getImports',
+                        lambda pth: parsed.append(pth) or _getImports(pth))
+    monkeypatch.setattr(bindepend, 'dependency_cache',
+                        BinaryDependencyCache(filename))
+    assert bindepend.getImports(libtop) == imports
+    assert parsed == []
+    st = os.stat(libmiddle)
+    os.utime(libmiddle, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert bindepend.getImports(libtop) == imports
+    assert parsed == [libtop]
+    monkeypatch.setenv('LD_LIBRARY_PATH', str(tmpdir))
+    assert bindepend.getImports(libtop) == imports
+    assert parsed == [libtop, libtop]
+
+
+@pytest.mark.skipif(not shutil.which('gcc'), reason='Requires gcc.')
+def test_Dependencies_order(tmpdir):
+    # The closure is the same whatever the number of threads searching it,
+    # breadth-first and without duplicates.
+    libdir = tmpdir.mkdir('lib')
+    rpath = ['-Wl,-rpath,' + str(libdir)]
+    liblow = _compile_library(libdir, 'low')
+    libleft = _compile_library(libdir, 'left', [liblow], rpath)
+    libright = _compile_library(libdir, 'right', [liblow], rpath)
+    libtop = _compile_library(libdir, 'top', [libleft, libright], rpath)
+    libother = _compile_library(libdir, 'other', [libright], rpath)
+    toc = [('libtop.so', libtop, 'BINARY'),
+           ('libother.so', libother, 'BINARY')]
+    results = [bindepend.Dependencies(list(toc), max_workers=max_workers)
+               for max_workers in (1, 2, 8)]
+    assert results[0] == results[1] == results[2]
+    names = [name for name, _, _ in results[0]]
+    assert len(names) == len(set(names))
+    assert names[:2] == ['libtop.so', 'libother.so']
+    assert set(names[2:]) == {'libleft.so', 'libright.so', 'liblow.so'} | \
+        {os.path.basename(path) for path in bindepend.getImports(libtop)}
+    # The dependencies of each binary are sorted by path.
+    assert [name for name in names if name.startswith(('libl', 'libr'))] == \
+        ['libleft.so', 'liblow.so', 'libright.so']
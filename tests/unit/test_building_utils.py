@@ -12,6 +12,7 @@
 
 import pytest
 import os
+import struct
 from importlib.machinery import EXTENSION_SUFFIXES
 
 from PyInstaller.building import utils
@@ -93,3 +94,40 @@ def test_add_to_suffix__extension():
          'lib38/site-packages/mypkg' + EXTENSION_SUFFIXES[0],
          'EXTENSION'),
     ]
+
+
+def test_strip_paths_in_filename(monkeypatch, tmpdir):
+    monkeypatch.setattr(utils.sys, 'path', [str(tmpdir)])
+    monkeypatch.setitem(utils.CONF, 'pathex', [str(tmpdir.join('pkg'))])
+    assert (utils.strip_paths_in_filename(str(tmpdir.join('pkg', 'mod.py')))
+            == 'mod.py')
+    assert (utils.strip_paths_in_filename(str(tmpdir.join('mod.py')))
+            == 'mod.py')
+    assert utils.strip_paths_in_filename(os.path.abspath(os.sep)) is None
+
+    # Code objects compiled with stripped filenames are kept as is.
+    co = compile('def f(): pass', 'mod.py', 'exec')
+    assert utils.strip_paths_in_code(co) is co
+    co = compile('def f(): pass', str(tmpdir.join('mod.py')), 'exec')
+    co = utils.strip_paths_in_code(co)
+    assert co.co_filename == 'mod.py'
+    assert co.co_consts[0].co_filename == 'mod.py'
+
+
+def test_get_pyc_data(tmpdir):
+    # The .pyc data has a timestamp-based header and the code object as is.
+    import importlib.util
+    import marshal
+    import sys
+    from PyInstaller.utils.misc import get_pyc_data
+    filename = tmpdir.join('mod.py')
+    filename.write('x = 1')
+    co = compile('x = 1', 'mod.py', 'exec')
+    data = get_pyc_data(co, str(filename))
+    st = os.stat(str(filename))
+    assert data[:4] == importlib.util.MAGIC_NUMBER
+    if sys.version_info >= (3, 7):
+        assert data[4:8] == b'\0\0\0\0'
+        data = data[4:]
+    assert data[4:12] == struct.pack('<II', int(st.st_mtime), st.st_size)
+    assert marshal.loads(data[12:]) == co
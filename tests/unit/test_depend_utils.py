@@ -11,10 +11,14 @@
 
 
 import os
+import re
+import shutil
+import struct
+import subprocess
 import pytest
 import textwrap
 
-from PyInstaller.depend import utils
+from PyInstaller.depend import ldcache, utils
 from PyInstaller.compat import is_unix, is_win
 
 
@@ -93,3 +97,139 @@ def test_ldconfig_cache():
             break
     assert libpath, 'libc.so not found'
     assert os.path.isfile(libpath)
+
+
+def _make_ld_so_cache(fmt, entries):
+    # Write the passed (name, path, flags, hwcap) entries in the layout
+    # written by ldconfig.
+    strings = b''
+    offsets = []
+    for name, path, _, _ in entries:
+        offsets.append((len(strings), len(strings) + len(name) + 1))
+        strings += name.encode() + b'\0' + path.encode() + b'\0'
+    old = b''
+    if fmt in ('old', 'compat'):
+        old = struct.pack('=11sxI', b'ld.so-1.7.0', len(entries))
+        for (_, _, flags, _), (key, value) in zip(entries, offsets):
+            old += struct.pack('=iII', flags, key, value)
+        if fmt == 'old':
+            return old + strings
+        old += b'\0' * (-len(old) % 8)
+    header_size = 48 + 24 * len(entries)
+    new = struct.pack('<20sIIB3xI12x', b'glibc-ld.so.cache1.1', len(entries),
+                      len(strings), 2, 0)
+    for (_, _, flags, hwcap), (key, value) in zip(entries, offsets):
+        new += struct.pack('<iIIIQ', flags, header_size + key,
+                           header_size + value, 0, hwcap)
+    return old + new + strings
+
+
+@pytest.mark.parametrize('fmt', ['old', 'compat', 'new'])
+def test_load_ld_so_cache(tmpdir, fmt):
+    x86_64 = 0x0303
+    entries = [
+        ('libfoo.so.1', '/lib/i386/libfoo.so.1', 0x0003, 0),
+        ('libfoo.so.1', '/lib/x86-64-v3/libfoo.so.1', x86_64, 1 << 62),
+        ('libfoo.so.1', '/lib/libfoo.so.1', x86_64, 0),
+        ('libbar.so', '/lib/x86-64-v3/libbar.so', x86_64, 1 << 62),
+        ('libbaz.so', '/lib/i386/libbaz.so', 0x0003, 0),
+    ]
+    if fmt == 'old':
+        # The old format has no hardware capabilities.
+        entries = [entry[:3] + (0,) for entry in entries]
+    entries = [ldcache.LDCacheEntry(*entry) for entry in entries]
+    filename = str(tmpdir.join('ld.so.cache'))
+    with open(filename, 'wb') as fp:
+        fp.write(_make_ld_so_cache(fmt, entries))
+    memo_filename = str(tmpdir.join('cache', 'ldsocache.dat'))
+    assert ldcache.load_ld_so_cache(filename, memo_filename) == entries
+    # The entries are read from the memo as long as the cache is unchanged.
+    assert os.path.isfile(memo_filename)
+    assert ldcache.load_ld_so_cache(filename, memo_filename) == entries
+
+    # Generic libraries of this architecture are preferred.
+    libraries = ldcache.select_libraries(entries, x86_64)
+    assert libraries == {
+        'libfoo.so.1': '/lib/x86-64-v3/libfoo.so.1' if fmt == 'old' else
+                       '/lib/libfoo.so.1',
+        'libbar.so': '/lib/x86-64-v3/libbar.so'}
+    assert ldcache.select_libraries(entries)['libfoo.so.1'] == \
+        '/lib/i386/libfoo.so.1'
+
+    with open(filename, 'r+b') as fp:
+        fp.write(b'garbage')
+    with pytest.raises(ValueError):
+        ldcache.load_ld_so_cache(filename, memo_filename)
+
+
+@pytest.mark.linux
+@pytest.mark.skipif(not os.path.isfile(ldcache.LD_SO_CACHE) or
+                    not shutil.which('ldconfig'),
+                    reason='Requires the ld.so cache of glibc.')
+def test_load_ld_so_cache_ldconfig():
+    # Cross-check the libraries read with those listed by `ldconfig -p`.
+    output = subprocess.check_output(['ldconfig', '-p'], text=True)
+    listed = [m.group(1, 2) for m in re.finditer(
+        r'^\s+(\S+)(?:\s.*)? => (\S+)$', output, re.MULTILINE)]
+    entries = ldcache.load_ld_so_cache()
+    assert [(entry.name, entry.path) for entry in entries] == listed
+    libraries = ldcache.select_libraries(entries, ldcache.get_default_flags())
+    assert os.path.isfile(libraries['libc.so.6'])
+
+
+def test_find_library_in_dirs(tmpdir):
+    libdir = tmpdir.mkdir('lib')
+    for name in ('libfoo.so.1.2', 'libfoo.so.1', 'libfoo.so.2.0',
+                 'libfoo.so-gdb.py', 'libfoobar.so', 'libbar.so'):
+        libdir.join(name).write('')
+    dirs = [str(tmpdir.mkdir('empty')), str(libdir)]
+    assert utils.find_library_in_dirs('libfoo.so', dirs) == \
+        str(libdir.join('libfoo.so.2.0'))
+    assert utils.find_library_in_dirs('libfoo.so.1', dirs) == \
+        str(libdir.join('libfoo.so.1'))
+    assert utils.find_library_in_dirs('libfoob', dirs) == \
+        str(libdir.join('libfoobar.so'))
+    assert utils.find_library_in_dirs('libbaz.so', dirs) is None
+
+    # Directories are listed again once changed.
+    libdir.join('libfoo.so').write('')
+    libdir.join('libbaz.so').write('')
+    libdir.join('libbaz.so.1').write('')
+    os.utime(str(libdir), ns=(0, os.stat(str(libdir)).st_mtime_ns + 10**9))
+    # Runtime libraries are preferred to development files.
+    assert utils.find_library_in_dirs('libfoo.so', dirs) == \
+        str(libdir.join('libfoo.so.2.0'))
+    assert utils.find_library_in_dirs('libfoob', dirs) == \
+        str(libdir.join('libfoobar.so'))
+    assert utils.find_library_in_dirs('libbaz.so', dirs) == \
+        str(libdir.join('libbaz.so.1'))
+    assert utils.has_library_dir_entry(str(libdir), 'libbaz.so.1')
+    assert not utils.has_library_dir_entry(str(libdir), 'libbaz.so.2')
+
+
+def test_find_library_in_dirs_checked_once(tmpdir, monkeypatch):
+    libdir = tmpdir.mkdir('lib')
+    libdir.join('libfoo.so.1').write('')
+    dirs = [str(libdir)]
+    monkeypatch.setattr(utils, 'checked_library_dirs', set())
+    assert utils.find_library_in_dirs('libfoo.so', dirs) == \
+        str(libdir.join('libfoo.so.1'))
+
+    # During a build, directories are only checked for changes once.
+    libdir.join('libfoo.so.2').write('')
+    os.utime(str(libdir), ns=(0, os.stat(str(libdir)).st_mtime_ns + 10**9))
+    assert utils.find_library_in_dirs('libfoo.so', dirs) == \
+        str(libdir.join('libfoo.so.1'))
+    monkeypatch.setattr(utils, 'checked_library_dirs', set())
+    assert utils.find_library_in_dirs('libfoo.so', dirs) == \
+        str(libdir.join('libfoo.so.2'))
+
+
+@pytest.mark.skipif(not is_unix, reason="LD_LIBRARY_PATH is searched on Unix")
+def test_resolve_ctypes_imports_subdir(tmpdir, monkeypatch):
+    from PyInstaller.config import CONF
+    libfile = tmpdir.mkdir('sub').join('libpyi_ctypes_sub.so')
+    libfile.write('')
+    monkeypatch.setitem(CONF, 'pathex', [str(tmpdir)])
+    assert utils._resolveCtypesImports(['sub/libpyi_ctypes_sub.so']) == [
+        ('sub/libpyi_ctypes_sub.so', str(libfile), 'BINARY')]
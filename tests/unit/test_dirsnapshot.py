@@ -0,0 +1,86 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2020, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License (version 2
+# or later) with exception for distributing the bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#
+# SPDX-License-Identifier: (GPL-2.0-or-later WITH Bootloader-exception)
+#-----------------------------------------------------------------------------
+
+import glob
+import os
+import pathlib
+import time
+
+import pytest
+
+from PyInstaller.utils.dirsnapshot import DirectorySnapshot
+
+
+@pytest.fixture
+def tree(tmpdir):
+    for name in ('a.txt', 'b.py', '.hidden', 'sub/c.txt', 'sub/.d.txt',
+                 'sub/deep/e.txt', 'sub/deep/f.dat', 'empty/'):
+        path = tmpdir.join(*name.split('/'))
+        if name.endswith('/'):
+            path.ensure(dir=True)
+        else:
+            path.ensure()
+    return str(tmpdir)
+
+
+@pytest.mark.parametrize('pattern', [
+    '*', '*.txt', '.*', '*/*.txt', '*/.*', 'sub/*/*', '*/', 'sub', 'sub/',
+    'missing', 'missing/*', '[ab].*'])
+def test_glob(tree, pattern):
+    pattern = os.path.join(tree, pattern)
+    assert sorted(DirectorySnapshot().glob(pattern)) == \
+        sorted(glob.glob(pattern))
+
+
+@pytest.mark.parametrize('pattern', [
+    '*', '**', '**/*', '**/*.txt', 'sub/**/*', 'sub/*', 'sub/', 'sub/c.txt',
+    '*/deep', 'missing/**'])
+def test_path_glob(tree, pattern):
+    assert sorted(DirectorySnapshot().path_glob(tree, pattern)) == \
+        sorted(str(path) for path in pathlib.Path(tree).glob(pattern))
+
+
+def test_walk(tree):
+    def walk(walker):
+        return sorted((dirpath, sorted(dirnames), sorted(filenames))
+                      for dirpath, dirnames, filenames in walker(tree))
+
+    assert walk(DirectorySnapshot().walk) == walk(os.walk)
+
+
+def test_volatile_dirs(tree, monkeypatch):
+    # Directories modified recently are listed again anyway.
+    monkeypatch.setattr(time, 'time', lambda: os.stat(tree).st_mtime + 60)
+    snapshot = DirectorySnapshot(volatile_dirs=[os.path.join(tree, 'empty')])
+    assert not snapshot.isfile(os.path.join(tree, 'a.txt.new'))
+    assert not snapshot.glob(os.path.join(tree, 'empty', '*'))
+    open(os.path.join(tree, 'empty', 'new.txt'), 'w').close()
+    os.utime(os.path.join(tree, 'empty'), ns=(0, 0))
+    # Directories are only listed again once modified, except for volatile
+    # ones.
+    scans = []
+    orig_scandir = os.scandir
+
+    def scandir(path):
+        scans.append(path)
+        return orig_scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', scandir)
+    assert snapshot.isfile(os.path.join(tree, 'a.txt'))
+    assert not scans
+    assert snapshot.glob(os.path.join(tree, 'empty', '*'))
+    assert len(scans) == 1
+    st = os.stat(tree)
+    os.rename(os.path.join(tree, 'a.txt'), os.path.join(tree, 'a.txt.new'))
+    os.utime(tree, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert snapshot.isfile(os.path.join(tree, 'a.txt.new'))
+    assert not snapshot.isfile(os.path.join(tree, 'a.txt'))
+    assert len(scans) == 2
@@ -13,13 +13,16 @@
 import os
 import pytest
 import shutil
+import sys
 from os.path import join
 
 from PyInstaller.utils.hooks import collect_data_files, collect_submodules, \
-    get_module_file_attribute, remove_prefix, remove_suffix, \
-    remove_file_extension, is_module_or_submodule, \
-    is_module_satisfies
-from PyInstaller.compat import exec_python, ALL_SUFFIXES, is_win
+    get_module_attribute, get_module_file_attribute, remove_prefix, \
+    remove_suffix, remove_file_extension, is_module_or_submodule, \
+    is_module_satisfies, exec_statement, eval_statement
+from PyInstaller.compat import exec_python, ALL_SUFFIXES, is_win, is_linux
+from PyInstaller.config import CONF
+from PyInstaller.utils import hooks as hookutils
 
 
 class TestRemovePrefix(object):
@@ -195,12 +198,39 @@ def test_collect_submod_stdout_interference(self, monkeypatch):
         monkeypatch.setattr('PyInstaller.config.CONF',
                             {'pathex': [TEST_MOD_PATH]})
         monkeypatch.syspath_prepend(TEST_MOD_PATH)
+        # Only the import-based walk runs the modules.
+        monkeypatch.setattr(hookutils, 'COLLECT_SUBMODULES_BY_IMPORT', {'foo'})
 
         ml = collect_submodules(TEST_MOD)
         ml = sorted(ml)
 
         assert ml == ['foo', 'foo.bar']
 
+    # Packages are scanned without importing them.
+    def test_collect_submod_without_import(self, monkeypatch):
+        monkeypatch.setattr('PyInstaller.config.CONF',
+                            {'pathex': [TEST_MOD_PATH]})
+        monkeypatch.syspath_prepend(TEST_MOD_PATH)
+        monkeypatch.setattr(hookutils, '_find_submodules_by_import', None)
+        self.test_collect_submod_all_included(collect_submodules(TEST_MOD))
+
+    # Subpackages extending their __path__ are imported.
+    def test_collect_submod_dynamic_path(self, tmpdir, monkeypatch):
+        pkgdir = tmpdir.mkdir('dynpkg')
+        pkgdir.join('__init__.py').write('')
+        pkgdir.join('one.py').write('')
+        pkgdir.mkdir('sub').join('__init__.py').write(
+            'import os\n'
+            '__path__.append(os.path.join(os.path.dirname(__file__), "..", '
+            '"extra"))\n')
+        pkgdir.mkdir('extra').join('two.py').write('')
+        monkeypatch.setattr('PyInstaller.config.CONF',
+                            {'pathex': [str(tmpdir)]})
+        monkeypatch.syspath_prepend(str(tmpdir))
+
+        ml = sorted(collect_submodules('dynpkg'))
+        assert ml == ['dynpkg', 'dynpkg.one', 'dynpkg.sub', 'dynpkg.sub.two']
+
 
 def test_is_module_or_submodule():
     assert is_module_or_submodule('foo.bar', 'foo.bar')
@@ -322,3 +352,424 @@ def test_collect_data_all_included(data_lists):
 def test_get_module_file_attribute_non_exist_module():
     with pytest.raises(ImportError):
         get_module_file_attribute('pyinst_nonexisting_module_name')
+
+
+def test_get_module_attribute_static(tmpdir, monkeypatch):
+    pkg = tmpdir.mkdir('pyi_attr_pkg')
+    pkg.join('__init__.py').write(
+        "__version__ = '1.2.3'\n"
+        "VERSION: tuple = (1, 2)\n"
+        "computed = '-'.join(['a', 'b'])\n"
+        "from .sub import imported\n"
+        "if True:\n"
+        "    rebound = 'a'\n"
+        "rebound = 'b'\n")
+    pkg.join('sub.py').write("imported = 'c'\n")
+    monkeypatch.syspath_prepend(str(tmpdir))
+    monkeypatch.setitem(CONF, 'pathex', [str(tmpdir)])
+    statements = []
+    orig_exec_statement = hookutils.exec_statement
+
+    def exec_statement(statement, cache_dependencies=None):
+        statements.append(statement)
+        return orig_exec_statement(statement, cache_dependencies)
+
+    monkeypatch.setattr(hookutils, 'exec_statement', exec_statement)
+
+    # Literals and paths are resolved without importing the module.
+    assert get_module_attribute('pyi_attr_pkg', '__version__') == '1.2.3'
+    assert get_module_attribute('pyi_attr_pkg', 'VERSION') == '(1, 2)'
+    assert get_module_attribute('pyi_attr_pkg.sub', 'imported') == 'c'
+    assert get_module_file_attribute('pyi_attr_pkg.sub') == \
+        str(pkg.join('sub.py'))
+    assert is_module_satisfies('pyi_attr_pkg >= 1.2')
+    assert not statements
+    # Dynamic attributes are not.
+    assert get_module_attribute('pyi_attr_pkg', 'computed') == 'a-b'
+    assert get_module_attribute('pyi_attr_pkg', 'imported') == 'c'
+    assert get_module_attribute('pyi_attr_pkg', 'rebound') == 'b'
+    with pytest.raises(AttributeError):
+        get_module_attribute('pyi_attr_pkg', 'undefined')
+    assert len(statements) == 4
+
+
+def test_get_module_attribute_static_pathex(tmpdir, monkeypatch):
+    # Subprocesses search `CONF['pathex']` before `sys.path`, so should the
+    # static lookup.
+    pathex = tmpdir.mkdir('pathex')
+    shadowed = tmpdir.mkdir('shadowed')
+    pathex.join('pyi_attr_pathex.py').write("__version__ = '2.0'\n")
+    pathex.join('pyi_attr_shadowed.py').write("__version__ = '2.0'\n")
+    shadowed.join('pyi_attr_shadowed.py').write("__version__ = '1.0'\n")
+    monkeypatch.syspath_prepend(str(shadowed))
+    monkeypatch.setitem(CONF, 'pathex', [str(pathex)])
+    statement = 'import {0}; print({0}.__version__)'
+    for module_name in ('pyi_attr_pathex', 'pyi_attr_shadowed'):
+        assert exec_statement(statement.format(module_name)) == '2.0'
+        assert hookutils._get_static_module_attribute(
+            module_name, '__version__') == '2.0'
+    assert get_module_file_attribute('pyi_attr_shadowed') == \
+        str(pathex.join('pyi_attr_shadowed.py'))
+
+
+def test_exec_statement_worker_reuse():
+    statement = 'import os; print(os.getppid())'
+    ppid = exec_statement(statement)
+    if not hasattr(os, 'fork'):
+        pytest.skip('Workers are only reused with os.fork().')
+    # Statements are run by children of the same worker, whatever they
+    # change in their interpreter.
+    assert exec_statement('import xml.dom; ' + statement) == ppid
+    assert exec_statement(
+        'import sys, warnings; sys.setrecursionlimit(50); '
+        'warnings.simplefilter("error"); import builtins; builtins.x = 1; '
+        + statement) == ppid
+    assert exec_statement(statement) == ppid
+    modules = eval_statement('import sys; print(list(sys.modules))')
+    assert 'xml.dom' not in modules
+    assert eval_statement(
+        'import sys, builtins; '
+        'print((sys.getrecursionlimit(), hasattr(builtins, "x")))') \
+        == (1000, False)
+
+
+def test_exec_statement_stdin_and_atexit():
+    # Statements read the null device as stdin instead of the requests.
+    assert exec_statement('import sys; print(repr(sys.stdin.read()))') \
+        == "''"
+    assert exec_statement('print(1)') == '1'
+    # Output of atexit handlers is captured.
+    assert exec_statement(
+        'import atexit; atexit.register(print, "bye"); print(2)') \
+        == '2\nbye'
+    assert exec_statement('print(3)') == '3'
+
+
+def test_exec_statement_errors():
+    # Output written until an exception is raised or the interpreter exits.
+    assert exec_statement('print(1); raise ValueError()') == '1'
+    assert exec_statement('import sys; print(2); sys.exit(1)') == '2'
+    assert exec_statement('import os; print(3, flush=True); os._exit(1)') \
+        == '3'
+
+
+def test_exec_statement_query_cache(tmpdir, monkeypatch):
+    from PyInstaller.utils.hooks.cache import HookQueryCache
+    from PyInstaller.utils import hooks
+    srcdir = tmpdir.mkdir('src')
+    monkeypatch.setitem(CONF, 'pathex', [str(srcdir)])
+    mod = srcdir.join('pyi_query_mod.py')
+    mod.write('value = 1')
+    cache_filename = str(tmpdir.join('cache.dat'))
+    monkeypatch.setattr(hooks, 'query_cache', HookQueryCache(cache_filename))
+    data = srcdir.join('pyi_query_data.txt')
+    data.write('a')
+    statement = 'import pyi_query_mod; print(pyi_query_mod.value)'
+    assert exec_statement(statement, cache_dependencies=[str(data)]) == '1'
+    hooks.query_cache.save()
+
+    # Results are reused by the next build without running the statement.
+    monkeypatch.setattr(hooks, 'query_cache', HookQueryCache(cache_filename))
+    runs = []
+    orig_run = hooks.HookWorkerPool.run
+
+    def run(self, *args):
+        runs.append(args)
+        return orig_run(self, *args)
+
+    monkeypatch.setattr(hooks.HookWorkerPool, 'run', run)
+    assert exec_statement(statement, cache_dependencies=[str(data)]) == '1'
+    assert not runs
+    # Unless a module imported by the statement changed.
+    mod.write('value = 22')
+    assert exec_statement(statement, cache_dependencies=[str(data)]) == '22'
+    assert len(runs) == 1
+    # Or a file declared by the caller.
+    data.write('bb')
+    assert exec_statement(statement, cache_dependencies=[str(data)]) == '22'
+    assert len(runs) == 2
+    # Statements whose dependencies are not declared are never cached.
+    assert exec_statement(statement) == '22'
+    assert exec_statement(statement) == '22'
+    assert len(runs) == 4
+
+
+def test_distribution_index(tmpdir, monkeypatch):
+    from PyInstaller.utils.hooks.cache import DistributionIndex
+    sitedir = tmpdir.mkdir('site')
+    for name, version, requires in (('pyi_dist_a', '1.0', 'pyi_dist_b'),
+                                    ('pyi_dist_b', '2.0', '')):
+        dist_info = sitedir.mkdir('%s-%s.dist-info' % (name, version))
+        dist_info.join('METADATA').write(
+            'Metadata-Version: 2.1\nName: %s\nVersion: %s\n%s\n' % (
+                name, version,
+                'Requires-Dist: %s' % requires if requires else ''))
+        dist_info.join('RECORD').write(
+            '%s/__init__.py,,\n%s,,\n' % (name, dist_info.basename))
+        dist_info.join('INSTALLER').write('pyi-installer\n')
+        sitedir.mkdir(name).join('__init__.py').write('')
+    monkeypatch.syspath_prepend(str(sitedir))
+    index_filename = str(tmpdir.join('distributions.dat'))
+    monkeypatch.setattr(hookutils, 'distribution_index',
+                        DistributionIndex(index_filename))
+
+    dist = hookutils.distribution_index.get('PYI-dist-A')
+    assert (dist.version, dist.top_level, dist.installer) == \
+        ('1.0', ('pyi_dist_a',), 'pyi-installer')
+    assert is_module_satisfies('pyi_dist_a >= 1.0')
+    assert not is_module_satisfies('pyi_dist_a < 1.0')
+    assert hookutils.requirements_for_package('pyi_dist_a') == ['pyi_dist_b']
+    assert hookutils.copy_metadata('pyi_dist_b') == [
+        (str(sitedir.join('pyi_dist_b-2.0.dist-info')),
+         'pyi_dist_b-2.0-py%d.%d.egg-info' % sys.version_info[:2])]
+    hookutils.distribution_index.save()
+
+    # The next build only scans the path entries changed meanwhile.
+    index = DistributionIndex(index_filename)
+    monkeypatch.setattr(DistributionIndex, '_scan', None)
+    assert index.get('pyi_dist_b').version == '2.0'
+    sitedir.join('pyi_dist_b-2.0.dist-info').rename(
+        sitedir.join('pyi_dist_b-3.0.dist-info'))
+    monkeypatch.undo()
+    monkeypatch.syspath_prepend(str(sitedir))
+    index = DistributionIndex(index_filename)
+    assert index.get('pyi_dist_b').version == '3.0'
+
+
+@pytest.mark.skipif(not is_linux, reason='Qt library names differ per OS.')
+def test_add_qt5_dependencies_memoized(tmpdir, monkeypatch):
+    from PyInstaller.utils.hooks.cache import HookQueryCache
+    from PyInstaller.utils.hooks import qt
+    libs = {}
+    for name, imports in (('QtCore.so', ['libQt5Core.so.5']),
+                          ('QtGui.so', ['libQt5Gui.so.5', 'libc.so.6']),
+                          ('libQt5Gui.so.5', ['libQt5Core.so.5']),
+                          ('libQt5Core.so.5', ['libc.so.6']),
+                          ('libc.so.6', [])):
+        lib = tmpdir.join(name)
+        lib.write('')
+        libs[name] = (str(lib), [str(tmpdir.join(imp)) for imp in imports])
+    libraries = dict(libs.values())
+    calls = []
+
+    def getImports(library):
+        calls.append(library)
+        return libraries[library]
+
+    library_info = qt.Qt5LibraryInfo('PyQt5')
+    library_info.version = [5, 15, 0]
+    library_info.location = {'TranslationsPath': str(tmpdir)}
+    monkeypatch.setattr(qt, 'pyqt5_library_info', library_info)
+    monkeypatch.setattr(qt, 'getImports', getImports)
+    monkeypatch.setattr(qt, 'qt_plugins_binaries', lambda *args, **kw: [])
+    monkeypatch.setattr(qt, 'get_module_file_attribute',
+                        lambda name: libs[name.split('.')[1] + '.so'][0])
+    monkeypatch.setattr(hookutils, 'query_cache',
+                        HookQueryCache(str(tmpdir.join('cache.dat'))))
+
+    hiddenimports = qt.add_qt5_dependencies('hook-PyQt5.QtGui.py')[0]
+    assert sorted(hiddenimports) == ['PyQt5.QtCore', 'PyQt5.QtGui']
+    assert qt.add_qt5_dependencies('hook-PyQt5.QtCore.py')[0] == \
+        ['PyQt5.QtCore']
+    # The dependencies of each library are examined once for all hooks.
+    assert sorted(calls) == sorted(
+        libs[name][0] for name in
+        ('QtCore.so', 'QtGui.so', 'libQt5Gui.so.5', 'libQt5Core.so.5'))
+
+    # The next build reuses the Qt libraries found, unless one changed.
+    hookutils.query_cache.save()
+    library_info.dependencies.clear()
+    calls.clear()
+    monkeypatch.setattr(hookutils, 'query_cache',
+                        HookQueryCache(str(tmpdir.join('cache.dat'))))
+    assert qt.add_qt5_dependencies('hook-PyQt5.QtGui.py')[0]
+    assert not calls
+    tmpdir.join('libQt5Core.so.5').write('changed')
+    assert qt.add_qt5_dependencies('hook-PyQt5.QtGui.py')[0]
+    assert calls
+
+
+@pytest.mark.skipif(not is_linux, reason='Qt library names differ per OS.')
+def test_add_qt5_dependencies_cyclic(tmpdir, monkeypatch):
+    from PyInstaller.utils.hooks import qt
+    libs = {}
+    for name, imports in (('QtGui.so', ['libQt5Gui.so.5']),
+                          ('QtCore.so', ['libQt5Core.so.5']),
+                          ('libQt5Gui.so.5', ['libQt5Core.so.5',
+                                              'libQt5Network.so.5']),
+                          ('libQt5Core.so.5', ['libQt5Gui.so.5']),
+                          ('libQt5Network.so.5', [])):
+        lib = tmpdir.join(name)
+        lib.write('')
+        libs[name] = (str(lib), [str(tmpdir.join(imp)) for imp in imports])
+    libraries = dict(libs.values())
+    library_info = qt.Qt5LibraryInfo('PyQt5')
+    monkeypatch.setattr(qt, 'getImports', lambda library: libraries[library])
+
+    expected = {'qt5core', 'qt5gui', 'qt5network'}
+    # Libraries examined while following a cycle from the first library get
+    # the whole cycle as dependencies as well.
+    assert qt._get_qt_dependencies(libs['QtGui.so'][0], library_info)[0] \
+        == expected
+    assert qt._get_qt_dependencies(libs['QtCore.so'][0], library_info)[0] \
+        == expected
+    assert qt._get_qt_dependencies(libs['libQt5Core.so.5'][0],
+                                   library_info)[0] == expected
+
+
+def test_django_dottedstring_imports_static(tmpdir, monkeypatch):
+    from PyInstaller.utils.hooks.cache import HookQueryCache
+    from PyInstaller.utils.hooks import django
+    site = tmpdir.mkdir('site')
+    conf = site.mkdir('django').mkdir('conf')
+    site.join('django', '__init__.py').write("__version__ = '2.2'\n")
+    conf.join('__init__.py').write('')
+    conf.join('global_settings.py').write(
+        "gettext_noop = lambda s: s\n"
+        "LANGUAGES = [('en', gettext_noop('English'))]\n"
+        "DATABASES = {}\n"
+        "AUTHENTICATION_BACKENDS = ["
+        "'django.contrib.auth.backends.ModelBackend']\n")
+    project = tmpdir.mkdir('project')
+    root_dir = project.mkdir('mysite')
+    root_dir.join('__init__.py').write('')
+    settings = root_dir.join('settings.py')
+    settings.write(
+        "import os\n"
+        "BASE_DIR = os.path.dirname(__file__)\n"
+        "INSTALLED_APPS = ['polls.apps.PollsConfig']\n"
+        "ROOT_URLCONF = 'mysite.urls'\n"
+        "DATABASES = {'default': {\n"
+        "    'ENGINE': 'django.db.backends.sqlite3',\n"
+        "    'NAME': os.path.join(BASE_DIR, 'db.sqlite3')}}\n")
+    templatetags = project.mkdir('polls').mkdir('templatetags')
+    project.join('polls', '__init__.py').write('')
+    project.join('polls', 'apps.py').write('')
+    templatetags.join('__init__.py').write('')
+    templatetags.join('poll_tags.py').write('')
+    monkeypatch.syspath_prepend(str(site))
+    monkeypatch.setitem(CONF, 'pathex', [str(site)])
+    monkeypatch.delenv('DJANGO_SETTINGS_MODULE', raising=False)
+    cache_filename = str(tmpdir.join('cache.dat'))
+    monkeypatch.setattr(hookutils, 'query_cache',
+                        HookQueryCache(cache_filename))
+
+    expected = [
+        'django.contrib.auth.backends', 'django.db.backends.sqlite3',
+        'mysite.urls', 'polls.apps.PollsConfig',
+        'polls.apps.PollsConfig.context_processors',
+        'polls.apps.PollsConfig.templatetags']
+    imports = django.django_dottedstring_imports(str(root_dir), static=True)
+    assert imports == expected
+    hookutils.query_cache.save()
+
+    # The next build reuses these imports until the settings change.
+    monkeypatch.setattr(hookutils, 'query_cache',
+                        HookQueryCache(cache_filename))
+    monkeypatch.setattr(django, '_find_imports_statically', None)
+    assert django.django_dottedstring_imports(
+        str(root_dir), static=True) == expected
+    monkeypatch.undo()
+    monkeypatch.syspath_prepend(str(site))
+    monkeypatch.setitem(CONF, 'pathex', [str(site)])
+    monkeypatch.setattr(hookutils, 'query_cache',
+                        HookQueryCache(cache_filename))
+    settings.write(settings.read().replace('polls.apps.PollsConfig', 'polls'))
+    assert django.django_dottedstring_imports(str(root_dir), static=True) == [
+        'django.contrib.auth.backends', 'django.db.backends.sqlite3',
+        'mysite.urls', 'polls', 'polls.context_processors',
+        'polls.templatetags', 'polls.templatetags.poll_tags']
+
+
+def test_django_dottedstring_imports_static_matches_script(tmpdir,
+                                                          monkeypatch):
+    from PyInstaller.utils.hooks import django
+    # Minimal stand-in for Django, setting up the settings and installed apps
+    # like `django.setup()` does.
+    site = tmpdir.mkdir('site')
+    conf = site.mkdir('django').mkdir('conf')
+    site.join('django', '__init__.py').write(
+        "import importlib\n"
+        "__version__ = '2.2'\n"
+        "def setup():\n"
+        "    from django.conf import settings\n"
+        "    for app in settings.INSTALLED_APPS:\n"
+        "        try:\n"
+        "            importlib.import_module(app)\n"
+        "        except ImportError:\n"
+        "            importlib.import_module(app.rpartition('.')[0])\n")
+    conf.join('__init__.py').write(
+        "import importlib, os\n"
+        "from . import global_settings\n"
+        "class Settings(object):\n"
+        "    def __init__(self):\n"
+        "        for module in (global_settings, importlib.import_module(\n"
+        "                os.environ['DJANGO_SETTINGS_MODULE'])):\n"
+        "            for name in dir(module):\n"
+        "                if name.isupper():\n"
+        "                    setattr(self, name, getattr(module, name))\n"
+        "settings = Settings()\n")
+    conf.join('global_settings.py').write(
+        "INSTALLED_APPS = []\n"
+        "TEMPLATES = []\n"
+        "DATABASES = {}\n"
+        "DEFAULT_FILE_STORAGE = "
+        "'django.core.files.storage.FileSystemStorage'\n"
+        "FILE_UPLOAD_HANDLERS = [\n"
+        "    'django.core.files.uploadhandler.MemoryFileUploadHandler']\n"
+        "AUTHENTICATION_BACKENDS = "
+        "['django.contrib.auth.backends.ModelBackend']\n")
+    project = tmpdir.mkdir('project')
+    root_dir = project.mkdir('mysite')
+    root_dir.join('__init__.py').write('')
+    settings = root_dir.join('settings.py')
+    settings.write(
+        "INSTALLED_APPS = ['polls', 'blog.apps.BlogConfig']\n"
+        "MIDDLEWARE_CLASSES = ('mysite.middleware.TimingMiddleware',)\n"
+        "TEMPLATE_LOADERS = ['mysite.loaders.Loader']\n"
+        "TEMPLATES = [{\n"
+        "    'BACKEND': 'django.template.backends.django.DjangoTemplates',\n"
+        "    'OPTIONS': {'context_processors': ['mysite.context.user']}}]\n"
+        "ROOT_URLCONF = 'mysite.urls'\n"
+        "DATABASES = {'default': {\n"
+        "    'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db'}}\n")
+    for app in ('polls', 'blog'):
+        templatetags = project.mkdir(app).mkdir('templatetags')
+        project.join(app, '__init__.py').write('')
+        templatetags.join('__init__.py').write('')
+        templatetags.join(app + '_tags.py').write('')
+    project.join('blog', 'apps.py').write('BlogConfig = None\n')
+    monkeypatch.syspath_prepend(str(site))
+    monkeypatch.setitem(CONF, 'pathex', [str(site)])
+    monkeypatch.delenv('DJANGO_SETTINGS_MODULE', raising=False)
+    monkeypatch.setattr(hookutils, 'query_cache', None)
+
+    def check():
+        static = django.django_dottedstring_imports(str(root_dir),
+                                                    static=True)
+        script = django.django_dottedstring_imports(str(root_dir),
+                                                    static=False)
+        assert sorted(static) == sorted(script)
+        return static
+
+    # Quirks of the script, like the ignored `TEMPLATES`, are mirrored.
+    assert check() == [
+        'blog.apps.BlogConfig', 'blog.apps.BlogConfig.context_processors',
+        'blog.apps.BlogConfig.templatetags', 'django.contrib.auth.backends',
+        'django.core.files.storage', 'django.core.files.uploadhandler',
+        'django.db.backends.sqlite3', 'mysite.loaders.Loader',
+        'mysite.middleware',
+        'mysite.urls', 'polls', 'polls.context_processors',
+        'polls.templatetags', 'polls.templatetags.polls_tags']
+
+    # Settings the static analysis cannot mirror exactly are left to the
+    # script.
+    for source in (
+            "MIDDLEWARE_CLASSES += ('mysite.middleware.Other',)\n",
+            "TEMPLATE_LOADERS = 'mysite.loaders.Loader'\n",
+            "INSTALLED_APPS.append('missing')\n"):
+        settings.write(source, mode='a')
+        with pytest.raises(ValueError):
+            django._find_imports_statically('mysite.settings',
+                                            [str(project), str(root_dir)])
+        check()
@@ -403,7 +403,7 @@ def test_global_attrs(self):
 
     def test_submodules(self):
         n = modulegraph.Node("foobar.xyz")
-        self.assertEqual(n._submodule_basename_to_node, {})
+        self.assertFalse(n._submodule_basename_to_node)
 
         sm = modulegraph.Node("bar.baz")
         self.assertFalse(n.is_submodule('bar'))
@@ -458,6 +458,8 @@ def assertNoMethods(self, klass):
             del d['__dict__']
         if '__slotnames__' in d:
             del d['__slotnames__']
+        if '__slots__' in d:
+            del d['__slots__']
         self.assertEqual(d, {})
 
     def assertHasExactMethods(self, klass, *methods):
@@ -472,6 +474,8 @@ def assertHasExactMethods(self, klass, *methods):
         if '__dict__' in d:
             # New in Python 3.4
             del d['__dict__']
+        if '__slots__' in d:
+            del d['__slots__']
         for nm in methods:
             self.assertTrue(nm in d, "%s doesn't have attribute %r"%(klass, nm))
             del d[nm]
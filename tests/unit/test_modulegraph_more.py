@@ -10,11 +10,13 @@
 #-----------------------------------------------------------------------------
 
 import ast
+import importlib
 import os
 import os.path
 import sys
 import py_compile
 import textwrap
+import tracemalloc
 import zipfile
 from importlib.machinery import EXTENSION_SUFFIXES
 
@@ -382,6 +384,35 @@ def testfunc():
     assert not module.is_global_attr('exitfunc')
 
 
+
+def test_scan_code__extended_arg(monkeypatch):
+    # Names following the first 256 ones are referenced via EXTENDED_ARG.
+    code = "".join("v%d = %d\n" % (i, i) for i in range(300))
+    code += "from pkg import mod\ndel v299\n"
+    module = __scan_code(code, False, monkeypatch)
+    assert [di[1][0] for di in module._deferred_imports] == ['pkg']
+    assert module.is_global_attr('v298') and module.is_global_attr('mod')
+    assert not module.is_global_attr('v299')
+
+
+@pytest.mark.parametrize("module_name", ("os", "argparse", "email.message",
+                                         "collections", "typing"))
+def test_iterate_opcodes(module_name):
+    from PyInstaller.lib.modulegraph import util
+    filename = importlib.import_module(module_name).__file__
+    with open(filename, 'rb') as fp:
+        co = compile(fp.read(), filename, 'exec')
+    # The raw decoder yields the same instructions as the dis module, with
+    # arguments resolved for the relevant instructions only.
+    resolved = set(util._RESOLVED_OPNAMES)
+    expected = [
+        None if inst is None else
+        (inst.opname, inst.argval if inst.opname in resolved else None)
+        for inst in util.iterate_instructions(co)
+        if inst is None or inst.opname != 'EXTENDED_ARG']
+    assert list(util.iterate_opcodes(co)) == expected
+
+
 #-- SWIG packages - pyinstaller specific tests
 
 def test_swig_import_simple_BUGGY(tmpdir):
@@ -665,3 +696,61 @@ def test_swig_candidate_but_not_swig_missing2(tmpdir):
     assert isinstance(mg.findNode('pkg.mymod'), modulegraph.SourceModule)
     assert isinstance(mg.findNode('pkg._mymod'), modulegraph.MissingModule)
     assert isinstance(mg.findNode('_mymod'), modulegraph.MissingModule)
+
+
+def test_find_module_path_index(tmpdir):
+    dirs = [tmpdir.mkdir('d%d' % i) for i in range(3)]
+    dirs[2].join('mod.py').write('')
+    dirs[2].mkdir('nspkg')
+    path = [str(d) for d in dirs]
+    mg = modulegraph.ModuleGraph(path)
+
+    pathname, loader = mg._find_module_path('mod', 'mod', path)
+    assert pathname == str(dirs[2].join('mod.py'))
+    _, loader = mg._find_module_path('nspkg', 'nspkg', path)
+    assert isinstance(loader, modulegraph.NAMESPACE_PACKAGE)
+    with pytest.raises(ImportError):
+        mg._find_module_path('other', 'other', path)
+
+    # Directory entries and missing modules are indexed until reset.
+    dirs[0].join('other.py').write('')
+    dirs[0].join('mod.py').write('')
+    with pytest.raises(ImportError):
+        mg._find_module_path('other', 'other', path)
+    pathname, _ = mg._find_module_path('mod', 'mod', path)
+    assert pathname == str(dirs[2].join('mod.py'))
+
+    mg.append_package_path('nspkg', str(dirs[1]))
+    importlib.invalidate_caches()
+    pathname, _ = mg._find_module_path('other', 'other', path)
+    assert pathname == str(dirs[0].join('other.py'))
+    pathname, _ = mg._find_module_path('mod', 'mod', path)
+    assert pathname == str(dirs[0].join('mod.py'))
+
+
+def test_node_memory():
+    # Nodes of all types have no per-instance dictionary.
+    node_types = [cls for cls in vars(modulegraph).values()
+                  if isinstance(cls, type) and issubclass(cls, modulegraph.Node)]
+    for cls in node_types:
+        assert '__dict__' not in dir(cls), cls
+
+    # A large graph takes little memory per node.
+    names = ['pkg%d.mod%d' % (i // 100, i) for i in range(20000)]
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        nodes = [modulegraph.SourceModule(name) for name in names]
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert size / len(nodes) < 300
+
+    # Attribute sets are only created on modification.
+    node = nodes[0]
+    assert not node.is_global_attr('x') and not node.is_submodule('x')
+    node.add_global_attr('x')
+    node.add_submodule('sub', nodes[1])
+    assert node.is_global_attr('x') and node.get_submodule('sub') is nodes[1]
+    assert not nodes[2].is_global_attr('x')
+    assert nodes[2].get_submodule_or_none('sub') is None
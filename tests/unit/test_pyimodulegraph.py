@@ -10,12 +10,16 @@
 #-----------------------------------------------------------------------------
 
 
+import os
+import re
+import sys
 import types
 import pytest
 import itertools
 
 from PyInstaller import HOMEPATH
-from PyInstaller.depend import analysis
+from PyInstaller.depend import analysis, graphcache
+from PyInstaller.utils.hooks import cache as hookcache
 from PyInstaller.lib.modulegraph import modulegraph
 import PyInstaller.log as logging
 from PyInstaller.utils.tests import gen_sourcefile
@@ -140,6 +144,483 @@ def test_graph_collects_script_dependencies(fresh_pyi_modgraph, tmpdir):
     assert "uuid" in names
 
 
+def _record_parsed_modules(monkeypatch):
+    parsed = []
+    orig_parse_imports = analysis.PyiModuleGraph._parse_imports
+
+    def _parse_imports(self, module, *args):
+        parsed.append(module.identifier)
+        return orig_parse_imports(self, module, *args)
+
+    monkeypatch.setattr(analysis.PyiModuleGraph, '_parse_imports',
+                        _parse_imports)
+    return parsed
+
+
+def _analyze_with_module_cache(tmpdir):
+    cache = graphcache.ModuleGraphCache(str(tmpdir.join('modgraph.dat')))
+    mg = FakePyiModuleGraph(HOMEPATH, module_cache=cache)
+    mg.path = [str(tmpdir)] + mg.path
+    node = mg.run_script(str(tmpdir.join('script.py')))
+    mg.save_module_cache()
+    return mg, node
+
+
+def test_module_cache(tmpdir, monkeypatch):
+    tmpdir.join('script.py').write('import mod_a')
+    tmpdir.join('mod_a.py').write('import mod_b\nfrom pkg import sub, x\n')
+    tmpdir.join('mod_b.py').write('import json')
+    pkg = tmpdir.mkdir('pkg')
+    pkg.join('__init__.py').write('x = 1')
+    pkg.join('sub.py').write('')
+    mg1, node1 = _analyze_with_module_cache(tmpdir)
+
+    # Only modified modules are parsed again.
+    tmpdir.join('mod_b.py').write('import json\nimport mod_c\n')
+    tmpdir.join('mod_c.py').write('')
+    scanned = _record_parsed_modules(monkeypatch)
+    mg2, node2 = _analyze_with_module_cache(tmpdir)
+    assert 'mod_b' in scanned
+    for name in ('mod_a', 'pkg', 'pkg.sub', 'json'):
+        assert name not in scanned
+
+    # Reused modules are graphed as before.
+    names1 = set(n.identifier for n in mg1.flatten(start=node1))
+    names2 = set(n.identifier for n in mg2.flatten(start=node2))
+    assert names2 - names1 == {'mod_c'}
+    assert names1 - names2 == set()
+    for name in ('mod_a', 'pkg', 'pkg.sub', 'json'):
+        n1, n2 = mg1.findNode(name), mg2.findNode(name)
+        assert type(n1) is type(n2)
+        assert n1.code == n2.code
+        assert n1._global_attr_names == n2._global_attr_names
+        assert (sorted(r.identifier for r in mg1.getReferences(n1)) ==
+                sorted(r.identifier for r in mg2.getReferences(n2)))
+
+
+def test_module_cache_contains(tmpdir):
+    # Records only looked up, as for modules prefetched speculatively, are
+    # dropped from the cache unless used by the analysis.
+    tmpdir.join('script.py').write('import mod_a')
+    tmpdir.join('mod_a.py').write('')
+    _analyze_with_module_cache(tmpdir)
+    filename = str(tmpdir.join('modgraph.dat'))
+    mod_a = str(tmpdir.join('mod_a.py'))
+    cache = graphcache.ModuleGraphCache(filename)
+    assert cache.contains('mod_a', mod_a)
+    assert not cache.contains('mod_b', mod_a)
+    cache.save()
+    assert not graphcache.ModuleGraphCache(filename).contains('mod_a', mod_a)
+
+
+def test_module_cache_optimize(tmpdir, monkeypatch):
+    # Code objects compiled at another optimization level are not reused.
+    tmpdir.join('script.py').write('import mod_a')
+    tmpdir.join('mod_a.py').write('')
+    _analyze_with_module_cache(tmpdir)
+    filename = str(tmpdir.join('modgraph.dat'))
+    mod_a = str(tmpdir.join('mod_a.py'))
+    assert graphcache.ModuleGraphCache(filename).contains('mod_a', mod_a)
+    monkeypatch.setattr(sys, 'flags', _OptimizedFlags(sys.flags))
+    assert not graphcache.ModuleGraphCache(filename).contains('mod_a', mod_a)
+
+
+def test_module_cache_compiled_module(tmpdir, monkeypatch):
+    # Records of modules only available as .pyc files are reused as well.
+    import py_compile
+    tmpdir.join('script.py').write('import mod_pyc')
+    py_compile.compile(str(tmpdir.join('src.py').ensure()),
+                       str(tmpdir.join('mod_pyc.pyc')))
+    mg1, _ = _analyze_with_module_cache(tmpdir)
+    assert type(mg1.findNode('mod_pyc')).__name__ == 'CompiledModule'
+
+    def get_code(self, fullname):
+        raise AssertionError('%s loaded again' % fullname)
+
+    import importlib.machinery
+    monkeypatch.setattr(importlib.machinery.SourcelessFileLoader, 'get_code',
+                        get_code)
+    mg2, _ = _analyze_with_module_cache(tmpdir)
+    assert type(mg2.findNode('mod_pyc')).__name__ == 'CompiledModule'
+
+
+def test_get_frozen_code(tmpdir, monkeypatch):
+    # Code objects are compiled with absolute filenames, which are made
+    # relative once per analysis.
+    from PyInstaller.building import utils
+    tmpdir.join('script.py').write('import pkg.mod')
+    pkg = tmpdir.mkdir('pkg')
+    pkg.join('__init__.py').write('')
+    pkg.join('mod.py').write('def f(): pass')
+    monkeypatch.setattr(utils.sys, 'path', [str(tmpdir)])
+    mg = FakePyiModuleGraph(HOMEPATH)
+    mg.path = [str(tmpdir)] + mg.path
+    mg.run_script(str(tmpdir.join('script.py')))
+    node = mg.findNode('pkg.mod')
+    assert node.code.co_filename == node.filename
+    co = mg.get_frozen_code(node)
+    assert co.co_filename == os.path.join('pkg', 'mod.py')
+    assert co.co_consts[0].co_filename == os.path.join('pkg', 'mod.py')
+    assert mg.get_frozen_code(node) is co
+    assert mg.get_code_objects()['pkg.mod'] is co
+
+
+def test_scan_cache(tmpdir, monkeypatch):
+    cache_file = str(tmpdir.join('modulescan.dat'))
+    graphs = []
+    for srcdir in (tmpdir.mkdir('src1'), tmpdir.mkdir('src2')):
+        srcdir.join('script.py').write('import mod_a')
+        srcdir.join('mod_a.py').write('import mod_b\nfrom pkg import sub, x')
+        srcdir.join('mod_b.py').write('import json')
+        pkg = srcdir.mkdir('pkg')
+        pkg.join('__init__.py').write('x = 1')
+        pkg.join('sub.py').write('from . import y')
+        pkg.join('y.py').write('')
+        if srcdir.basename == 'src2':
+            srcdir.join('mod_b.py').write('import json\nimport mod_c\n')
+            srcdir.join('mod_c.py').write('c = 1')
+            parsed = _record_parsed_modules(monkeypatch)
+        mg = FakePyiModuleGraph(
+            HOMEPATH, scan_cache=graphcache.ImportScanCache(cache_file))
+        mg.path = [str(srcdir)] + mg.path
+        node = mg.run_script(str(srcdir.join('script.py')))
+        mg.save_module_cache()
+        graphs.append((mg, node))
+
+    # Sources scanned by a previous build are not parsed again, even if
+    # located elsewhere. The script itself is never cached.
+    assert sorted(parsed) == sorted([str(srcdir.join('script.py')),
+                                     'mod_b', 'mod_c'])
+
+    (mg1, node1), (mg2, node2) = graphs
+    names1 = set(n.identifier for n in mg1.flatten(start=node1))
+    names2 = set(n.identifier for n in mg2.flatten(start=node2))
+    assert names2 - names1 == {node2.identifier, 'mod_c'}
+    assert names1 - names2 == {node1.identifier}
+    for name in ('mod_a', 'pkg', 'pkg.sub', 'json'):
+        n1, n2 = mg1.findNode(name), mg2.findNode(name)
+        assert type(n1) is type(n2)
+        assert n2.code.co_filename == n2.filename
+        assert n1._global_attr_names == n2._global_attr_names
+        assert (sorted(r.identifier for r in mg1.getReferences(n1)) ==
+                sorted(r.identifier for r in mg2.getReferences(n2)))
+
+
+def test_parse_workers(tmpdir):
+    tmpdir.join('script.py').write('import mod_a\nimport pkg.sub')
+    tmpdir.join('mod_a.py').write('import mod_b\nimport json\n')
+    tmpdir.join('mod_b.py').write('from pkg import *\nif x: import mod_c')
+    tmpdir.join('mod_c.py').write('def f(:')
+    pkg = tmpdir.mkdir('pkg')
+    pkg.join('__init__.py').write('x = 1\nfrom .sub import y')
+    pkg.join('sub.py').write('from . import z\ny = 2')
+    pkg.join('z.py').write('')
+
+    graphs = []
+    for jobs in (None, 2):
+        mg = FakePyiModuleGraph(HOMEPATH)
+        mg.path = [str(tmpdir)] + mg.path
+        if jobs:
+            mg.start_parse_workers(jobs)
+        node = mg.run_script(str(tmpdir.join('script.py')))
+        mg.stop_parse_workers()
+        graphs.append((mg, node))
+
+    # Modules parsed by the workers are graphed as if parsed serially.
+    (mg1, node1), (mg2, node2) = graphs
+    names = set(n.identifier for n in mg1.flatten(start=node1))
+    assert names == set(n.identifier for n in mg2.flatten(start=node2))
+    for name in names:
+        n1, n2 = mg1.findNode(name), mg2.findNode(name)
+        assert type(n1) is type(n2)
+        assert n1.code == n2.code
+        assert n1._global_attr_names == n2._global_attr_names
+        assert (sorted(r.identifier for r in mg1.getReferences(n1)) ==
+                sorted(r.identifier for r in mg2.getReferences(n2)))
+    assert type(mg2.findNode('mod_c')).__name__ == 'InvalidSourceModule'
+
+
+@pytest.mark.parametrize('failure', ['result', 'submit'])
+def test_parse_workers_failure(tmpdir, failure):
+    # Modules are parsed by the graph itself if the parse workers fail.
+    from concurrent.futures import Future
+    from concurrent.futures.process import BrokenProcessPool
+    tmpdir.join('script.py').write('import mod_a\nimport mod_b')
+    tmpdir.join('mod_a.py').write('import mod_b')
+    tmpdir.join('mod_b.py').write('import json')
+
+    class BrokenPool(object):
+        def submit(self, *args):
+            if failure == 'submit':
+                raise BrokenProcessPool()
+            future = Future()
+            future.set_exception(BrokenProcessPool())
+            return future
+
+        def shutdown(self):
+            pass
+
+    mg = FakePyiModuleGraph(HOMEPATH)
+    mg.path = [str(tmpdir)] + mg.path
+    mg._parse_pool = BrokenPool()
+    node = mg.run_script(str(tmpdir.join('script.py')))
+    mg.stop_parse_workers()
+    names = set(n.identifier for n in mg.flatten(start=node))
+    assert {'mod_a', 'mod_b', 'json'} <= names
+    assert mg.findNode('mod_b').code is not None
+
+
+def test_base_graph_snapshot(tmpdir, monkeypatch):
+    tmpdir.join('base_mod.py').write('import json')
+    monkeypatch.syspath_prepend(str(tmpdir))
+    analyzed = []
+
+    def fake_base_modules(self):
+        analyzed.append(True)
+        self._base_modules = self.import_hook('base_mod')
+
+    monkeypatch.setattr(analysis.PyiModuleGraph,
+                        "_analyze_base_modules", fake_base_modules)
+    snapshot_dir = str(tmpdir.join('cache'))
+
+    def _initialize():
+        # Only reuse the graph persisted by a previous process.
+        monkeypatch.setattr(analysis, "_cached_module_graph_", None)
+        return analysis.initialize_modgraph(snapshot_dir=snapshot_dir)
+
+    mg1 = _initialize()
+    mg2 = _initialize()
+    assert len(analyzed) == 1
+    names = set(n.identifier for n in mg1.flatten())
+    assert 'json' in names
+    assert names == set(n.identifier for n in mg2.flatten())
+    for name in names:
+        n1, n2 = mg1.findNode(name), mg2.findNode(name)
+        assert type(n1) is type(n2)
+        assert n1.code == n2.code
+        assert n1._global_attr_names == n2._global_attr_names
+    assert mg2._hooks is not None
+    assert mg2._base_modules == mg1._base_modules
+
+    # The restored graph is independent of the graph snapshotted.
+    mg2.run_script(str(tmpdir.join('base_mod.py')))
+    assert mg1.findNode(str(tmpdir.join('base_mod.py'))) is None
+
+    # The snapshot is outdated if any of its modules changed.
+    tmpdir.join('base_mod.py').write('import csv')
+    mg3 = _initialize()
+    assert len(analyzed) == 2
+    assert mg3.findNode('csv') is not None
+
+    # Snapshots are specific to the optimization level of the interpreter.
+    _initialize()
+    assert len(analyzed) == 2
+    monkeypatch.setattr(sys, 'flags', _OptimizedFlags(sys.flags))
+    _initialize()
+    assert len(analyzed) == 3
+
+
+class _OptimizedFlags(object):
+    """
+    `sys.flags` of an interpreter run with the -OO option.
+    """
+
+    optimize = 2
+
+    def __init__(self, flags):
+        self._flags = flags
+
+    def __getattr__(self, name):
+        return getattr(self._flags, name)
+
+
+def test_post_graph_hooks_of_hidden_imports(tmpdir, monkeypatch):
+    hookdir = tmpdir.mkdir('hooks')
+    # Hooks of hidden imports, which are run in a chain.
+    hookdir.join('hook-mod_a.py').write('hiddenimports = ["mod_b"]')
+    hookdir.join('hook-mod_b.py').write('hiddenimports = ["mod_c"]')
+    hookdir.join('hook-mod_c.py').write('datas = [(__file__, ".")]')
+    # Hook of a module never imported.
+    hookdir.join('hook-mod_absent.py').write('hiddenimports = ["mod_d"]')
+    srcdir = tmpdir.mkdir('src')
+    srcdir.join('script.py').write('import mod_a')
+    for name in ('mod_a', 'mod_b', 'mod_c', 'mod_d'):
+        srcdir.join(name + '.py').write('')
+
+    mg = FakePyiModuleGraph(HOMEPATH, user_hook_dirs=[str(hookdir)])
+    mg.path = [str(srcdir)] + mg.path
+    script = mg.run_script(str(srcdir.join('script.py')))
+    looked_up = []
+    orig_find_node = analysis.PyiModuleGraph.findNode
+
+    def findNode(self, name, *args, **kwargs):
+        looked_up.append(name)
+        return orig_find_node(self, name, *args, **kwargs)
+
+    monkeypatch.setattr(analysis.PyiModuleGraph, 'findNode', findNode)
+    mg.process_post_graph_hooks()
+
+    names = set(n.identifier for n in mg.flatten(start=script))
+    assert {'mod_a', 'mod_b', 'mod_c'} <= names
+    assert mg.findNode('mod_d') is None
+    assert mg._additional_files_cache.datas('mod_c')
+    # Modules not imported are only looked up once.
+    assert looked_up.count('mod_absent') == 1
+    assert 'mod_absent' in mg._hooks
+    assert 'mod_c' not in mg._hooks
+
+
+def test_hook_result_cache(tmpdir, monkeypatch, caplog):
+    from PyInstaller.depend import imphook
+    from PyInstaller.utils import hooks as hookutils
+    hookdir = tmpdir.mkdir('hooks')
+    hookdir.join('hook-pyi_hooked.py').write(
+        'import logging, os\n'
+        'logging.getLogger("pyi_hooked_hook").warning(\n'
+        '    "Hooked with %s", os.environ.get("PYINSTALLER_HOOKED_ENV"))\n'
+        'hiddenimports = ["pyi_hooked.sub"]\n'
+        'datas = [(__file__, ".")]')
+    hookdir.join('hook-pyi_hooked.sub.py').write(
+        'def hook(hook_api):\n'
+        '    pass')
+    sitedir = tmpdir.mkdir('site')
+    pkgdir = sitedir.mkdir('pyi_hooked')
+    pkgdir.join('__init__.py').write('')
+    pkgdir.join('sub.py').write('')
+    dist_info = sitedir.mkdir('pyi_hooked-1.0.dist-info')
+    dist_info.join('METADATA').write(
+        'Metadata-Version: 2.1\nName: pyi_hooked\nVersion: 1.0\n')
+    dist_info.join('RECORD').write(
+        'pyi_hooked/__init__.py,,\npyi_hooked/sub.py,,\n')
+    script = tmpdir.join('script.py')
+    script.write('import pyi_hooked')
+    # Module paths are compared with distribution locations with symbolic
+    # links resolved.
+    if hasattr(os, 'symlink'):
+        sitelink = tmpdir.join('sitelink')
+        sitelink.mksymlinkto(sitedir)
+        sitedir = sitelink
+    monkeypatch.syspath_prepend(str(sitedir))
+    cache_filename = str(tmpdir.join('cache.dat'))
+    monkeypatch.setattr(hookutils, 'distribution_index',
+                        hookcache.DistributionIndex())
+    loaded = []
+    orig_load_source = imphook.importlib_load_source
+
+    def importlib_load_source(name, filename):
+        loaded.append(filename)
+        return orig_load_source(name, filename)
+
+    monkeypatch.setattr(imphook, 'importlib_load_source',
+                        importlib_load_source)
+
+    def analyze():
+        monkeypatch.setattr(hookutils, 'query_cache',
+                            hookcache.HookQueryCache(cache_filename))
+        mg = FakePyiModuleGraph(HOMEPATH, user_hook_dirs=[str(hookdir)])
+        mg.run_script(str(script))
+        mg.process_post_graph_hooks()
+        hookutils.query_cache.save()
+        assert mg.findNode('pyi_hooked.sub') is not None
+        assert mg._additional_files_cache.datas('pyi_hooked')
+        return sorted(os.path.basename(name) for name in loaded)
+
+    monkeypatch.setenv('PYINSTALLER_HOOKED_ENV', 'a')
+    assert analyze() == ['hook-pyi_hooked.py', 'hook-pyi_hooked.sub.py']
+    # Hook scripts defining a hook() function are always run. Unrelated
+    # environment variables do not invalidate the results of others.
+    loaded.clear()
+    caplog.clear()
+    monkeypatch.setenv('PYI_UNRELATED_ENV', 'a')
+    assert analyze() == ['hook-pyi_hooked.sub.py']
+    # The messages logged by others are replayed.
+    assert [(record.name, record.levelname, record.getMessage())
+            for record in caplog.records if record.name == 'pyi_hooked_hook'] \
+        == [('pyi_hooked_hook', 'WARNING', 'Hooked with a')]
+    # Others are run again once the environment changed.
+    loaded.clear()
+    monkeypatch.setenv('PYINSTALLER_HOOKED_ENV', 'b')
+    assert analyze() == ['hook-pyi_hooked.py', 'hook-pyi_hooked.sub.py']
+    # Others are run again once the hooked distribution changed.
+    loaded.clear()
+    dist_info.join('RECORD').write('pyi_hooked/__init__.py,,\n')
+    assert analyze() == ['hook-pyi_hooked.py', 'hook-pyi_hooked.sub.py']
+
+
+def test_hook_dir_registry(tmpdir, monkeypatch):
+    from PyInstaller.depend import imphook
+    hookdir = tmpdir.mkdir('hooks')
+    hookdir.join('hook-mod_a.py').write('')
+    mg = FakePyiModuleGraph(HOMEPATH, user_hook_dirs=[str(hookdir)])
+    assert 'mod_a' in mg._hooks
+
+    # Unchanged hook directories are not scanned again.
+    globbed = []
+    orig_glob = imphook.glob.glob
+
+    def glob(pattern):
+        globbed.append(pattern)
+        return orig_glob(pattern)
+
+    monkeypatch.setattr(imphook.glob, 'glob', glob)
+    assert 'mod_a' in mg._cache_hooks('')
+    assert not globbed
+    hookdir.join('hook-mod_b.py').write('')
+    assert {'mod_a', 'mod_b'} <= set(mg._cache_hooks(''))
+    assert len(globbed) == 1
+
+    # Registries persisted by a previous build are reused by the next one.
+    cache_filename = str(tmpdir.join('hookdirs.dat'))
+    monkeypatch.setattr(imphook, 'hook_dir_cache',
+                        imphook.HookDirectoryCache(cache_filename))
+    monkeypatch.setattr(imphook, '_HOOK_DIR_REGISTRY', {})
+    assert {'mod_a', 'mod_b'} <= set(mg._cache_hooks(''))
+    assert len(globbed) == 3
+    imphook.hook_dir_cache.save()
+    monkeypatch.setattr(imphook, 'hook_dir_cache',
+                        imphook.HookDirectoryCache(cache_filename))
+    monkeypatch.setattr(imphook, '_HOOK_DIR_REGISTRY', {})
+    assert {'mod_a', 'mod_b'} <= set(mg._cache_hooks(''))
+    assert len(globbed) == 3
+
+
+def test_reachable_node_index(tmpdir):
+    srcdir = tmpdir.mkdir('src')
+    srcdir.join('script.py').write('import mod_a, mod_missing')
+    srcdir.join('mod_a.py').write('import pkg_b.mod_c')
+    srcdir.join('mod_d.py').write('')
+    pkgdir = srcdir.mkdir('pkg_b')
+    pkgdir.join('__init__.py').write('')
+    pkgdir.join('mod_c.py').write('import json')
+
+    mg = FakePyiModuleGraph(HOMEPATH)
+    mg.path = [str(srcdir)] + mg.path
+    script = mg.run_script(str(srcdir.join('script.py')))
+
+    base_module = re.compile(
+        '(' + '|'.join(analysis.PY3_BASE_MODULES) + r')(\.|$)')
+
+    def flatten_toc(typecode):
+        toc = analysis.TOC()
+        for node in mg.flatten(start=script):
+            entry = mg._node_to_toc(node, typecode)
+            if entry is not None and not base_module.match(node.identifier):
+                toc.append(entry)
+        return toc
+
+    assert list(mg.iter_reachable_nodes()) == list(mg.flatten(start=script))
+    for typecode in (analysis.PURE_PYTHON_MODULE_TYPES,
+                     analysis.BAD_MODULE_TYPES):
+        assert list(mg._make_toc(typecode)) == list(flatten_toc(typecode))
+    assert ('mod_missing', '', 'missing') in mg.make_missing_toc()
+    # The index is reused until the graph is modified.
+    index = mg._get_node_index(script)
+    assert mg._get_node_index(script) is index
+    mg.add_hiddenimports(['mod_d'])
+    assert 'mod_d' in set(n.identifier for n in mg.iter_reachable_nodes())
+    assert mg._get_node_index(script) is not index
+
+
 def _gen_pseudo_rthooks(name, rthook_dat, tmpdir, gen_files=True):
     hd = tmpdir.ensure(name, dir=True)
     if gen_files: